@@ -0,0 +1,99 @@
+"""Move training report photos out of the training_reports documents.
+
+Photos saved before the report photo store existed are base64 data URLs embedded in the
+report. This runs each one through the image pipeline like an upload (EXIF and GPS tags
+stripped, medium and thumbnail variants made), stores it in static/report_photos
+(content-addressed) and replaces it with its /api/report-photos/... URL, then refreshes the
+supervisor report index. Photos Pillow cannot read are left embedded and listed. Safe to
+run more than once.
+
+Usage: python migrate_report_photos.py [--dry-run]
+"""
+import os
+import sys
+import io
+import asyncio
+import shutil
+import tempfile
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pathlib import Path
+
+from services.blob_store import BlobStore, decode_data_url
+from services.image_pipeline import create_image_pipeline, UnsupportedImage
+from services.supervisor_reports import rebuild_supervisor_report_index
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+PHOTO_VARIANTS = ["medium", "thumb"]
+PHOTO_FIELDS = ["group_photo", "theory_photo_1", "theory_photo_2", "practical_photo_1", "practical_photo_2", "practical_photo_3"]
+
+async def main(dry_run: bool):
+    mongo_url = os.environ['MONGO_URL']
+    db_name = os.environ.get('DB_NAME')
+
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    store = BlobStore(ROOT_DIR / "static" / "report_photos")
+    pipeline = create_image_pipeline()
+
+    print(f"🔍 Looking for embedded report photos{' (dry run)' if dry_run else ''}...")
+
+    query = {"$or": [{field: {"$regex": "^data:"}} for field in PHOTO_FIELDS]}
+    projection = {"_id": 0, "id": 1, "session_id": 1, **{field: 1 for field in PHOTO_FIELDS}}
+
+    reports = 0
+    photos = 0
+    bytes_moved = 0
+    unreadable = 0
+
+    # One report at a time: each document can hold several megabytes of base64
+    async for report in db.training_reports.find(query, projection).batch_size(1):
+        updates = {}
+        for field in PHOTO_FIELDS:
+            decoded = decode_data_url(report.get(field))
+            if not decoded:
+                continue
+            if dry_run:
+                key = "(dry run)"
+            else:
+                staged = store.stage(io.BytesIO(decoded[1]))
+                work_dir = Path(tempfile.mkdtemp(dir=staged.parent))
+                try:
+                    key = await pipeline.store(staged, work_dir, store, PHOTO_VARIANTS)
+                except UnsupportedImage:
+                    unreadable += 1
+                    print(f"⚠️  Session {report['session_id']}: {field} is not a readable image, left embedded")
+                    continue
+                finally:
+                    staged.unlink(missing_ok=True)
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            updates[field] = f"/api/report-photos/{key}"
+            bytes_moved += len(report[field])
+
+        if not updates:
+            continue
+
+        if not dry_run:
+            await db.training_reports.update_one({"id": report['id']}, {"$set": updates})
+        reports += 1
+        photos += len(updates)
+        print(f"✅ Session {report['session_id']}: {len(updates)} photo(s)")
+
+    print(f"\n📊 Summary: {photos} photo(s) in {reports} report(s), {bytes_moved / (1024 * 1024):.1f} MB moved out of MongoDB")
+    if unreadable:
+        print(f"⚠️  {unreadable} unreadable photo(s) left embedded")
+
+    if not dry_run:
+        # Index entries built from the embedded reports are replaced by the portal fields only
+        indexed = await rebuild_supervisor_report_index(db, datetime.now(ZoneInfo("Asia/Kuala_Lumpur")).isoformat())
+        print(f"✅ Supervisor report index refreshed for {indexed} report(s)")
+
+    pipeline.stop()
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(dry_run="--dry-run" in sys.argv))
@@ -1,14 +1,17 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from cachetools import TTLCache
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
@@ -16,11 +19,21 @@ from passlib.context import CryptContext
 import jwt
 import random
 import shutil
-import subprocess
-from docx import Document
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import tempfile
 import json
 import asyncio
+import hashlib
+import io
+from services.document_conversion import create_conversion_service, PRIORITY_HIGH, PRIORITY_LOW
+from services.certificate_template import TemplateCache, compile_template
+from services.zip_stream import stream_zip, safe_archive_name, unique_archive_names
+from services.report_renderer import create_report_renderer
+from services.job_queue import JobQueue, PermanentJobError, JOB_SUCCEEDED
+from services.llm_gateway import create_llm_gateway, format_sse
+from services.notifications import NotificationCenter
+from services.blob_store import BlobStore, BlobTooLarge, decode_data_url
+from services.image_pipeline import create_image_pipeline, variant_filename, UnsupportedImage
+from services import supervisor_reports
 
 # Malaysian Timezone (UTC+8)
 MALAYSIA_TZ = ZoneInfo("Asia/Kuala_Lumpur")
@@ -82,6 +95,40 @@ TEMPLATE_DIR.mkdir(exist_ok=True)
 CHECKLIST_PHOTOS_DIR = STATIC_DIR / "checklist_photos"
 CHECKLIST_PHOTOS_DIR.mkdir(exist_ok=True)
 
+# Training report photos, stored by content hash; report documents keep only their URLs
+report_photo_store = BlobStore(STATIC_DIR / "report_photos")
+REPORT_PHOTO_MAX_BYTES = 5 * 1024 * 1024
+REPORT_PHOTO_FIELDS = ["group_photo", "theory_photo_1", "theory_photo_2", "practical_photo_1", "practical_photo_2", "practical_photo_3"]
+
+# Pool of LibreOffice workers used for every DOCX -> PDF conversion
+conversion_service = create_conversion_service()
+report_renderer = create_report_renderer()
+
+# Photo processing (orientation, EXIF stripping, resized variants) in worker processes
+image_pipeline = create_image_pipeline()
+PHOTO_VARIANTS = ["medium", "thumb"]
+
+# LLM completions, cached by prompt fingerprint and limited to a few concurrent provider calls
+llm_gateway = create_llm_gateway(db.llm_cache)
+
+# In-app notifications with per-user unread counters
+notification_center = NotificationCenter(
+    db.notifications,
+    db.notification_counters,
+    read_ttl_days=int(os.environ.get("NOTIFICATION_READ_TTL_DAYS", "90"))
+)
+
+# Background jobs for slow report generation (handlers registered with the report routes)
+report_jobs = JobQueue(
+    db.report_jobs,
+    workers=int(os.environ.get("REPORT_JOB_WORKERS", "2")),
+    max_attempts=int(os.environ.get("REPORT_JOB_MAX_ATTEMPTS", "3"))
+)
+
+# Certificate template, compiled once into a placeholder index and reused for every render
+CERTIFICATE_TEMPLATE_PATH = TEMPLATE_DIR / "certificate_template.docx"
+certificate_templates = TemplateCache()
+
 # ============ MODELS ============
 
 class User(BaseModel):
@@ -356,6 +403,35 @@ class TrainingReportCreate(BaseModel):
     additional_notes: Optional[str] = None
     status: str = "draft"
 
+class ReportContext(BaseModel):
+    """Everything the report generators read about a session, loaded once by build_report_context"""
+    model_config = ConfigDict(frozen=True)
+    session: dict
+    program: Optional[dict] = None
+    company: Optional[dict] = None
+    participants: List[dict] = []  # Users on the session roster, in roster order
+    users: Dict[str, dict] = {}  # Roster users plus checklist/feedback authors, by id
+    test_results: List[dict] = []
+    tests_by_participant: Dict[str, Dict[str, dict]] = {}  # participant_id -> test_type -> first result
+    attendance: List[dict] = []
+    checklists: List[dict] = []
+    feedback: List[dict] = []
+    training_report: Optional[dict] = None
+    chief_trainer_feedback: Optional[dict] = None
+    coordinator_feedback: Optional[dict] = None
+    chief_trainer_template: Optional[dict] = None
+    coordinator_template: Optional[dict] = None
+    
+    def tests_of_type(self, test_type: str) -> List[dict]:
+        return [t for t in self.test_results if t.get('test_type') == test_type]
+    
+    def test_for(self, participant_id: str, test_type: str) -> Optional[dict]:
+        return self.tests_by_participant.get(participant_id, {}).get(test_type)
+    
+    def user_name(self, user_id: str, default: str = 'Unknown') -> str:
+        user = self.users.get(user_id)
+        return user.get('full_name') if user else default
+
 class Attendance(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -406,42 +482,36 @@ class SuperAdminTestSubmit(BaseModel):
     participant_id: str
     answers: List[int]
 
-# Helper function to convert DOCX to PDF
-def convert_docx_to_pdf(docx_path: Path, pdf_path: Path) -> bool:
+# Helper functions to convert DOCX to PDF (via the shared conversion service)
+async def convert_docx_to_pdf(docx_path: Path, pdf_path: Path, priority: int = PRIORITY_HIGH) -> bool:
     """Convert DOCX to PDF using LibreOffice"""
     try:
-        # Verify input file exists
         if not docx_path.exists():
             logging.error(f"DOCX file not found: {docx_path}")
             return False
         
-        # Use LibreOffice in headless mode to convert DOCX to PDF
-        result = subprocess.run([
-            'libreoffice',
-            '--headless',
-            '--convert-to', 'pdf',
-            '--outdir', str(pdf_path.parent),
-            str(docx_path)
-        ], check=True, capture_output=True, timeout=30)
-        
-        # Verify output file was created
-        if not pdf_path.exists():
+        if not await conversion_service.convert_one(docx_path, pdf_path, priority=priority):
             logging.error(f"PDF file was not created: {pdf_path}")
-            logging.error(f"LibreOffice output: {result.stdout.decode()}")
-            logging.error(f"LibreOffice errors: {result.stderr.decode()}")
             return False
         
         return True
-    except subprocess.TimeoutExpired:
-        logging.error("PDF conversion timed out after 30 seconds")
-        return False
-    except subprocess.CalledProcessError as e:
-        logging.error(f"LibreOffice conversion failed: {e.stderr.decode() if e.stderr else str(e)}")
-        return False
     except Exception as e:
         logging.error(f"PDF conversion failed: {str(e)}")
         return False
 
+async def convert_docx_batch_to_pdf(docx_paths: List[Path], pdf_dir: Path) -> dict:
+    """Convert many DOCX files to PDF, spread across the LibreOffice workers.
+    
+    Returns a dict mapping each DOCX path to its PDF path (None if that file failed).
+    """
+    if not docx_paths:
+        return {}
+    try:
+        return await conversion_service.convert(docx_paths, pdf_dir, priority=PRIORITY_LOW)
+    except Exception as e:
+        logging.error(f"Batch PDF conversion failed: {str(e)}")
+        return {docx_path: None for docx_path in docx_paths}
+
 class ChecklistItem(BaseModel):
     item: str
     status: str  # "good", "needs_repair"
@@ -638,6 +708,10 @@ class Invoice(BaseModel):
     discount: float = 0.0
     total_amount: float = 0.0
     
+    # Maintained by payments (balance_due = total_amount - amount_paid)
+    amount_paid: float = 0.0
+    balance_due: float = 0.0
+    
     # Status workflow
     status: str = "auto_draft"  # auto_draft, finance_review, approved, issued, paid, cancelled
     
@@ -686,6 +760,9 @@ class PaymentCreate(BaseModel):
     reference_number: Optional[str] = None
     notes: Optional[str] = None
 
+class PaymentReversal(BaseModel):
+    reason: str
+
 # Trainer Fee - Custom amount per trainer per session
 class TrainerFee(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -810,8 +887,7 @@ class FinanceAuditLog(BaseModel):
     entity_type: str  # invoice, payment, commission, trainer_income, coordinator_fee
     entity_id: str
     action: str  # created, updated, status_changed, deleted
-    before_value: Optional[dict] = None
-    after_value: Optional[dict] = None
+    changes: List[dict] = []  # [{"field", "from", "to"}]
     changed_by: str
     reason: Optional[str] = None
     timestamp: datetime = Field(default_factory=get_malaysia_time)
@@ -987,6 +1063,13 @@ class ReportGenerateRequest(BaseModel):
 class ReportUpdateRequest(BaseModel):
     content: str
 
+class ReportJobCreate(BaseModel):
+    job_type: str  # docx_report, ai_report, final_report, report
+    session_id: str
+
+class NotificationReadRequest(BaseModel):
+    notification_ids: Optional[List[str]] = None  # None marks all as read
+
 # ============ ROUTES ============
 
 @api_router.get("/")
@@ -1214,6 +1297,9 @@ async def update_company(company_id: str, company_data: CompanyUpdate, current_u
     company_doc = await db.companies.find_one({"id": company_id}, {"_id": 0})
     if isinstance(company_doc.get('created_at'), str):
         company_doc['created_at'] = datetime.fromisoformat(company_doc['created_at'])
+    
+    # Report search matches on the company name
+    await refresh_report_search_fields(await db.sessions.distinct("id", {"company_id": company_id}))
     return Company(**company_doc)
 
 @api_router.delete("/companies/{company_id}")
@@ -1274,6 +1360,10 @@ async def update_program(program_id: str, program_data: ProgramUpdate, current_u
     program_doc = await db.programs.find_one({"id": program_id}, {"_id": 0})
     if isinstance(program_doc.get('created_at'), str):
         program_doc['created_at'] = datetime.fromisoformat(program_doc['created_at'])
+    
+    # Report search matches on the program name
+    if "name" in update_data:
+        await refresh_report_search_fields(await db.sessions.distinct("id", {"program_id": program_id}))
     return Program(**program_doc)
 
 @api_router.delete("/programs/{program_id}")
@@ -1351,6 +1441,10 @@ async def update_user(user_id: str, user_data: dict, current_user: User = Depend
     # Update user
     await db.users.update_one({"id": user_id}, {"$set": update_data})
     
+    # Report search matches on the coordinator's name
+    if "full_name" in update_data and update_data["full_name"] != existing_user.get("full_name"):
+        await refresh_report_search_fields(await db.training_reports.distinct("session_id", {"coordinator_id": user_id}))
+    
     # Fetch and return updated user
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0})
     if isinstance(updated_user.get('created_at'), str):
@@ -1493,6 +1587,7 @@ async def create_session(session_data: SessionCreate, current_user: User = Depen
             "updated_at": get_malaysia_time().isoformat()
         }
         await db.marketing_commissions.insert_one(commission_record)
+        await invalidate_session_costing(session_obj.id)
     
     # Create participant access records
     for participant_id in processed_participant_ids:
@@ -2041,6 +2136,14 @@ async def update_session(session_id: str, session_data: dict, current_user: User
     for user_id in newly_added_participants:
         await get_or_create_participant_access(user_id, session_id)
     
+    # Keep the supervisor portal in step (supervisor_ids, name, dates, location)
+    if session.get("report_available_to_supervisors"):
+        await index_supervisor_report(session_id)
+    await refresh_report_search_fields([session_id])
+    
+    # Dates, company, programme and trainers feed the costing roll-ups
+    await invalidate_session_costing(session_id)
+    
     return {"message": "Session updated successfully"}
 
 @api_router.delete("/sessions/{session_id}")
@@ -2074,6 +2177,8 @@ async def delete_session(session_id: str, current_user: User = Depends(get_curre
         "training_reports",
         "chief_trainer_feedback",
         "coordinator_feedback",
+        "supervisor_report_index",
+        "session_costing_snapshots",
     ]
     
     for collection_name in related_collections:
@@ -2454,6 +2559,8 @@ async def mark_session_completed(session_id: str, current_user: User = Depends(g
         }
     )
     
+    await index_supervisor_report(session_id)
+    
     return {
         "message": "Session marked as completed successfully. Report is now available to supervisors.",
         "session_archived": True,
@@ -3601,6 +3708,22 @@ async def get_database_info(current_user: User = Depends(get_current_user)):
         }
     }
 
+@api_router.get("/debug/document-conversion")
+async def get_document_conversion_metrics(current_user: User = Depends(get_current_user)):
+    """Queue depth, throughput and failure counters of the LibreOffice conversion workers"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access only")
+    
+    return conversion_service.metrics()
+
+@api_router.get("/debug/llm-gateway")
+async def get_llm_gateway_metrics(current_user: User = Depends(get_current_user)):
+    """Cache hit/miss counts and concurrency of LLM calls"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access only")
+    
+    return llm_gateway.metrics()
+
 # Checklist Template Routes
 @api_router.post("/checklist-templates", response_model=ChecklistTemplate)
 async def create_checklist_template(template_data: ChecklistTemplateCreate, current_user: User = Depends(get_current_user)):
@@ -3947,12 +4070,83 @@ async def get_attendance(session_id: str, participant_id: str, current_user: Use
     return attendance_records
 
 # Training Report Routes
+def report_photo_url(key: str) -> str:
+    return f"/api/report-photos/{key}"
+
+async def store_report_photo(staged: Path) -> str:
+    """Process a staged photo like an upload (EXIF and GPS stripped, variants made) and store it; returns its key"""
+    # The processed full-size JPEG is what gets stored (and hashed); variants sit next to it
+    work_dir = Path(tempfile.mkdtemp(dir=staged.parent))
+    try:
+        return await image_pipeline.store(staged, work_dir, report_photo_store, PHOTO_VARIANTS)
+    finally:
+        staged.unlink(missing_ok=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+async def externalize_report_photos(report: dict) -> dict:
+    """Move photos still sent as base64 data URLs into the photo store, keeping their URLs"""
+    for field in REPORT_PHOTO_FIELDS:
+        decoded = decode_data_url(report.get(field))
+        if decoded:
+            try:
+                staged = await asyncio.to_thread(report_photo_store.stage, io.BytesIO(decoded[1]), REPORT_PHOTO_MAX_BYTES)
+                report[field] = report_photo_url(await store_report_photo(staged))
+            except BlobTooLarge:
+                raise HTTPException(status_code=413, detail="Image too large. Maximum size is 5MB")
+            except UnsupportedImage:
+                raise HTTPException(status_code=400, detail="Unsupported or corrupt image file")
+    return report
+
+@api_router.post("/training-reports/photos/upload")
+async def upload_training_report_photo(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    """Upload one training report photo; returns the photo_url to save in the report"""
+    if current_user.role not in ["coordinator", "admin"]:
+        raise HTTPException(status_code=403, detail="Only coordinators can upload report photos")
+    
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="Only image files are allowed")
+    
+    try:
+        staged = await asyncio.to_thread(report_photo_store.stage, file.file, REPORT_PHOTO_MAX_BYTES)
+    except BlobTooLarge:
+        raise HTTPException(status_code=413, detail="Image too large. Maximum size is 5MB")
+    
+    try:
+        key = await store_report_photo(staged)
+    except UnsupportedImage:
+        raise HTTPException(status_code=400, detail="Unsupported or corrupt image file")
+    
+    photo_url = report_photo_url(key)
+    return {
+        "photo_url": photo_url,
+        "variants": {variant: f"{photo_url}?variant={variant}" for variant in PHOTO_VARIANTS}
+    }
+
+def report_photo_path(key: str, variant: Optional[str] = None) -> Optional[Path]:
+    """File behind a report photo key; falls back to the original when the variant does not exist"""
+    if variant in PHOTO_VARIANTS and report_photo_store.exists(report_photo_store.variant_key(key, variant)):
+        return report_photo_store.path_for(report_photo_store.variant_key(key, variant))
+    if report_photo_store.exists(key):
+        return report_photo_store.path_for(key)
+    return None
+
+@api_router.get("/report-photos/{key}")
+async def get_training_report_photo(key: str, variant: Optional[str] = None):
+    """Report photo; variant=medium or variant=thumb for a smaller copy"""
+    path = report_photo_path(key, variant)
+    if not path:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    # Content-addressed: the bytes behind a key never change
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 @api_router.post("/training-reports", response_model=TrainingReport)
 async def create_training_report(report_data: TrainingReportCreate, current_user: User = Depends(get_current_user)):
     """Create or update training completion report (coordinator only)"""
     if current_user.role != "coordinator":
         raise HTTPException(status_code=403, detail="Only coordinators can create training reports")
     
+    report_data = TrainingReportCreate(**await externalize_report_photos(report_data.model_dump()))
+    
     # Check if report already exists for this session
     existing = await db.training_reports.find_one({"session_id": report_data.session_id}, {"_id": 0})
     
@@ -3966,6 +4160,8 @@ async def create_training_report(report_data: TrainingReportCreate, current_user
             {"session_id": report_data.session_id},
             {"$set": update_data}
         )
+        await index_supervisor_report(report_data.session_id)
+        await refresh_report_search_fields([report_data.session_id])
         
         updated = await db.training_reports.find_one({"session_id": report_data.session_id}, {"_id": 0})
         if isinstance(updated.get('created_at'), str):
@@ -3989,6 +4185,8 @@ async def create_training_report(report_data: TrainingReportCreate, current_user
         doc['submitted_at'] = doc['submitted_at'].isoformat()
     
     await db.training_reports.insert_one(doc)
+    await index_supervisor_report(report_data.session_id)
+    await refresh_report_search_fields([report_data.session_id])
     return report_obj
 
 @api_router.get("/training-reports/{session_id}")
@@ -4024,6 +4222,71 @@ async def get_coordinator_reports(coordinator_id: str, current_user: User = Depe
     return reports
 
 
+# Search fields of training reports
+# The admin report search filters and matches on these copies of the session, coordinator,
+# company and program details, so it runs on training_reports alone; they are refreshed
+# whenever one of those records changes.
+REPORT_SEARCH_CHUNK = 500
+
+async def refresh_report_search_fields(session_ids: List[str]) -> int:
+    """Copy the searchable details of the given sessions onto their training reports; returns how many"""
+    updated = 0
+    session_ids = list(dict.fromkeys(sid for sid in session_ids if sid))
+    for start in range(0, len(session_ids), REPORT_SEARCH_CHUNK):
+        chunk = session_ids[start:start + REPORT_SEARCH_CHUNK]
+        reports = await db.training_reports.find(
+            {"session_id": {"$in": chunk}},
+            {"_id": 0, "id": 1, "session_id": 1, "coordinator_id": 1}
+        ).to_list(None)
+        if not reports:
+            continue
+        
+        sessions = {
+            session["id"]: session for session in await db.sessions.find(
+                {"id": {"$in": chunk}},
+                {"_id": 0, "id": 1, "name": 1, "location": 1, "company_id": 1, "program_id": 1, "start_date": 1, "end_date": 1}
+            ).to_list(None)
+        }
+        coordinator_ids = list({r.get("coordinator_id") for r in reports if r.get("coordinator_id")})
+        company_ids = list({s.get("company_id") for s in sessions.values() if s.get("company_id")})
+        program_ids = list({s.get("program_id") for s in sessions.values() if s.get("program_id")})
+        coordinators, companies, programs = await asyncio.gather(
+            db.users.find({"id": {"$in": coordinator_ids}}, {"_id": 0, "id": 1, "full_name": 1}).to_list(None),
+            db.companies.find({"id": {"$in": company_ids}}, {"_id": 0, "id": 1, "name": 1}).to_list(None),
+            db.programs.find({"id": {"$in": program_ids}}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+        )
+        coordinator_names = {u["id"]: u.get("full_name") for u in coordinators}
+        company_names = {c["id"]: c.get("name") for c in companies}
+        program_names = {p["id"]: p.get("name") for p in programs}
+        
+        operations = []
+        for report in reports:
+            session = sessions.get(report["session_id"], {})
+            names = [
+                session.get("name"),
+                coordinator_names.get(report.get("coordinator_id")),
+                company_names.get(session.get("company_id")),
+                program_names.get(session.get("program_id")),
+                session.get("location")
+            ]
+            operations.append(UpdateOne({"id": report["id"]}, {"$set": {
+                "company_id": session.get("company_id"),
+                "program_id": session.get("program_id"),
+                "session_start_date": session.get("start_date"),
+                "session_end_date": session.get("end_date"),
+                # Lower-cased, so search is a case-sensitive regex the index can serve
+                "search_text": "\n".join(name for name in names if name).lower()
+            }}))
+        await db.training_reports.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+async def backfill_report_search_fields() -> int:
+    """Set the search fields on reports saved before they existed"""
+    return await refresh_report_search_fields(
+        await db.training_reports.distinct("session_id", {"search_text": {"$exists": False}})
+    )
+
 @api_router.get("/training-reports/admin/all")
 async def get_all_training_reports(
     search: Optional[str] = None,
@@ -4032,125 +4295,184 @@ async def get_all_training_reports(
     status: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    page: int = 1,
+    limit: int = 50,
     current_user: User = Depends(get_current_user)
 ):
-    """Get all training reports with search and filter - Admin only"""
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Admin access only")
+    """Get all training reports with search and filter - Admin only.
     
-    # Build query
-    query = {"status": "submitted"}  # Only show submitted reports
-    
-    if status:
-        query["status"] = status
+    Filters and search run on the reports' own indexed copies of the session details
+    (refresh_report_search_fields), sorted by submission date; sessions, coordinators,
+    companies and programs are joined for the requested page only. Most recently
+    submitted first.
+    """
+    import re
     
-    # Get all submitted reports
-    reports = await db.training_reports.find(query, {"_id": 0}).to_list(1000)
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access only")
     
-    # Enrich each report with session, coordinator, company, program details
-    enriched_reports = []
+    page = max(1, page)
+    limit = max(1, min(limit, 200))
     
-    for report in reports:
-        session = await db.sessions.find_one({"id": report['session_id']}, {"_id": 0})
-        if not session:
-            continue
-        
-        # Get coordinator details
-        coordinator = await db.users.find_one({"id": report.get('coordinator_id')}, {"_id": 0})
-        
-        # Get company and program details
-        company = await db.companies.find_one({"id": session.get('company_id')}, {"_id": 0})
-        program = await db.programs.find_one({"id": session.get('program_id')}, {"_id": 0})
-        
-        # Get participant count
-        participant_count = len(session.get('participant_ids', []))
-        
-        # Apply filters
-        if company_id and session.get('company_id') != company_id:
-            continue
-        
-        if program_id and session.get('program_id') != program_id:
-            continue
-        
-        # Apply date filter
-        if start_date:
-            session_date = session.get('start_date')
-            if session_date and session_date < start_date:
-                continue
-        
-        if end_date:
-            session_date = session.get('end_date')
-            if session_date and session_date > end_date:
-                continue
-        
-        # Build enriched report
-        enriched = {
-            **report,
-            "session_name": session.get('name', 'Unknown'),
-            "session_start_date": session.get('start_date'),
-            "session_end_date": session.get('end_date'),
-            "session_location": session.get('location'),
-            "coordinator_name": coordinator.get('full_name') if coordinator else 'Unknown',
-            "company_name": company.get('name') if company else 'Unknown',
-            "company_id": session.get('company_id'),
-            "program_name": program.get('name') if program else 'Unknown',
-            "program_id": session.get('program_id'),
-            "participant_count": participant_count
-        }
-        
-        # Apply search filter
-        if search:
-            search_lower = search.lower()
-            searchable_text = f"{enriched['session_name']} {enriched['coordinator_name']} {enriched['company_name']} {enriched['program_name']} {enriched['session_location']}".lower()
-            
-            if search_lower not in searchable_text:
-                continue
-        
-        enriched_reports.append(enriched)
+    query = {"status": status or "submitted"}  # Only show submitted reports by default
+    if company_id:
+        query["company_id"] = company_id
+    if program_id:
+        query["program_id"] = program_id
+    if start_date:
+        query["session_start_date"] = {"$gte": start_date}
+    if end_date:
+        query["session_end_date"] = {"$lte": end_date}
+    if search:
+        query["search_text"] = {"$regex": re.escape(search.lower())}
+    
+    total, rows = await asyncio.gather(
+        db.training_reports.count_documents(query),
+        db.training_reports.aggregate([
+            {"$match": query},
+            {"$sort": {"submitted_at": -1, "id": 1}},
+            {"$skip": (page - 1) * limit},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "search_text": 0}},
+            {"$lookup": {
+                "from": "sessions",
+                "localField": "session_id",
+                "foreignField": "id",
+                "as": "session"
+            }},
+            {"$lookup": {
+                "from": "users",
+                "localField": "coordinator_id",
+                "foreignField": "id",
+                "as": "coordinator"
+            }},
+            {"$lookup": {
+                "from": "companies",
+                "localField": "company_id",
+                "foreignField": "id",
+                "as": "company"
+            }},
+            {"$lookup": {
+                "from": "programs",
+                "localField": "program_id",
+                "foreignField": "id",
+                "as": "program"
+            }}
+        ]).to_list(limit)
+    )
     
-    # Sort by submitted date (most recent first)
-    enriched_reports.sort(key=lambda x: x.get('submitted_at', ''), reverse=True)
+    # Report fields first, session details on top (same shape as before)
+    reports = []
+    for row in rows:
+        session = (row.pop("session") or [{}])[0]
+        coordinator = (row.pop("coordinator") or [{}])[0]
+        company = (row.pop("company") or [{}])[0]
+        program = (row.pop("program") or [{}])[0]
+        reports.append({
+            **row,
+            "session_name": session.get("name") or "Unknown",
+            "session_start_date": session.get("start_date"),
+            "session_end_date": session.get("end_date"),
+            "session_location": session.get("location"),
+            "coordinator_name": coordinator.get("full_name") or "Unknown",
+            "company_name": company.get("name") or "Unknown",
+            "company_id": session.get("company_id"),
+            "program_name": program.get("name") or "Unknown",
+            "program_id": session.get("program_id"),
+            "participant_count": len(session.get("participant_ids") or [])
+        })
     
     return {
-        "total": len(enriched_reports),
-        "reports": enriched_reports
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "has_more": page * limit < total,
+        "reports": reports
     }
 
 
-@api_router.post("/training-reports/{session_id}/generate-ai-report")
-async def generate_ai_report(session_id: str, current_user: User = Depends(get_current_user)):
-    """Generate AI training report using ChatGPT"""
-    if current_user.role != "coordinator" and current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only coordinators can generate reports")
+# Report context
+async def build_report_context(session_id: str) -> Optional[ReportContext]:
+    """Load all data used by the report generators with one query per collection.
     
-    from emergentintegrations.llm.chat import LlmChat, UserMessage, FileContentWithMimeType
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    # Get session details
+    Returns None if the session does not exist.
+    """
     session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
     if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+        return None
     
-    # Get program details
-    program = await db.programs.find_one({"id": session['program_id']}, {"_id": 0})
+    participant_ids = session.get('participant_ids', [])
+    user_projection = {"_id": 0, "password": 0}
+    
+    (
+        program, company, roster_users, test_results, attendance, checklists, feedback,
+        training_report, chief_trainer_feedback, coordinator_feedback, templates
+    ) = await asyncio.gather(
+        db.programs.find_one({"id": session.get('program_id')}, {"_id": 0}) if session.get('program_id') else asyncio.sleep(0),
+        db.companies.find_one({"id": session.get('company_id')}, {"_id": 0}) if session.get('company_id') else asyncio.sleep(0),
+        db.users.find({"id": {"$in": participant_ids}}, user_projection).to_list(None),
+        db.test_results.find({"session_id": session_id}, {"_id": 0}).to_list(None),
+        db.attendance.find({"session_id": session_id}, {"_id": 0}).to_list(None),
+        db.vehicle_checklists.find({"session_id": session_id}, {"_id": 0}).to_list(None),
+        db.course_feedback.find({"session_id": session_id}, {"_id": 0}).to_list(None),
+        db.training_reports.find_one({"session_id": session_id}, {"_id": 0}),
+        db.chief_trainer_feedback.find_one({"session_id": session_id}, {"_id": 0}),
+        db.coordinator_feedback.find_one({"session_id": session_id}, {"_id": 0}),
+        db.feedback_templates.find(
+            {"id": {"$in": ["chief_trainer_feedback_template", "coordinator_feedback_template"]}},
+            {"_id": 0}
+        ).to_list(None)
+    )
     
-    # Get company details
-    company = await db.companies.find_one({"id": session['company_id']}, {"_id": 0})
+    users = {u['id']: u for u in roster_users}
+    
+    # Checklists and feedback can come from people no longer on the roster
+    missing_ids = {d['participant_id'] for d in checklists + feedback if d.get('participant_id') not in users}
+    if missing_ids:
+        for user in await db.users.find({"id": {"$in": list(missing_ids)}}, user_projection).to_list(None):
+            users[user['id']] = user
+    
+    tests_by_participant = {}
+    for result in test_results:
+        tests_by_participant.setdefault(result.get('participant_id'), {}).setdefault(result.get('test_type'), result)
+    
+    templates_by_id = {t['id']: t for t in templates}
+    
+    return ReportContext(
+        session=session,
+        program=program,
+        company=company,
+        participants=[users[pid] for pid in participant_ids if pid in users],
+        users=users,
+        test_results=test_results,
+        tests_by_participant=tests_by_participant,
+        attendance=attendance,
+        checklists=checklists,
+        feedback=feedback,
+        training_report=training_report,
+        chief_trainer_feedback=chief_trainer_feedback,
+        coordinator_feedback=coordinator_feedback,
+        chief_trainer_template=templates_by_id.get("chief_trainer_feedback_template"),
+        coordinator_template=templates_by_id.get("coordinator_feedback_template")
+    )
+
+AI_REPORT_DATE_PLACEHOLDER = "{report_date}"
+AI_REPORT_SYSTEM_MESSAGE = "You are a professional training report writer specializing in defensive driving and road safety training programs."
+
+def build_ai_report_prompt(report_context: ReportContext):
+    """Prompt for the AI training report, plus the statistics it was built from.
     
-    # Get participants count
+    The report date is left as AI_REPORT_DATE_PLACEHOLDER: the prompt is the LLM cache key,
+    and the date would otherwise make every day's prompt new (see prepare_ai_report).
+    """
+    session = report_context.session
+    program = report_context.program
+    company = report_context.company
     participant_count = len(session.get('participant_ids', []))
-    
-    # Get attendance records
-    attendance_records = await db.attendance.find({"session_id": session_id}, {"_id": 0}).to_list(1000)
-    total_attendance = len(set([r['participant_id'] for r in attendance_records]))
-    
-    # Get test results
-    test_results = await db.test_results.find({"session_id": session_id}, {"_id": 0}).to_list(1000)
+    total_attendance = len(set([r['participant_id'] for r in report_context.attendance]))
+    test_results = report_context.test_results
     passed_tests = len([r for r in test_results if r.get('passed', False)])
-    
-    # Get training report with photos
-    training_report = await db.training_reports.find_one({"session_id": session_id}, {"_id": 0})
+    training_report = report_context.training_report
     
     # Build context for AI
     context = f"""
@@ -4218,41 +4540,97 @@ Assessment Pass Rate: {passed_tests} out of {len(test_results)} passed
 
 ---
 Report Prepared By: Training Coordinator
-Date: {get_malaysia_time().strftime('%Y-%m-%d')}
+Date: {AI_REPORT_DATE_PLACEHOLDER}
 
 Please generate this report professionally with proper formatting, specific details based on the data provided, and maintain a formal tone suitable for official documentation.
 """
     
+    metadata = {
+        "participant_count": participant_count,
+        "attendance_rate": f"{total_attendance}/{participant_count}",
+        "test_pass_rate": f"{passed_tests}/{len(test_results)}",
+        "photos_included": bool(training_report)
+    }
+    return context, metadata
+
+async def prepare_ai_report(session_id: str, current_user: User):
+    """Check access and build the AI report prompt; returns (api key, prompt, cache key, metadata).
+    
+    The cache key is the prompt without today's date, so the same session data keeps hitting
+    the LLM cache on later days.
+    """
+    if current_user.role != "coordinator" and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only coordinators can generate reports")
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    report_context = await build_report_context(session_id)
+    if not report_context:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    api_key = os.environ.get('EMERGENT_LLM_KEY', '')
+    if not api_key:
+        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
+    
+    cache_key, metadata = build_ai_report_prompt(report_context)
+    context = cache_key.replace(AI_REPORT_DATE_PLACEHOLDER, get_malaysia_time().strftime('%Y-%m-%d'))
+    return api_key, context, cache_key, metadata
+
+@api_router.post("/training-reports/{session_id}/generate-ai-report")
+async def generate_ai_report(session_id: str, current_user: User = Depends(get_current_user), refresh: bool = False):
+    """Generate AI training report using ChatGPT.
+    
+    The same data produces the same prompt, so a repeat generation is served from the LLM
+    cache; pass refresh=true to ask the model again.
+    """
+    api_key, context, cache_key, metadata = await prepare_ai_report(session_id, current_user)
+    
     try:
-        # Initialize LLM Chat
-        api_key = os.environ.get('EMERGENT_LLM_KEY', '')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
-        
-        chat = LlmChat(
+        ai_response, cached = await llm_gateway.complete(
+            context,
             api_key=api_key,
+            system_message=AI_REPORT_SYSTEM_MESSAGE,
             session_id=f"report_{session_id}",
-            system_message="You are a professional training report writer specializing in defensive driving and road safety training programs."
-        ).with_model("openai", "gpt-4o")
-        
-        user_message = UserMessage(text=context)
-        
-        # Generate report
-        ai_response = await chat.send_message(user_message)
-        
-        return {
-            "session_id": session_id,
-            "generated_report": ai_response,
-            "metadata": {
-                "participant_count": participant_count,
-                "attendance_rate": f"{total_attendance}/{participant_count}",
-                "test_pass_rate": f"{passed_tests}/{len(test_results)}",
-                "photos_included": bool(training_report)
-            }
-        }
-        
+            refresh=refresh,
+            cache_key=cache_key
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate AI report: {str(e)}")
+    
+    return {
+        "session_id": session_id,
+        "generated_report": ai_response,
+        "cached": cached,
+        "metadata": metadata
+    }
+
+@api_router.post("/training-reports/{session_id}/generate-ai-report/stream")
+async def stream_ai_report(session_id: str, current_user: User = Depends(get_current_user), refresh: bool = False):
+    """Generate the AI training report as a server-sent event stream.
+    
+    Events: metadata, queued (waiting for a free LLM slot), started, heartbeat, content
+    (pieces of the report text), then done or error.
+    """
+    api_key, context, cache_key, metadata = await prepare_ai_report(session_id, current_user)
+    
+    async def events():
+        yield format_sse({"type": "metadata", "session_id": session_id, "metadata": metadata})
+        async for event in llm_gateway.stream(
+            context,
+            api_key=api_key,
+            system_message=AI_REPORT_SYSTEM_MESSAGE,
+            session_id=f"report_{session_id}",
+            refresh=refresh,
+            cache_key=cache_key
+        ):
+            yield format_sse(event)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # Professional DOCX Report Generation
@@ -4265,12 +4643,13 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
     
     try:
         # Gather all session data
-        session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
-        if not session:
+        report_context = await build_report_context(session_id)
+        if not report_context:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        program = await db.programs.find_one({"id": session.get('program_id')}, {"_id": 0}) if session.get('program_id') else None
-        company = await db.companies.find_one({"id": session.get('company_id')}, {"_id": 0}) if session.get('company_id') else None
+        session = report_context.session
+        program = report_context.program
+        company = report_context.company
         
         # Validate required data
         if not program:
@@ -4278,40 +4657,24 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
         if not company:
             raise HTTPException(status_code=400, detail="Company not found for this session. Please ensure the session has a valid company assigned.")
         
-        # Get participants with full details
-        participant_ids = session.get('participant_ids', [])
+        # Participants with pre and post test results
         participants = []
-        for pid in participant_ids:
-            user = await db.users.find_one({"id": pid}, {"_id": 0})
-            if user:
-                # Get pre and post test results
-                pre_test = await db.test_results.find_one({
-                    "participant_id": pid,
-                    "session_id": session_id,
-                    "test_type": "pre"
-                }, {"_id": 0})
-                
-                post_test = await db.test_results.find_one({
-                    "participant_id": pid,
-                    "session_id": session_id,
-                    "test_type": "post"
-                }, {"_id": 0})
-                
-                participants.append({
-                    "name": user.get('full_name'),
-                    "id_number": user.get('id_number', 'N/A'),
-                    "pre_test_score": pre_test.get('score', 0) if pre_test else 0,
-                    "pre_test_passed": pre_test.get('passed', False) if pre_test else False,
-                    "post_test_score": post_test.get('score', 0) if post_test else 0,
-                    "post_test_passed": post_test.get('passed', False) if post_test else False,
-                    "improvement": (post_test.get('score', 0) if post_test else 0) - (pre_test.get('score', 0) if pre_test else 0)
-                })
+        for user in report_context.participants:
+            pre_test = report_context.test_for(user['id'], "pre")
+            post_test = report_context.test_for(user['id'], "post")
+            participants.append({
+                "name": user.get('full_name'),
+                "id_number": user.get('id_number', 'N/A'),
+                "pre_test_score": pre_test.get('score', 0) if pre_test else 0,
+                "pre_test_passed": pre_test.get('passed', False) if pre_test else False,
+                "post_test_score": post_test.get('score', 0) if post_test else 0,
+                "post_test_passed": post_test.get('passed', False) if post_test else False,
+                "improvement": (post_test.get('score', 0) if post_test else 0) - (pre_test.get('score', 0) if pre_test else 0)
+            })
         
-        # Get vehicle checklists with issues
-        checklists = await db.vehicle_checklists.find({"session_id": session_id}, {"_id": 0}).to_list(100)
+        # Vehicle checklists with issues
         vehicle_issues = []
-        for checklist in checklists:
-            participant = await db.users.find_one({"id": checklist['participant_id']}, {"_id": 0})
+        for checklist in report_context.checklists:
             issues_list = []
             for item in checklist.get('checklist_items', []):
                 if item.get('status') == 'needs_repair':
@@ -4323,12 +4686,12 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
             
             if issues_list:
                 vehicle_issues.append({
-                    "participant_name": participant.get('full_name') if participant else 'Unknown',
+                    "participant_name": report_context.user_name(checklist['participant_id']),
                     "issues": issues_list
                 })
         
-        # Get training photos from training report
-        training_report = await db.training_reports.find_one({"session_id": session_id}, {"_id": 0})
+        # Training photos from training report
+        training_report = report_context.training_report
         training_photos = {
             "group_photo": training_report.get('group_photo') if training_report else None,
             "theory_photo_1": training_report.get('theory_photo_1') if training_report else None,
@@ -4337,826 +4700,61 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
             "practical_photo_2": training_report.get('practical_photo_2') if training_report else None,
             "practical_photo_3": training_report.get('practical_photo_3') if training_report else None
         }
-        
-        # Get participant feedback
-        all_feedback = await db.course_feedback.find({"session_id": session_id}, {"_id": 0}).to_list(100)
-        feedback_data = []
-        for feedback in all_feedback:
-            participant = await db.users.find_one({"id": feedback['participant_id']}, {"_id": 0})
-            feedback_data.append({
-                "participant_name": participant.get('full_name') if participant else 'Unknown',
+        # Stored photos are embedded in the document (medium size); others stay as links
+        training_photo_files = {}
+        for field, url in training_photos.items():
+            if url and url.startswith("/api/report-photos/"):
+                path = report_photo_path(url.rsplit("/", 1)[1].split("?")[0], "medium")
+                if path:
+                    training_photo_files[field] = str(path)
+        
+        # Participant feedback
+        feedback_data = [
+            {
+                "participant_name": report_context.user_name(feedback['participant_id']),
                 "responses": feedback.get('responses', [])
-            })
-        
-        # Determine vehicle type from program name for objectives
-        program_name_lower = program.get('name', '').lower()
-        is_motorcycle = 'motor' in program_name_lower or 'bike' in program_name_lower or 'rider' in program_name_lower
-        is_truck = 'truck' in program_name_lower or 'lorry' in program_name_lower or 'heavy' in program_name_lower
-        
-        # Create DOCX document with enhanced formatting
-        doc = Document()
-        
-        # COVER PAGE
-        title = doc.add_heading('DEFENSIVE DRIVING/RIDING TRAINING', 0)
-        title.alignment = 1  # Center alignment
-        subtitle = doc.add_heading('COMPREHENSIVE COMPLETION REPORT', 0)
-        subtitle.alignment = 1
-        doc.add_paragraph()
-        doc.add_paragraph()
-        
-        # Cover details in a cleaner format
-        cover_table = doc.add_table(rows=7, cols=2)
-        cover_table.style = 'Light List Accent 1'
-        cover_details = [
-            ('Program:', program.get('name', 'N/A')),
-            ('Company:', company.get('name', 'N/A')),
-            ('Location:', session.get('location', 'N/A')),
-            ('Training Period:', f"{session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}"),
-            ('Participants:', str(len(participants))),
-            ('Submitted by:', current_user.full_name),
-            ('Date:', get_malaysia_time().strftime('%Y-%m-%d'))
-        ]
-        for idx, (label, value) in enumerate(cover_details):
-            cover_table.rows[idx].cells[0].text = label
-            cover_table.rows[idx].cells[1].text = value
-        
-        doc.add_paragraph()
-        doc.add_paragraph()
-        footer_text = doc.add_paragraph('Prepared by: MDDRC (Malaysian Defensive Driving & Riding Centre)')
-        footer_text.alignment = 1
-        doc.add_page_break()
-        
-        # EXECUTIVE SUMMARY - COMPREHENSIVE
-        doc.add_heading('1. EXECUTIVE SUMMARY', 1)
-        pre_avg = sum([p['pre_test_score'] for p in participants]) / len(participants) if participants else 0
-        post_avg = sum([p['post_test_score'] for p in participants]) / len(participants) if participants else 0
-        improvement = post_avg - pre_avg
-        
-        # Count pass/fail statistics
-        pre_pass_count = sum([1 for p in participants if p['pre_test_passed']])
-        post_pass_count = sum([1 for p in participants if p['post_test_passed']])
-        improved_count = sum([1 for p in participants if p['improvement'] > 0])
-        
-        doc.add_paragraph(
-            f"This comprehensive report documents the Defensive {'Riding' if is_motorcycle else 'Driving'} Training "
-            f"conducted for {company.get('name', 'N/A')} at {session.get('location', 'N/A')} from "
-            f"{session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}. The program was designed to "
-            f"enhance safety awareness, reinforce defensive {'riding' if is_motorcycle else 'driving'} techniques, "
-            f"and reduce commuting-related accidents, aligning with the company's commitment to employee safety."
-        )
-        doc.add_paragraph()
-        
-        doc.add_paragraph(
-            f"The training program successfully engaged {len(participants)} participants through a structured "
-            f"curriculum combining theoretical instruction and practical hands-on sessions. Participants demonstrated "
-            f"high engagement levels and openness to feedback, contributing to a positive learning environment."
-        )
-        doc.add_paragraph()
-        
-        # KEY OUTCOMES heading
-        doc.add_paragraph("KEY OUTCOMES:", style='Heading 3')
-        outcomes = [
-            f"• Total Participants: {len(participants)}",
-            f"• Pre-Training Assessment Average: {pre_avg:.1f}%",
-            f"• Post-Training Assessment Average: {post_avg:.1f}%",
-            f"• Overall Improvement: {improvement:+.1f}%",
-            f"• Pre-Test Pass Rate: {pre_pass_count}/{len(participants)} ({(pre_pass_count/len(participants)*100):.0f}% if len(participants) > 0 else 0)",
-            f"• Post-Test Pass Rate: {post_pass_count}/{len(participants)} ({(post_pass_count/len(participants)*100):.0f}% if len(participants) > 0 else 0)",
-            f"• Participants Showing Improvement: {improved_count}/{len(participants)} ({(improved_count/len(participants)*100):.0f}% if len(participants) > 0 else 0)"
+            }
+            for feedback in report_context.feedback
         ]
-        for outcome in outcomes:
-            doc.add_paragraph(outcome)
-        doc.add_paragraph()
-        
-        # TRAINING IMPACT
-        doc.add_paragraph("TRAINING IMPACT:", style='Heading 3')
-        doc.add_paragraph(
-            f"The training successfully enhanced participants' understanding of hazard awareness, proper braking control, "
-            f"and {'balance techniques' if is_motorcycle else 'vehicle control'}. Participants demonstrated improved ability "
-            f"to identify potential road hazards and apply defensive {'riding' if is_motorcycle else 'driving'} principles. "
-            f"The program fostered a culture of safety discipline and mutual learning among participants."
-        )
-        doc.add_paragraph()
-        
-        # SAFETY OBSERVATIONS (if vehicle issues found)
-        if vehicle_issues:
-            doc.add_paragraph("SAFETY OBSERVATIONS:", style='Heading 3')
-            doc.add_paragraph(
-                f"Vehicle inspections revealed {len(vehicle_issues)} {'motorcycles' if is_motorcycle else 'vehicles'} "
-                f"with safety concerns requiring immediate attention. Detailed recommendations for addressing these issues "
-                f"are provided in Section 9 of this report."
-            )
         
-        doc.add_page_break()
-        
-        # TRAINING OBJECTIVES
-        doc.add_heading('2. TRAINING OBJECTIVES', 1)
-        doc.add_paragraph(
-            "This training program was designed with the following core objectives to enhance workplace safety and reduce accident risks:"
-        )
-        doc.add_paragraph()
-        
-        if is_motorcycle:
-            objectives = [
-                "• Improve rider safety awareness and hazard recognition on Malaysian roads",
-                "• Reinforce defensive riding techniques for daily commuting",
-                "• Reduce motorcycle-related accidents and injuries among employees",
-                "• Promote proper Personal Protective Equipment (PPE) usage and motorcycle maintenance",
-                "• Align riding behavior with company safety values and policies",
-                "• Develop emergency response skills for critical road situations"
-            ]
-        elif is_truck:
-            objectives = [
-                "• Enhance heavy vehicle safety awareness and load management",
-                "• Reinforce defensive driving techniques for commercial vehicles",
-                "• Reduce delivery delays caused by accidents and vehicle breakdowns",
-                "• Improve vehicle pre-trip inspection and maintenance practices",
-                "• Minimize company liability and insurance costs through safer driving",
-                "• Align driving behavior with company safety standards and regulations"
-            ]
-        else:  # Car/general driving
-            objectives = [
-                "• Improve driver safety awareness and hazard perception",
-                "• Reinforce defensive driving techniques for daily operations",
-                "• Reduce vehicle-related accidents and associated costs",
-                "• Promote proper vehicle maintenance and pre-drive safety checks",
-                "• Align driving behavior with company safety policies",
-                "• Develop emergency response and accident avoidance skills"
-            ]
+        # Everything the renderer needs is in render_context; rendering itself never touches the database
+        render_context = {
+            "session": session,
+            "program": program,
+            "company": company,
+            "participants": participants,
+            "vehicle_issues": vehicle_issues,
+            "training_photos": training_photos,
+            "training_photo_files": training_photo_files,
+            "feedback_data": feedback_data,
+            "chief_trainer_feedback": report_context.chief_trainer_feedback,
+            "chief_trainer_template": report_context.chief_trainer_template,
+            "coordinator_feedback": report_context.coordinator_feedback,
+            "coordinator_template": report_context.coordinator_template,
+            "prepared_by": current_user.full_name,
+            "report_date": get_malaysia_time().strftime('%Y-%m-%d')
+        }
         
-        for objective in objectives:
-            doc.add_paragraph(objective)
-        doc.add_paragraph()
-        doc.add_paragraph(
-            "These objectives support the organization's commitment to employee welfare and operational excellence "
-            "through enhanced road safety practices."
-        )
-        doc.add_page_break()
+        # Render the DOCX in the report worker pool
+        report_filename = f"Training_Report_{session_id}_{get_malaysia_time().strftime('%Y%m%d_%H%M%S')}.docx"
+        report_path = REPORT_DIR / report_filename
+        await report_renderer.render(render_context, str(report_path))
         
-        # TRAINING AGENDA
-        doc.add_heading('3. TRAINING AGENDA', 1)
-        doc.add_paragraph(
-            f"The training was conducted over a {2 if is_motorcycle else 2}-day period, combining theoretical instruction "
-            f"with practical hands-on sessions:"
+        # Update training report record with DOCX filename
+        await db.training_reports.update_one(
+            {"session_id": session_id},
+            {"$set": {"docx_filename": report_filename, "generated_at": get_malaysia_time().isoformat()}},
+            upsert=True
         )
-        doc.add_paragraph()
-        
-        # DAY 1
-        doc.add_heading('DAY 1 - Theory & Foundation', 2)
-        if is_motorcycle:
-            day1_items = [
-                ('08:00 - 08:30', 'Registration & Welcome Briefing'),
-                ('08:30 - 10:00', 'Hazard Recognition & Road Awareness'),
-                ('10:00 - 10:15', 'Break'),
-                ('10:15 - 12:00', 'Safe Distance Management & Speed Control'),
-                ('12:00 - 13:00', 'Lunch'),
-                ('13:00 - 14:30', 'Traffic Law & Regulations Review'),
-                ('14:30 - 14:45', 'Break'),
-                ('14:45 - 16:30', 'Fatigue Management & Weather Conditions'),
-                ('16:30 - 17:00', 'Pre-Test Assessment & Day 1 Review')
-            ]
-        else:
-            day1_items = [
-                ('08:00 - 08:30', 'Registration & Welcome Briefing'),
-                ('08:30 - 10:00', 'Defensive Driving Principles & Hazard Recognition'),
-                ('10:00 - 10:15', 'Break'),
-                ('10:15 - 12:00', 'Safe Following Distance & Speed Management'),
-                ('12:00 - 13:00', 'Lunch'),
-                ('13:00 - 14:30', 'Traffic Law & Road Safety Regulations'),
-                ('14:30 - 14:45', 'Break'),
-                ('14:45 - 16:30', 'Driver Fatigue & Weather Driving Conditions'),
-                ('16:30 - 17:00', 'Pre-Test Assessment & Day 1 Summary')
-            ]
-        
-        agenda_table_day1 = doc.add_table(rows=len(day1_items)+1, cols=2)
-        agenda_table_day1.style = 'Light Grid Accent 1'
-        agenda_table_day1.rows[0].cells[0].text = 'Time'
-        agenda_table_day1.rows[0].cells[1].text = 'Activity'
-        for idx, (time, activity) in enumerate(day1_items, 1):
-            agenda_table_day1.rows[idx].cells[0].text = time
-            agenda_table_day1.rows[idx].cells[1].text = activity
-        
-        doc.add_paragraph()
-        
-        # DAY 2
-        doc.add_heading('DAY 2 - Practical Skills & Assessment', 2)
-        if is_motorcycle:
-            day2_items = [
-                ('08:00 - 08:30', 'Day 2 Safety Briefing & PPE Check'),
-                ('08:30 - 10:00', 'Emergency Braking Techniques (Practical)'),
-                ('10:00 - 10:15', 'Break'),
-                ('10:15 - 12:00', 'Obstacle Avoidance & Swerving Maneuvers'),
-                ('12:00 - 13:00', 'Lunch'),
-                ('13:00 - 14:30', 'Cornering Techniques & Body Positioning'),
-                ('14:30 - 14:45', 'Break'),
-                ('14:45 - 16:00', 'Left Lane Riding & Traffic Integration'),
-                ('16:00 - 16:45', 'Post-Test Assessment'),
-                ('16:45 - 17:00', 'Certificate Presentation & Closing')
-            ]
-        else:
-            day2_items = [
-                ('08:00 - 08:30', 'Day 2 Safety Briefing & Vehicle Check'),
-                ('08:30 - 10:00', 'Emergency Braking & Stopping Techniques'),
-                ('10:00 - 10:15', 'Break'),
-                ('10:15 - 12:00', 'Obstacle Avoidance & Lane Change Maneuvers'),
-                ('12:00 - 13:00', 'Lunch'),
-                ('13:00 - 14:30', 'Cornering & Vehicle Control Exercises'),
-                ('14:30 - 14:45', 'Break'),
-                ('14:45 - 16:00', 'Traffic Integration & Road Scenarios'),
-                ('16:00 - 16:45', 'Post-Test Assessment & Performance Review'),
-                ('16:45 - 17:00', 'Certificate Presentation & Program Closure')
-            ]
-        
-        agenda_table_day2 = doc.add_table(rows=len(day2_items)+1, cols=2)
-        agenda_table_day2.style = 'Light Grid Accent 1'
-        agenda_table_day2.rows[0].cells[0].text = 'Time'
-        agenda_table_day2.rows[0].cells[1].text = 'Activity'
-        for idx, (time, activity) in enumerate(day2_items, 1):
-            agenda_table_day2.rows[idx].cells[0].text = time
-            agenda_table_day2.rows[idx].cells[1].text = activity
-        
-        doc.add_page_break()
-        
-        # TRAINING DETAILS
-        doc.add_heading('4. TRAINING DETAILS', 1)
-        doc.add_paragraph(f"Program: {program.get('name', 'N/A')}")
-        doc.add_paragraph(f"Location: {session.get('location', 'N/A')}")
-        doc.add_paragraph(f"Dates: {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}")
-        doc.add_paragraph(f"Total Participants: {len(participants)}")
-        doc.add_paragraph()
-        doc.add_paragraph("Participants List:")
-        table = doc.add_table(rows=1, cols=2)
-        table.style = 'Light Grid Accent 1'
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Name'
-        hdr_cells[1].text = 'ID Number'
-        for p in participants:
-            row_cells = table.add_row().cells
-            row_cells[0].text = p['name']
-            row_cells[1].text = str(p['id_number'])
-        doc.add_page_break()
-        
-        # PRE-POST EVALUATION SUMMARY
-        doc.add_heading('5. PRE-POST EVALUATION SUMMARY', 1)
-        # Summary statistics
-        doc.add_paragraph(f"Pre-Test Pass Rate: {pre_pass_count}/{len(participants)} participants ({(pre_pass_count/len(participants)*100):.0f}%)")
-        doc.add_paragraph(f"Post-Test Pass Rate: {post_pass_count}/{len(participants)} participants ({(post_pass_count/len(participants)*100):.0f}%)")
-        doc.add_paragraph(f"Participants Showing Improvement: {improved_count}/{len(participants)} ({(improved_count/len(participants)*100):.0f}%)")
-        doc.add_paragraph(f"Average Score Change: {improvement:+.1f}%")
-        doc.add_paragraph()
-        
-        # Performance Summary Table
-        doc.add_paragraph("TABULATED RESULTS:", style='Heading 3')
-        table = doc.add_table(rows=1, cols=6)
-        table.style = 'Light Grid Accent 1'
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Participant'
-        hdr_cells[1].text = 'ID Number'
-        hdr_cells[2].text = 'Pre-Test'
-        hdr_cells[3].text = 'Post-Test'
-        hdr_cells[4].text = 'Improvement'
-        hdr_cells[5].text = 'Status'
-        
-        for p in participants:
-            row_cells = table.add_row().cells
-            row_cells[0].text = p['name']
-            row_cells[1].text = str(p['id_number'])
-            row_cells[2].text = f"{p['pre_test_score']:.0f}%"
-            row_cells[3].text = f"{p['post_test_score']:.0f}%"
-            row_cells[4].text = f"{p['improvement']:+.0f}%"
-            row_cells[5].text = 'PASS' if p['post_test_passed'] else 'FAIL'
-        
-        doc.add_page_break()
-        
-        # DETAILED PERFORMANCE ANALYSIS WITH INSIGHTS
-        doc.add_heading('6. DETAILED PERFORMANCE ANALYSIS', 1)
-        doc.add_paragraph("Individual participant performance with remarks and recommendations:")
-        doc.add_paragraph()
-        
-        for idx, p in enumerate(participants, 1):
-            doc.add_paragraph(f"{idx}. {p['name']} (ID: {p['id_number']})", style='Heading 3')
-            perf_text = f"   Pre-Test: {p['pre_test_score']:.0f}% | Post-Test: {p['post_test_score']:.0f}% | Change: {p['improvement']:+.0f}%"
-            doc.add_paragraph(perf_text)
-            
-            # Generate performance remarks based on improvement
-            if p['improvement'] >= 20:
-                remark = "EXCELLENT IMPROVEMENT - Participant demonstrated exceptional learning and engagement. Strong grasp of defensive techniques."
-            elif p['improvement'] >= 10:
-                remark = "GOOD IMPROVEMENT - Participant showed solid progress and understanding of safety principles."
-            elif p['improvement'] >= 0:
-                remark = "SATISFACTORY PROGRESS - Participant maintained or slightly improved performance. Continue practicing learned techniques."
-            elif p['improvement'] >= -10:
-                remark = "NEEDS ATTENTION - Minor score decrease observed. Recommend follow-up coaching and review of key concepts."
-            else:
-                remark = "REQUIRES IMMEDIATE SUPPORT - Significant score decrease. Recommend one-on-one coaching session and practical refresher."
-            
-            # Pass/Fail status remark
-            if not p['pre_test_passed'] and p['post_test_passed']:
-                remark += " Successfully progressed from FAIL to PASS status."
-            elif not p['post_test_passed']:
-                remark += " Did not achieve passing score - recommend additional training."
-            
-            doc.add_paragraph(f"   Remark: {remark}")
-            doc.add_paragraph()
-        
-        # Overall Performance Insights
-        doc.add_paragraph("OVERALL PERFORMANCE INSIGHTS:", style='Heading 3')
-        high_performers = [p for p in participants if p['improvement'] >= 15]
-        needs_support = [p for p in participants if p['improvement'] < 0]
-        
-        insights = []
-        if high_performers:
-            insights.append(f"• {len(high_performers)} participant(s) demonstrated excellent improvement (≥15% gain), indicating strong training absorption.")
-        if needs_support:
-            insights.append(f"• {len(needs_support)} participant(s) showed score decrease and require targeted follow-up support.")
-        insights.append(f"• Average improvement of {improvement:+.1f}% indicates {'effective' if improvement > 5 else 'moderate'} training impact.")
-        insights.append(f"• Post-test pass rate of {(post_pass_count/len(participants)*100):.0f}% {'meets' if post_pass_count/len(participants) >= 0.8 else 'is below'} target standards.")
-        
-        for insight in insights:
-            doc.add_paragraph(insight)
-        
-        doc.add_page_break()
-        
-        # Get chief trainer feedback before displaying
-        chief_trainer_feedback = await db.chief_trainer_feedback.find_one({"session_id": session_id}, {"_id": 0})
-        
-        # TRAINER FEEDBACK (Enhanced narrative)
-        if chief_trainer_feedback:
-            responses = chief_trainer_feedback.get('responses', {})
-            template = await db.feedback_templates.find_one({"id": "chief_trainer_feedback_template"}, {"_id": 0})
-            
-            doc.add_paragraph(
-                "The chief trainer provided comprehensive feedback on the training delivery, participant engagement, "
-                "and safety observations throughout the program. Key observations and recommendations are detailed below:"
-            )
-            doc.add_paragraph()
-            
-            # Extract narrative responses from chief trainer
-            for question_id, answer in responses.items():
-                if template:
-                    for q in template.get('questions', []):
-                        if q.get('id') == question_id:
-                            doc.add_paragraph(f"{q.get('question')}:", style='Heading 3')
-                            if q.get('type') == 'rating':
-                                stars = '⭐' * int(answer) if isinstance(answer, (int, float)) else answer
-                                doc.add_paragraph(f"   Rating: {stars} ({answer}/{q.get('scale', 5)})")
-                            else:
-                                doc.add_paragraph(f"   {answer}")
-                            doc.add_paragraph()
-            
-            # Add professional summary quote
-            doc.add_paragraph()
-            doc.add_paragraph(
-                "The trainer observed that participants were highly engaged and receptive to feedback. "
-                "Safety issues identified during vehicle inspections were communicated to participants and management. "
-                "Overall, the training environment was conducive to learning with participants demonstrating strong "
-                "commitment to improving their safety practices."
-            )
-        else:
-            doc.add_paragraph("[Chief Trainer feedback pending submission]")
-        
-        doc.add_page_break()
-        
-        # TRAINING PHOTOS
-        doc.add_heading('8. TRAINING PHOTOS', 1)
-        if training_photos['group_photo']:
-            doc.add_paragraph("Group Photo:", style='Heading 3')
-            doc.add_paragraph(f"[Photo URL: {training_photos['group_photo']}]")
-            doc.add_paragraph()
-        
-        if training_photos['theory_photo_1'] or training_photos['theory_photo_2']:
-            doc.add_paragraph("Theory Session Photos:", style='Heading 3')
-            if training_photos['theory_photo_1']:
-                doc.add_paragraph(f"[Photo 1 URL: {training_photos['theory_photo_1']}]")
-            if training_photos['theory_photo_2']:
-                doc.add_paragraph(f"[Photo 2 URL: {training_photos['theory_photo_2']}]")
-            doc.add_paragraph()
-        
-        if training_photos['practical_photo_1'] or training_photos['practical_photo_2'] or training_photos['practical_photo_3']:
-            doc.add_paragraph("Practical Session Photos:", style='Heading 3')
-            if training_photos['practical_photo_1']:
-                doc.add_paragraph(f"[Photo 1 URL: {training_photos['practical_photo_1']}]")
-            if training_photos['practical_photo_2']:
-                doc.add_paragraph(f"[Photo 2 URL: {training_photos['practical_photo_2']}]")
-            if training_photos['practical_photo_3']:
-                doc.add_paragraph(f"[Photo 3 URL: {training_photos['practical_photo_3']}]")
-        
-        doc.add_page_break()
-        
-        # PARTICIPANT FEEDBACK SUMMARY (Enhanced)
-        doc.add_heading('9. PARTICIPANT FEEDBACK SUMMARY', 1)
-        if feedback_data:
-            # Calculate average star ratings
-            star_questions = []
-            text_questions = []
-            
-            # Categorize questions
-            if feedback_data:
-                for response in feedback_data[0]['responses']:
-                    if isinstance(response['answer'], int):
-                        star_questions.append(response['question'])
-                    else:
-                        text_questions.append(response['question'])
-            
-            # PART 1: QUANTITATIVE FEEDBACK
-            if star_questions:
-                doc.add_paragraph("A. QUANTITATIVE FEEDBACK (Rating Scores):", style='Heading 3')
-                doc.add_paragraph("Average ratings across all participants on a 5-point scale:")
-                doc.add_paragraph()
-                
-                for question in star_questions:
-                    ratings = [r['answer'] for fb in feedback_data for r in fb['responses'] if r['question'] == question and isinstance(r['answer'], int)]
-                    if ratings:
-                        avg_rating = sum(ratings) / len(ratings)
-                        stars = '⭐' * int(round(avg_rating))
-                        doc.add_paragraph(f"• {question}: {stars} ({avg_rating:.1f}/5.0)")
-                
-                # Overall satisfaction calculation
-                all_ratings = [r['answer'] for fb in feedback_data for r in fb['responses'] if isinstance(r['answer'], int)]
-                if all_ratings:
-                    overall_avg = sum(all_ratings) / len(all_ratings)
-                    doc.add_paragraph()
-                    doc.add_paragraph(f"OVERALL SATISFACTION: {'⭐' * int(round(overall_avg))} ({overall_avg:.1f}/5.0)", style='Heading 3')
-                doc.add_paragraph()
-            
-            # PART 2: QUALITATIVE FEEDBACK THEMES
-            if text_questions:
-                doc.add_paragraph("B. QUALITATIVE FEEDBACK (Key Themes):", style='Heading 3')
-                
-                # Collect all text responses
-                all_text_responses = []
-                for fb in feedback_data:
-                    for response in fb['responses']:
-                        if not isinstance(response['answer'], int):
-                            all_text_responses.append(response['answer'])
-                
-                # Analyze common themes (simple keyword matching)
-                positive_keywords = ['good', 'excellent', 'great', 'helpful', 'informative', 'clear', 'effective']
-                improvement_keywords = ['more', 'extend', 'longer', 'additional', 'better', 'improve']
-                
-                positive_count = sum(1 for resp in all_text_responses if any(kw in str(resp).lower() for kw in positive_keywords))
-                improvement_count = sum(1 for resp in all_text_responses if any(kw in str(resp).lower() for kw in improvement_keywords))
-                
-                doc.add_paragraph(f"• Positive Remarks: {positive_count} participants expressed satisfaction with training delivery and content")
-                if improvement_count > 0:
-                    doc.add_paragraph(f"• Improvement Suggestions: {improvement_count} participants suggested enhancements (e.g., extended duration, additional videos)")
-                doc.add_paragraph()
-                
-                # PART 3: INDIVIDUAL RESPONSES (Detailed)
-                doc.add_paragraph("C. DETAILED INDIVIDUAL RESPONSES:", style='Heading 3')
-                for idx, fb in enumerate(feedback_data, 1):
-                    doc.add_paragraph(f"{idx}. {fb['participant_name']}", style='Heading 4')
-                    for response in fb['responses']:
-                        if not isinstance(response['answer'], int):  # Text responses
-                            doc.add_paragraph(f"   Q: {response['question']}")
-                            doc.add_paragraph(f"   A: {response['answer']}")
-                            doc.add_paragraph()
-        else:
-            doc.add_paragraph("No feedback submitted yet.")
-        
-        doc.add_page_break()
-        
-        # MOTORCYCLE/VEHICLE CONDITION & EMPLOYER RECOMMENDATIONS (Enhanced)
-        doc.add_heading('10. VEHICLE CONDITION ASSESSMENT & EMPLOYER RECOMMENDATIONS', 1)
-        
-        if vehicle_issues:
-            doc.add_paragraph(
-                f"During the training program, pre-ride safety inspections were conducted on all participant "
-                f"{'motorcycles' if is_motorcycle else 'vehicles'}. The inspections revealed {len(vehicle_issues)} "
-                f"{'motorcycles' if is_motorcycle else 'vehicles'} with safety concerns that require immediate attention."
-            )
-            doc.add_paragraph()
-            
-            # PART A: SAFETY ISSUES IDENTIFIED
-            doc.add_paragraph("A. SAFETY ISSUES IDENTIFIED:", style='Heading 3')
-            for vehicle_issue in vehicle_issues:
-                doc.add_paragraph(f"Participant: {vehicle_issue['participant_name']}", style='Heading 4')
-                for issue in vehicle_issue['issues']:
-                    doc.add_paragraph(f"   • {issue['item']}: {issue['comment']}")
-                    if issue['photo_url']:
-                        doc.add_paragraph(f"     [Photo Evidence: {issue['photo_url']}]")
-                doc.add_paragraph()
-            
-            # PART B: SAFETY IMPLICATIONS
-            doc.add_paragraph("B. SAFETY IMPLICATIONS:", style='Heading 3')
-            common_issues = {}
-            for vehicle_issue in vehicle_issues:
-                for issue in vehicle_issue['issues']:
-                    item_category = issue['item'].lower()
-                    if 'tyre' in item_category or 'tire' in item_category:
-                        common_issues['worn_tyres'] = common_issues.get('worn_tyres', 0) + 1
-                    elif 'lamp' in item_category or 'light' in item_category:
-                        common_issues['faulty_lamps'] = common_issues.get('faulty_lamps', 0) + 1
-                    elif 'chain' in item_category:
-                        common_issues['loose_chains'] = common_issues.get('loose_chains', 0) + 1
-                    elif 'mirror' in item_category:
-                        common_issues['missing_mirrors'] = common_issues.get('missing_mirrors', 0) + 1
-                    elif 'ppe' in item_category or 'helmet' in item_category or 'jacket' in item_category:
-                        common_issues['ppe_issues'] = common_issues.get('ppe_issues', 0) + 1
-            
-            if common_issues:
-                for issue_type, count in common_issues.items():
-                    if issue_type == 'worn_tyres':
-                        doc.add_paragraph(f"• Worn Tyres ({count} cases): Increased risk of skidding and loss of control, especially in wet conditions")
-                    elif issue_type == 'faulty_lamps':
-                        doc.add_paragraph(f"• Faulty Lamps/Lights ({count} cases): Reduced visibility at night, increased accident risk")
-                    elif issue_type == 'loose_chains':
-                        doc.add_paragraph(f"• Loose Chains ({count} cases): Risk of chain breakage leading to loss of control")
-                    elif issue_type == 'missing_mirrors':
-                        doc.add_paragraph(f"• Missing/Damaged Mirrors ({count} cases): Impaired situational awareness and blind spot monitoring")
-                    elif issue_type == 'ppe_issues':
-                        doc.add_paragraph(f"• PPE Non-Compliance ({count} cases): Increased severity of injuries in case of accidents")
-            doc.add_paragraph()
-            
-            # PART C: RECOMMENDATIONS FOR EMPLOYER
-            doc.add_paragraph("C. RECOMMENDATIONS FOR EMPLOYER:", style='Heading 3')
-            recommendations = [
-                "1. IMMEDIATE ACTION REQUIRED:",
-                f"   • Conduct immediate safety inspections on all {len(vehicle_issues)} flagged {'motorcycles' if is_motorcycle else 'vehicles'}",
-                "   • Ground vehicles until critical safety issues are resolved",
-                "   • Provide temporary alternative transportation if needed",
-                "",
-                "2. ESTABLISH REGULAR MAINTENANCE PROTOCOL:",
-                f"   • Implement monthly pre-ride safety inspection checklist for all {'motorcycles' if is_motorcycle else 'vehicles'}",
-                "   • Assign designated personnel for routine maintenance verification",
-                "   • Maintain detailed maintenance logs for each vehicle",
-                "",
-                "3. PPE COMPLIANCE:",
-                "   • Enforce mandatory PPE usage policy (helmet, jacket, gloves, boots)",
-                "   • Provide company-issued PPE if necessary",
-                "   • Conduct regular PPE condition checks",
-                "",
-                "4. INTEGRATE INTO SAFETY SOP:",
-                "   • Include vehicle inspection as part of daily work routine",
-                "   • Establish clear reporting channels for safety issues",
-                "   • Implement consequences for non-compliance",
-                "",
-                "5. SUPPLEMENTARY TRAINING:",
-                "   • Conduct basic vehicle maintenance workshop for employees",
-                "   • Provide refresher training on pre-ride safety checks"
-            ]
-            for rec in recommendations:
-                doc.add_paragraph(rec)
-        else:
-            doc.add_paragraph("✓ EXCELLENT RESULT: All vehicles inspected were found to be in good working condition with no safety concerns identified.")
-            doc.add_paragraph()
-            doc.add_paragraph(
-                "This indicates strong commitment to vehicle maintenance and safety standards. We recommend "
-                "continuing current maintenance practices and conducting regular quarterly safety inspections."
-            )
-        
-        doc.add_page_break()
-        
-        # COORDINATOR FEEDBACK (Enhanced)
-        doc.add_heading('11. COORDINATOR FEEDBACK', 1)
-        coordinator_feedback = await db.coordinator_feedback.find_one({"session_id": session_id}, {"_id": 0})
-        if coordinator_feedback:
-            doc.add_paragraph(
-                "The training coordinator provided comprehensive observations on logistics, participant engagement, "
-                "and overall program execution. Key observations and recommendations are detailed below:"
-            )
-            doc.add_paragraph()
-            
-            responses = coordinator_feedback.get('responses', {})
-            for question_id, answer in responses.items():
-                # Get question text from template
-                template = await db.feedback_templates.find_one({"id": "coordinator_feedback_template"}, {"_id": 0})
-                if template:
-                    for q in template.get('questions', []):
-                        if q.get('id') == question_id:
-                            doc.add_paragraph(f"{q.get('question')}:", style='Heading 3')
-                            if q.get('type') == 'rating':
-                                stars = '⭐' * int(answer) if isinstance(answer, (int, float)) else answer
-                                doc.add_paragraph(f"   Rating: {stars} ({answer}/{q.get('scale', 5)})")
-                            else:
-                                doc.add_paragraph(f"   {answer}")
-                            doc.add_paragraph()
-            
-            # Add formal closing
-            doc.add_paragraph()
-            doc.add_paragraph(
-                f"The coordinator acknowledges the strong collaboration between {company.get('name', 'the company')}, "
-                "MDDRC training team, and participants throughout the program. Participants demonstrated excellent "
-                "discipline and commitment to learning, contributing to the overall success of the training initiative."
-            )
-        else:
-            doc.add_paragraph("[Coordinator feedback pending submission]")
         
-        doc.add_page_break()
-        
-        # RECOMMENDATIONS MOVING FORWARD
-        doc.add_heading('12. RECOMMENDATIONS MOVING FORWARD', 1)
-        doc.add_paragraph(
-            "Based on the training outcomes, participant feedback, and safety observations, "
-            "the following recommendations are proposed to sustain and enhance the safety culture:"
-        )
-        doc.add_paragraph()
-        
-        recommendations_forward = [
-            "1. ENFORCE PRE-RIDE/PRE-DRIVE SAFETY CHECKS:",
-            f"   • Mandate daily pre-{'ride' if is_motorcycle else 'drive'} safety inspections using a standardized checklist",
-            "   • Implement digital logging system for inspection records",
-            "   • Designate safety officers to conduct random spot checks",
-            "",
-            "2. MONTHLY VERIFICATION PROGRAM:",
-            "   • Conduct monthly vehicle condition audits",
-            "   • Schedule preventive maintenance based on mileage/usage",
-            "   • Track and analyze vehicle-related incidents",
-            "",
-            "3. MAINTENANCE SUPPORT:",
-            "   • Establish partnerships with authorized service centers for employee discounts",
-            "   • Provide maintenance subsidy program for safety-critical components",
-            "   • Create emergency maintenance fund for immediate safety repairs",
-            "",
-            "4. POST-TRAINING MATERIALS:",
-            "   • Distribute safety reminder cards or posters for display",
-            "   • Share digital safety tips via company communication channels",
-            "   • Conduct quarterly safety awareness campaigns",
-            "",
-            "5. TAILOR PRACTICALS TO CLIENT ROUTES:",
-            "   • Identify high-risk routes and areas commonly used by employees",
-            "   • Conduct route-specific safety briefings",
-            "   • Share incident hotspot maps and avoidance strategies",
-            "",
-            "6. PROMOTE SAFETY CULTURE:",
-            "   • Recognize and reward safe riding/driving behavior",
-            "   • Establish peer mentorship program for new employees",
-            "   • Include safety KPIs in performance evaluations",
-            "",
-            "7. FOLLOW-UP FOR OUTLIERS:",
-            f"   • Provide one-on-one coaching for {len([p for p in participants if p['improvement'] < 0])} participants who showed score decrease" if any(p['improvement'] < 0 for p in participants) else "   • Continue monitoring participant performance in real-world scenarios",
-            "   • Conduct 3-month post-training assessment to measure retention",
-            "   • Offer refresher training for employees showing concerning behavior"
-        ]
-        
-        for rec in recommendations_forward:
-            doc.add_paragraph(rec)
-        
-        doc.add_page_break()
-        
-        # CONCLUSION
-        doc.add_heading('13. CONCLUSION', 1)
-        doc.add_paragraph(
-            f"The Defensive {'Riding' if is_motorcycle else 'Driving'} Training conducted for "
-            f"{company.get('name', 'N/A')} from {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')} "
-            f"was successfully completed with {len(participants)} participants demonstrating measurable improvement in "
-            f"safety awareness and defensive {'riding' if is_motorcycle else 'driving'} competencies."
-        )
-        doc.add_paragraph()
-        
-        doc.add_paragraph(
-            f"Key achievements include an average score improvement of {improvement:+.1f}%, "
-            f"a post-training pass rate of {(post_pass_count/len(participants)*100):.0f}%, and high participant "
-            f"satisfaction levels. The training successfully enhanced hazard recognition skills, emergency response "
-            f"techniques, and safety-first mindset among participants."
-        )
-        doc.add_paragraph()
-        
-        if vehicle_issues:
-            doc.add_paragraph(
-                f"Vehicle safety inspections identified {len(vehicle_issues)} {'motorcycles' if is_motorcycle else 'vehicles'} "
-                "requiring immediate attention. Detailed recommendations have been provided to address these concerns "
-                "and prevent potential accidents."
-            )
-            doc.add_paragraph()
-        
-        doc.add_paragraph(
-            "MDDRC extends sincere appreciation to the management and employees of "
-            f"{company.get('name', 'the company')} for their strong collaboration and commitment throughout this program. "
-            "The enthusiastic participation and positive learning attitude demonstrated by all participants contributed "
-            "significantly to the program's success."
-        )
-        doc.add_paragraph()
-        
-        doc.add_paragraph(
-            "We remain committed to supporting your organization's journey towards a safer workplace and look forward "
-            "to continued partnership in promoting road safety excellence."
-        )
-        
-        doc.add_page_break()
-        
-        # APPENDICES
-        doc.add_heading('APPENDICES', 1)
-        
-        # APPENDIX A: Pre & Post Test Raw Scores
-        doc.add_heading('Appendix A: Pre & Post Test Raw Scores', 2)
-        appendix_table = doc.add_table(rows=len(participants)+1, cols=5)
-        appendix_table.style = 'Light Grid Accent 1'
-        hdr = appendix_table.rows[0].cells
-        hdr[0].text = 'No.'
-        hdr[1].text = 'Participant Name'
-        hdr[2].text = 'Pre-Test Score'
-        hdr[3].text = 'Post-Test Score'
-        hdr[4].text = 'Improvement'
-        
-        for idx, p in enumerate(participants, 1):
-            row = appendix_table.rows[idx].cells
-            row[0].text = str(idx)
-            row[1].text = p['name']
-            row[2].text = f"{p['pre_test_score']:.0f}%"
-            row[3].text = f"{p['post_test_score']:.0f}%"
-            row[4].text = f"{p['improvement']:+.0f}%"
-        
-        doc.add_page_break()
-        
-        # APPENDIX B: Vehicle Condition Photos
-        if vehicle_issues:
-            doc.add_heading('Appendix B: Vehicle Condition Photos', 2)
-            doc.add_paragraph("Photographic evidence of safety issues identified during vehicle inspections:")
-            doc.add_paragraph()
-            for vehicle_issue in vehicle_issues:
-                doc.add_paragraph(f"{vehicle_issue['participant_name']}:", style='Heading 4')
-                for issue in vehicle_issue['issues']:
-                    if issue['photo_url']:
-                        doc.add_paragraph(f"• {issue['item']}")
-                        doc.add_paragraph(f"  [Photo URL: {issue['photo_url']}]")
-                doc.add_paragraph()
-            doc.add_page_break()
-        
-        # APPENDIX C: Feedback Form Summary
-        doc.add_heading('Appendix C: Participant Feedback Form Summary', 2)
-        if feedback_data:
-            doc.add_paragraph("Complete participant feedback responses:")
-            doc.add_paragraph()
-            for idx, fb in enumerate(feedback_data, 1):
-                doc.add_paragraph(f"{idx}. {fb['participant_name']}", style='Heading 4')
-                for response in fb['responses']:
-                    doc.add_paragraph(f"   Q: {response['question']}")
-                    doc.add_paragraph(f"   A: {response['answer']}")
-                doc.add_paragraph()
-        else:
-            doc.add_paragraph("[No feedback data available]")
-        
-        doc.add_page_break()
-        
-        # SIGNATURES
-        doc.add_heading('APPROVAL & SIGNATURES', 1)
-        doc.add_paragraph()
-        sig_table = doc.add_table(rows=4, cols=2)
-        sig_table.style = 'Light List'
-        
-        sig_table.rows[0].cells[0].text = 'Prepared by:'
-        sig_table.rows[0].cells[1].text = ''
-        sig_table.rows[1].cells[0].text = 'Name:'
-        sig_table.rows[1].cells[1].text = current_user.full_name
-        sig_table.rows[2].cells[0].text = 'Position:'
-        sig_table.rows[2].cells[1].text = 'Training Coordinator'
-        sig_table.rows[3].cells[0].text = 'Date:'
-        sig_table.rows[3].cells[1].text = get_malaysia_time().strftime('%Y-%m-%d')
-        
-        doc.add_paragraph()
-        doc.add_paragraph()
-        doc.add_paragraph("_" * 60)
-        doc.add_paragraph()
-        
-        sig_table2 = doc.add_table(rows=4, cols=2)
-        sig_table2.style = 'Light List'
-        sig_table2.rows[0].cells[0].text = 'Reviewed & Approved by:'
-        sig_table2.rows[0].cells[1].text = ''
-        sig_table2.rows[1].cells[0].text = 'Name:'
-        sig_table2.rows[1].cells[1].text = '________________________'
-        sig_table2.rows[2].cells[0].text = 'Position:'
-        sig_table2.rows[2].cells[1].text = 'Person In Charge / Supervisor'
-        sig_table2.rows[3].cells[0].text = 'Date:'
-        sig_table2.rows[3].cells[1].text = '________________________'
-        
-        doc.add_paragraph()
-        doc.add_paragraph()
-        footer = doc.add_paragraph('--- END OF REPORT ---')
-        footer.alignment = 1
-        
-        doc.add_page_break()
-        
-        # SIGNATURES
-        doc.add_heading('11. SIGNATURES', 1)
-        doc.add_paragraph()
-        doc.add_paragraph("_" * 40)
-        doc.add_paragraph(f"Coordinator: {current_user.full_name}")
-        doc.add_paragraph(f"Date: ________________")
-        doc.add_paragraph()
-        doc.add_paragraph()
-        doc.add_paragraph("_" * 40)
-        doc.add_paragraph("PIC/Supervisor Signature")
-        doc.add_paragraph(f"Date: ________________")
-        
-        # Save DOCX
-        report_filename = f"Training_Report_{session_id}_{get_malaysia_time().strftime('%Y%m%d_%H%M%S')}.docx"
-        report_path = REPORT_DIR / report_filename
-        doc.save(str(report_path))
-        
-        # Update training report record with DOCX filename
-        await db.training_reports.update_one(
-            {"session_id": session_id},
-            {"$set": {"docx_filename": report_filename, "generated_at": get_malaysia_time().isoformat()}},
-            upsert=True
-        )
-        
-        return {
-            "message": "DOCX report generated successfully",
-            "filename": report_filename,
-            "download_url": f"/api/training-reports/{session_id}/download-docx"
-        }
+        return {
+            "message": "DOCX report generated successfully",
+            "filename": report_filename,
+            "download_url": f"/api/training-reports/{session_id}/download-docx"
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to generate DOCX report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
@@ -5288,6 +4886,8 @@ async def upload_final_pdf_report(
             }},
             upsert=True
         )
+        await index_supervisor_report(session_id)
+        await refresh_report_search_fields([session_id])
         
         return {
             "message": "Final report uploaded successfully. You can now mark the session as completed.",
@@ -5299,48 +4899,66 @@ async def upload_final_pdf_report(
         logging.error(f"Failed to upload final PDF: {str(e)}")
 
 
+# Supervisor report index (see services/supervisor_reports.py)
+async def index_supervisor_report(session_id: str):
+    """Bring the supervisor report index entry of one session up to date (or remove it)"""
+    await supervisor_reports.index_supervisor_report(db, session_id, get_malaysia_time().isoformat())
+
+async def rebuild_supervisor_report_index():
+    """Index every report already pushed to supervisors (first start after the index was introduced)"""
+    return await supervisor_reports.rebuild_supervisor_report_index(db, get_malaysia_time().isoformat())
+
 # Get submitted reports for supervisor
 @api_router.get("/training-reports/supervisor/sessions")
-async def get_supervisor_reports(current_user: User = Depends(get_current_user)):
-    """Get all submitted reports for sessions assigned to supervisor"""
+async def get_supervisor_reports(
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Get submitted reports for sessions assigned to supervisor, most recently pushed first.
+    
+    Only reports pushed to supervisors (session marked as completed) are listed. Pass
+    next_cursor from the previous page as cursor to fetch the next page.
+    """
     
     if current_user.role not in ["supervisor", "admin"]:
         raise HTTPException(status_code=403, detail="Only supervisors and admins can access this")
     
-    # Get sessions assigned to supervisor
+    limit = max(1, min(limit, 200))
+    
+    # Admin can see all
+    query = {}
     if current_user.role == "supervisor":
-        sessions = await db.sessions.find({"supervisor_id": current_user.id}, {"_id": 0}).to_list(100)
-    else:
-        # Admin can see all
-        sessions = await db.sessions.find({}, {"_id": 0}).to_list(1000)
+        query["supervisor_ids"] = current_user.id
     
-    session_ids = [s['id'] for s in sessions]
+    total = await db.supervisor_report_index.count_documents(query)
     
-    # Get submitted reports for these sessions that are marked as completed
-    # Only show reports that have been pushed to supervisors (session marked as completed)
-    reports = await db.training_reports.find(
-        {
-            "session_id": {"$in": session_ids},
-            "status": "submitted",
-            "available_to_supervisors": True  # Only show completed/archived sessions
-        },
-        {"_id": 0}
-    ).to_list(100)
+    # Keyset pagination on (pushed_at, session_id), both descending
+    if cursor:
+        try:
+            cursor_pushed_at, cursor_session_id = cursor.rsplit("|", 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["$or"] = [
+            {"pushed_at": {"$lt": cursor_pushed_at}},
+            {"pushed_at": cursor_pushed_at, "session_id": {"$lt": cursor_session_id}}
+        ]
     
-    # Enrich with session details
-    enriched_reports = []
-    for report in reports:
-        session = next((s for s in sessions if s['id'] == report['session_id']), None)
-        if session:
-            enriched_reports.append({
-                **report,
-                "session_name": session.get('name'),
-                "session_start_date": session.get('start_date'),
-                "session_end_date": session.get('end_date'),
-                "location": session.get('location')
-            })
+    reports = await db.supervisor_report_index.find(
+        query,
+        {"_id": 0, "supervisor_ids": 0}
+    ).sort([("pushed_at", -1), ("session_id", -1)]).limit(limit + 1).to_list(limit + 1)
     
-    return enriched_reports
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        next_cursor = f"{reports[-1]['pushed_at']}|{reports[-1]['session_id']}"
+    
+    return {
+        "reports": reports,
+        "total": total,
+        "next_cursor": next_cursor
+    }
 
 @api_router.post("/training-reports/{session_id}/submit-final")
 async def submit_final_report(session_id: str, current_user: User = Depends(get_current_user)):
@@ -5370,53 +4988,57 @@ async def submit_final_report(session_id: str, current_user: User = Depends(get_
         pdf_filename = docx_filename.replace('.docx', '.pdf')
         pdf_path = REPORT_PDF_DIR / pdf_filename
         
-        subprocess.run([
-            'libreoffice',
-            '--headless',
-            '--convert-to', 'pdf',
-            '--outdir', str(REPORT_PDF_DIR),
-            str(docx_path)
-        ], check=True)
+        # Skip the conversion when this exact DOCX was already converted
+        source_hash = await asyncio.to_thread(file_sha256, docx_path)
+        reuse_pdf = (
+            training_report.get('pdf_source_sha256') == source_hash
+            and training_report.get('pdf_filename') == pdf_filename
+            and pdf_path.exists()
+        )
+        
+        if not reuse_pdf:
+            if not await convert_docx_to_pdf(docx_path, pdf_path):
+                raise HTTPException(status_code=500, detail="Failed to convert report to PDF")
+            
+            # The PDF of a previous (generated vs edited) DOCX is now stale
+            previous_pdf = training_report.get('pdf_filename')
+            if previous_pdf and previous_pdf != pdf_filename:
+                (REPORT_PDF_DIR / previous_pdf).unlink(missing_ok=True)
         
         # Update training report status
         await db.training_reports.update_one(
             {"session_id": session_id},
             {"$set": {
                 "pdf_filename": pdf_filename,
+                "pdf_source_sha256": source_hash,
                 "status": "submitted",
                 "submitted_at": get_malaysia_time().isoformat(),
                 "submitted_by": current_user.id
             }}
         )
+        await index_supervisor_report(session_id)
         
         # Get session and create notifications for supervisor and admin
-        session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
+        session = await db.sessions.find_one({"id": session_id}, {"_id": 0, "name": 1, "supervisor_ids": 1})
+        submitted_at = get_malaysia_time().isoformat()
         
         # Notify supervisor
-        if session.get('supervisor_ids'):
-            for supervisor_id in session['supervisor_ids']:
-                await db.notifications.insert_one({
-                    "id": str(uuid.uuid4()),
-                    "user_id": supervisor_id,
-                    "type": "training_report_submitted",
-                    "message": f"Training report for {session.get('name')} has been submitted",
-                    "session_id": session_id,
-                    "read": False,
-                    "created_at": get_malaysia_time().isoformat()
-                })
+        await notification_center.notify(
+            session.get('supervisor_ids', []),
+            "training_report_submitted",
+            f"Training report for {session.get('name')} has been submitted",
+            submitted_at,
+            session_id=session_id
+        )
         
         # Notify all admins
-        admins = await db.users.find({"role": "admin"}, {"_id": 0}).to_list(100)
-        for admin in admins:
-            await db.notifications.insert_one({
-                "id": str(uuid.uuid4()),
-                "user_id": admin['id'],
-                "type": "training_report_submitted",
-                "message": f"Training report for {session.get('name')} has been submitted by {current_user.full_name}",
-                "session_id": session_id,
-                "read": False,
-                "created_at": get_malaysia_time().isoformat()
-            })
+        await notification_center.notify(
+            await db.users.distinct("id", {"role": "admin"}),
+            "training_report_submitted",
+            f"Training report for {session.get('name')} has been submitted by {current_user.full_name}",
+            submitted_at,
+            session_id=session_id
+        )
         
         return {
             "message": "Report submitted successfully and PDF generated",
@@ -5424,9 +5046,8 @@ async def submit_final_report(session_id: str, current_user: User = Depends(get_
             "download_url": f"/api/training-reports/{session_id}/download-pdf"
         }
         
-    except subprocess.CalledProcessError as e:
-        logging.error(f"PDF conversion failed: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to convert report to PDF")
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to submit report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to submit report: {str(e)}")
@@ -5455,6 +5076,131 @@ async def download_pdf_report(session_id: str, current_user: User = Depends(get_
         filename=training_report['pdf_filename']
     )
 
+# Report Jobs
+async def load_job_user(user_id: str) -> User:
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if not user_doc:
+        raise PermanentJobError("User who requested the job no longer exists")
+    if isinstance(user_doc.get('created_at'), str):
+        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    return User(**user_doc)
+
+def report_job_handler(run):
+    """Adapt a report route to a job handler: run it as the requesting user.
+    
+    Client errors (4xx) will not go away on retry, so they fail the job immediately.
+    """
+    async def handler(job: dict) -> dict:
+        current_user = await load_job_user(job['created_by'])
+        try:
+            return await run(job['payload']['session_id'], current_user)
+        except HTTPException as e:
+            if e.status_code < 500:
+                raise PermanentJobError(e.detail)
+            raise RuntimeError(e.detail) from e
+    return handler
+
+async def run_generate_report_job(session_id: str, current_user: User) -> dict:
+    report = await generate_report(ReportGenerateRequest(session_id=session_id), current_user)
+    return {"report_id": report.id, "status": report.status}
+
+report_jobs.register("docx_report", report_job_handler(lambda session_id, user: generate_docx_report(session_id, user)))
+report_jobs.register("ai_report", report_job_handler(lambda session_id, user: generate_ai_report(session_id, user)))
+report_jobs.register("final_report", report_job_handler(lambda session_id, user: submit_final_report(session_id, user)))
+report_jobs.register("report", report_job_handler(run_generate_report_job))
+
+def serialize_report_job(job: dict) -> dict:
+    result = job.get('result') or {}
+    return {
+        "job_id": job['id'],
+        "job_type": job['job_type'],
+        "session_id": job.get('session_id'),
+        "status": job['status'],
+        "attempts": job.get('attempts', 0),
+        "error": job.get('error'),
+        "created_at": job.get('created_at'),
+        "started_at": job.get('started_at'),
+        "finished_at": job.get('finished_at'),
+        "result": result if job['status'] == JOB_SUCCEEDED else None,
+        "artifact_url": result.get('download_url') if job['status'] == JOB_SUCCEEDED else None
+    }
+
+@api_router.post("/report-jobs", status_code=202)
+async def enqueue_report_job(job_data: ReportJobCreate, current_user: User = Depends(get_current_user)):
+    """Queue a report generation job and return immediately (Coordinator/Admin)"""
+    if current_user.role not in ["coordinator", "admin"]:
+        raise HTTPException(status_code=403, detail="Only coordinators and admins can generate reports")
+    
+    if job_data.job_type not in report_jobs.job_types:
+        raise HTTPException(status_code=400, detail=f"Unknown job type. Use one of: {', '.join(report_jobs.job_types)}")
+    
+    session = await db.sessions.find_one({"id": job_data.session_id}, {"_id": 0, "id": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    job = await report_jobs.enqueue(
+        job_data.job_type,
+        {"session_id": job_data.session_id},
+        created_by=current_user.id,
+        session_id=job_data.session_id
+    )
+    return serialize_report_job(job)
+
+@api_router.get("/report-jobs/{job_id}")
+async def get_report_job(job_id: str, wait: int = 0, current_user: User = Depends(get_current_user)):
+    """Job status. With wait=N (max 30) the request is held until the job finishes or N seconds pass."""
+    job = await report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Checked before waiting, so nobody can hold requests open on other users' jobs
+    if current_user.role != "admin" and job.get('created_by') != current_user.id:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    if wait > 0:
+        job = await report_jobs.wait(job_id, timeout=min(wait, 30)) or job
+    
+    return serialize_report_job(job)
+
+@api_router.get("/report-jobs")
+async def list_report_jobs(session_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Recent report jobs of the current user (all users for admins)"""
+    if current_user.role not in ["coordinator", "admin"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    query = {}
+    if current_user.role != "admin":
+        query["created_by"] = current_user.id
+    if session_id:
+        query["session_id"] = session_id
+    
+    jobs = await db.report_jobs.find(query, {"_id": 0}).sort("created_at", -1).to_list(50)
+    return [serialize_report_job(job) for job in jobs]
+
+# Notifications
+@api_router.get("/notifications")
+async def get_notifications(
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Current user's notifications, newest first. Pass next_cursor as cursor for the next page."""
+    try:
+        return await notification_center.inbox(current_user.id, cursor=cursor, limit=max(1, min(limit, 100)), unread_only=unread_only)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@api_router.get("/notifications/unread-count")
+async def get_unread_notification_count(current_user: User = Depends(get_current_user)):
+    return {"unread": await notification_center.unread_count(current_user.id)}
+
+@api_router.post("/notifications/read")
+async def mark_notifications_read(request: NotificationReadRequest, current_user: User = Depends(get_current_user)):
+    """Mark notifications as read (all of them when notification_ids is omitted)"""
+    updated = await notification_center.mark_read(current_user.id, request.notification_ids)
+    return {"updated": updated, "unread": await notification_center.unread_count(current_user.id)}
+
 # Trainer Checklist Routes
 @api_router.post("/trainer-checklist/submit")
 async def submit_trainer_checklist(checklist_data: TrainerChecklistSubmit, current_user: User = Depends(get_current_user)):
@@ -6112,21 +5858,41 @@ async def upload_certificate_template(file: UploadFile = File(...), current_user
     if not file.filename.endswith('.docx'):
         raise HTTPException(status_code=400, detail="Only .docx files are supported")
     
-    filename = "certificate_template.docx"
-    file_path = TEMPLATE_DIR / filename
+    filename = CERTIFICATE_TEMPLATE_PATH.name
+    file_path = CERTIFICATE_TEMPLATE_PATH
+    
+    contents = await file.read()
+    
+    # Compile now so certificate generation never has to parse the template
+    try:
+        compiled = await asyncio.to_thread(compile_template, contents)
+    except Exception as e:
+        logging.error(f"Failed to compile certificate template: {str(e)}")
+        raise HTTPException(status_code=400, detail="Could not read the uploaded template. Please upload a valid .docx file.")
     
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        buffer.write(contents)
+    certificate_templates.put(file_path, compiled)
+    # Renders of the previous template can no longer be served from the cache
+    await asyncio.to_thread(evict_certificate_renders)
     
     template_url = f"/api/static/templates/{filename}"
     
     await db.settings.update_one(
         {"id": "app_settings"},
-        {"$set": {"certificate_template_url": template_url, "updated_at": get_malaysia_time().isoformat()}},
+        {"$set": {
+            "certificate_template_url": template_url,
+            "certificate_template_version": compiled.version,
+            "updated_at": get_malaysia_time().isoformat()
+        }},
         upsert=True
     )
     
-    return {"template_url": template_url, "message": "Certificate template uploaded successfully"}
+    return {
+        "template_url": template_url,
+        "placeholders": sorted(compiled.placeholders.keys()),
+        "message": "Certificate template uploaded successfully"
+    }
 
 # Upload Certificate for Participant
 @api_router.post("/certificates/upload/{session_id}/{participant_id}")
@@ -6228,6 +5994,66 @@ async def get_session_certificates(session_id: str, current_user: User = Depends
     
     return certificates
 
+# Download all of a session's certificates as one ZIP
+@api_router.get("/certificates/session/{session_id}/download-all")
+async def download_session_certificates(session_id: str, current_user: User = Depends(get_current_user)):
+    """Stream every certificate of a session as a ZIP archive (admin, coordinator, or the session's supervisors)"""
+    session = await db.sessions.find_one({"id": session_id}, {"_id": 0, "id": 1, "name": 1, "supervisor_ids": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    if current_user.role == "supervisor":
+        if current_user.id not in session.get('supervisor_ids', []):
+            raise HTTPException(status_code=403, detail="You can only download certificates for your assigned sessions")
+    elif current_user.role not in ["admin", "coordinator"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    # Uploaded certificates take precedence over generated ones
+    certificate_urls = {}
+    generated = await db.certificates.find(
+        {"session_id": session_id},
+        {"_id": 0, "participant_id": 1, "certificate_url": 1}
+    ).to_list(None)
+    for cert in generated:
+        if cert.get('certificate_url'):
+            certificate_urls[cert['participant_id']] = cert['certificate_url']
+    uploaded = await db.participant_access.find(
+        {"session_id": session_id, "certificate_url": {"$exists": True, "$ne": None}},
+        {"_id": 0, "participant_id": 1, "certificate_url": 1}
+    ).to_list(None)
+    for access in uploaded:
+        certificate_urls[access['participant_id']] = access['certificate_url']
+    
+    if not certificate_urls:
+        raise HTTPException(status_code=404, detail="No certificates found for this session")
+    
+    participants = await db.users.find(
+        {"id": {"$in": list(certificate_urls.keys())}},
+        {"_id": 0, "id": 1, "full_name": 1}
+    ).to_list(None)
+    names = {p['id']: p.get('full_name') for p in participants}
+    
+    files = []
+    for participant_id, certificate_url in certificate_urls.items():
+        file_path = CERTIFICATE_PDF_DIR / certificate_url.split('/')[-1]
+        if file_path.exists():
+            name = safe_archive_name(names.get(participant_id), fallback=participant_id)
+            files.append((f"{name}_certificate.pdf", file_path))
+    
+    if not files:
+        raise HTTPException(status_code=404, detail="Certificate files not found")
+    
+    files.sort(key=lambda f: f[0].lower())
+    entries = list(zip(unique_archive_names([name for name, _ in files]), [path for _, path in files]))
+    # Header values must be latin-1; the entries inside the archive keep full Unicode names
+    archive_name = safe_archive_name(session.get('name'), fallback=session_id).encode("ascii", "ignore").decode() or session_id
+    
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}_certificates.zip"'}
+    )
+
 # Download Certificate for Participant
 @api_router.get("/certificates/download/{session_id}/{participant_id}")
 async def download_participant_certificate(
@@ -6307,6 +6133,84 @@ async def download_participant_certificate(
         filename=f"{participant_name}_certificate.pdf"
     )
 
+async def evaluate_certificate_eligibility(session_id: str, participant_id: Optional[str] = None) -> Optional[List[dict]]:
+    """Certificate eligibility for a session's participants, computed in one aggregation.
+    
+    Evaluates the whole session roster, or just participant_id when given. Returns None
+    if the session does not exist.
+    """
+    pipeline = [{"$match": {"id": session_id}}]
+    if participant_id:
+        pipeline.append({"$addFields": {"participant_ids": [participant_id]}})
+    pipeline += [
+        {"$project": {"_id": 0, "status": 1, "participant_ids": {"$ifNull": ["$participant_ids", []]}}},
+        {"$facet": {
+            "session": [{"$project": {"status": 1}}],
+            "participants": [
+                {"$unwind": "$participant_ids"},
+                {"$lookup": {
+                    "from": "participant_access",
+                    "let": {"pid": "$participant_ids"},
+                    "pipeline": [
+                        {"$match": {"session_id": session_id, "$expr": {"$eq": ["$participant_id", "$$pid"]}}},
+                        {"$limit": 1},
+                        {"$project": {"_id": 0, "certificate_url": 1, "feedback_submitted": 1, "feedback_completed": 1}}
+                    ],
+                    "as": "access"
+                }},
+                {"$lookup": {
+                    "from": "attendance",
+                    "let": {"pid": "$participant_ids"},
+                    "pipeline": [
+                        {"$match": {"session_id": session_id, "clock_out": {"$ne": None}, "$expr": {"$eq": ["$participant_id", "$$pid"]}}},
+                        {"$limit": 1},
+                        {"$project": {"_id": 1}}
+                    ],
+                    "as": "clock_outs"
+                }},
+                {"$lookup": {
+                    "from": "users",
+                    "localField": "participant_ids",
+                    "foreignField": "id",
+                    "as": "participant"
+                }},
+                {"$project": {
+                    "participant_id": "$participant_ids",
+                    "participant_name": {"$arrayElemAt": ["$participant.full_name", 0]},
+                    "certificate_url": {"$arrayElemAt": ["$access.certificate_url", 0]},
+                    # Accept either flag, as the certificate download does
+                    "feedback_submitted": {"$or": [
+                        {"$eq": [{"$arrayElemAt": ["$access.feedback_submitted", 0]}, True]},
+                        {"$eq": [{"$arrayElemAt": ["$access.feedback_completed", 0]}, True]}
+                    ]},
+                    "clocked_out": {"$gt": [{"$size": "$clock_outs"}, 0]}
+                }}
+            ]
+        }}
+    ]
+    
+    results = await db.sessions.aggregate(pipeline).to_list(1)
+    if not results or not results[0]['session']:
+        return None
+    
+    session_active = results[0]['session'][0].get("status") == "active"
+    statuses = []
+    for row in results[0]['participants']:
+        has_certificate = bool(row.get('certificate_url'))
+        eligible = has_certificate and row['feedback_submitted'] and row['clocked_out'] and session_active
+        statuses.append({
+            "participant_id": row['participant_id'],
+            "participant_name": row.get('participant_name'),
+            "eligible": eligible,
+            "has_certificate": has_certificate,
+            "feedback_submitted": row['feedback_submitted'],
+            "clocked_out": row['clocked_out'],
+            "session_active": session_active,
+            "certificate_url": row.get('certificate_url'),
+            "message": "Eligible to download certificate" if eligible else "Not yet eligible for certificate"
+        })
+    return statuses
+
 # Check Certificate Eligibility
 @api_router.get("/certificates/eligibility/{session_id}/{participant_id}")
 async def check_certificate_eligibility(
@@ -6320,106 +6224,246 @@ async def check_certificate_eligibility(
     if current_user.id != participant_id and current_user.role not in ["admin", "coordinator"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    # Get session
-    session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
-    if not session:
+    statuses = await evaluate_certificate_eligibility(session_id, participant_id)
+    if statuses is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Get participant access
-    access = await db.participant_access.find_one(
-        {"participant_id": participant_id, "session_id": session_id},
-        {"_id": 0}
-    )
-    
-    # Check conditions
-    has_certificate = bool(access and access.get('certificate_url'))
-    feedback_submitted = bool(access and access.get('feedback_submitted', False))
-    
-    # Check clock out
-    attendance = await db.attendance.find_one(
-        {
-            "participant_id": participant_id,
-            "session_id": session_id,
-            "clock_out": {"$ne": None}
-        },
-        {"_id": 0}
-    )
-    clocked_out = bool(attendance)
-    
-    session_active = session.get("status") == "active"
+    status = statuses[0]
+    status.pop('participant_id')
+    status.pop('participant_name')
+    return status
+
+# Certificate Eligibility for a whole session
+@api_router.get("/certificates/session/{session_id}/eligibility")
+async def get_session_certificate_eligibility(session_id: str, current_user: User = Depends(get_current_user)):
+    """Certificate eligibility of every participant in a session (Admin/Coordinator)"""
+    if current_user.role not in ["admin", "coordinator"]:
+        raise HTTPException(status_code=403, detail="Only admins and coordinators can view session eligibility")
     
-    eligible = has_certificate and feedback_submitted and clocked_out and session_active
+    statuses = await evaluate_certificate_eligibility(session_id)
+    if statuses is None:
+        raise HTTPException(status_code=404, detail="Session not found")
     
     return {
-        "eligible": eligible,
-        "has_certificate": has_certificate,
-        "feedback_submitted": feedback_submitted,
-        "clocked_out": clocked_out,
-        "session_active": session_active,
-        "certificate_url": access.get('certificate_url') if access else None,
-        "message": "Eligible to download certificate" if eligible else "Not yet eligible for certificate"
+        "session_id": session_id,
+        "total": len(statuses),
+        "eligible_count": sum(1 for s in statuses if s['eligible']),
+        "participants": statuses
     }
 
 
 # Get All Certificates (Admin Only)
 @api_router.get("/certificates/repository")
-async def get_certificates_repository(current_user: User = Depends(get_current_user)):
-    """Get all uploaded certificates for admin repository."""
+async def get_certificates_repository(
+    company_id: Optional[str] = None,
+    program_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Get uploaded certificates for admin repository, newest first.
+    
+    Filters: company_id, program_id, session_id, start_date/end_date (YYYY-MM-DD, upload date)
+    and search (participant name, ID number or email). Pass next_cursor from the previous
+    page as cursor to fetch the next page.
+    """
+    from bson import ObjectId
+    import re
     
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can access certificate repository")
     
-    # Get all participant access records that have certificates
-    certificates = await db.participant_access.find(
-        {"certificate_url": {"$exists": True, "$ne": None}},
-        {"_id": 0}
-    ).to_list(length=None)
+    limit = max(1, min(limit, 200))
+    query = {"certificate_url": {"$exists": True, "$ne": None}}
+    
+    # Resolve session-level filters to session IDs first so the main match stays on participant_access
+    if company_id or program_id:
+        session_query = {}
+        if company_id:
+            session_query["company_id"] = company_id
+        if program_id:
+            session_query["program_id"] = program_id
+        session_ids = await db.sessions.distinct("id", session_query)
+        if session_id:
+            session_ids = [sid for sid in session_ids if sid == session_id]
+        query["session_id"] = {"$in": session_ids}
+    elif session_id:
+        query["session_id"] = session_id
     
-    # Enrich with participant, session, and program details
-    enriched_certificates = []
+    if search:
+        search_pattern = {"$regex": re.escape(search), "$options": "i"}  # Case-insensitive
+        query["participant_id"] = {"$in": await db.users.distinct("id", {"$or": [
+            {"full_name": search_pattern},
+            {"email": search_pattern},
+            {"id_number": search_pattern}
+        ]})}
     
-    for cert in certificates:
-        participant_id = cert.get('participant_id')
-        session_id = cert.get('session_id')
-        
-        # Get participant details
-        participant = await db.users.find_one({"id": participant_id}, {"_id": 0})
-        
-        # Get session details
-        session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
-        
-        # Get program details if session has program_id
-        program = None
-        if session and session.get('program_id'):
-            program = await db.programs.find_one({"id": session['program_id']}, {"_id": 0})
-        
-        # Get company details if session has company_id
-        company = None
-        if session and session.get('company_id'):
-            company = await db.companies.find_one({"id": session['company_id']}, {"_id": 0})
-        
-        enriched_certificates.append({
-            "certificate_url": cert.get('certificate_url'),
-            "uploaded_at": cert.get('certificate_uploaded_at'),
-            "uploaded_by": cert.get('certificate_uploaded_by'),
-            "participant_id": participant_id,
-            "participant_name": participant.get('full_name') if participant else 'Unknown',
-            "participant_id_number": participant.get('id_number') if participant else 'N/A',
-            "participant_email": participant.get('email') if participant else 'N/A',
-            "session_id": session_id,
-            "session_name": session.get('name') if session else 'Unknown Session',
-            "session_start_date": session.get('start_date') if session else None,
-            "session_end_date": session.get('end_date') if session else None,
-            "program_name": program.get('name') if program else 'N/A',
-            "company_name": company.get('name') if company else 'N/A',
-            "feedback_submitted": cert.get('feedback_submitted', False),
-        })
+    try:
+        uploaded_range = {}
+        if start_date:
+            uploaded_range["$gte"] = datetime.fromisoformat(start_date).date().isoformat()
+        if end_date:
+            uploaded_range["$lt"] = (datetime.fromisoformat(end_date).date() + timedelta(days=1)).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if uploaded_range:
+        query["certificate_uploaded_at"] = uploaded_range
+    
+    total = await db.participant_access.count_documents(query)
+    
+    # Keyset pagination on (certificate_uploaded_at, _id), both descending. Certificates
+    # without an upload date sort last; their cursors carry an empty date.
+    if cursor:
+        try:
+            cursor_uploaded_at, cursor_id = cursor.rsplit("|", 1)
+            cursor_oid = ObjectId(cursor_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if cursor_uploaded_at:
+            after_cursor = [
+                {"certificate_uploaded_at": {"$lt": cursor_uploaded_at}},
+                {"certificate_uploaded_at": cursor_uploaded_at, "_id": {"$lt": cursor_oid}},
+                {"certificate_uploaded_at": None}
+            ]
+        else:
+            after_cursor = [{"certificate_uploaded_at": None, "_id": {"$lt": cursor_oid}}]
+        query = {"$and": [query, {"$or": after_cursor}]}
+    
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"certificate_uploaded_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": "users",
+            "localField": "participant_id",
+            "foreignField": "id",
+            "as": "participant"
+        }},
+        {"$lookup": {
+            "from": "sessions",
+            "localField": "session_id",
+            "foreignField": "id",
+            "as": "session"
+        }},
+        {"$addFields": {
+            "participant": {"$arrayElemAt": ["$participant", 0]},
+            "session": {"$arrayElemAt": ["$session", 0]}
+        }},
+        {"$lookup": {
+            "from": "programs",
+            "localField": "session.program_id",
+            "foreignField": "id",
+            "as": "program"
+        }},
+        {"$lookup": {
+            "from": "companies",
+            "localField": "session.company_id",
+            "foreignField": "id",
+            "as": "company"
+        }},
+        {"$project": {
+            "_id": 0,
+            "cursor_id": {"$toString": "$_id"},
+            "certificate_url": 1,
+            "uploaded_at": "$certificate_uploaded_at",
+            "uploaded_by": "$certificate_uploaded_by",
+            "participant_id": 1,
+            "participant_name": {"$ifNull": ["$participant.full_name", "Unknown"]},
+            "participant_id_number": {"$ifNull": ["$participant.id_number", "N/A"]},
+            "participant_email": {"$ifNull": ["$participant.email", "N/A"]},
+            "session_id": 1,
+            "session_name": {"$ifNull": ["$session.name", "Unknown Session"]},
+            "session_start_date": {"$ifNull": ["$session.start_date", None]},
+            "session_end_date": {"$ifNull": ["$session.end_date", None]},
+            "program_name": {"$ifNull": [{"$arrayElemAt": ["$program.name", 0]}, "N/A"]},
+            "company_name": {"$ifNull": [{"$arrayElemAt": ["$company.name", 0]}, "N/A"]},
+            "feedback_submitted": {"$ifNull": ["$feedback_submitted", False]}
+        }}
+    ]
     
-    # Sort by upload date (most recent first)
-    enriched_certificates.sort(key=lambda x: x.get('uploaded_at') or '', reverse=True)
+    certificates = await db.participant_access.aggregate(pipeline).to_list(limit + 1)
     
-    return enriched_certificates
+    next_cursor = None
+    if len(certificates) > limit:
+        certificates = certificates[:limit]
+        last = certificates[-1]
+        next_cursor = f"{last.get('uploaded_at') or ''}|{last['cursor_id']}"
+    for cert in certificates:
+        cert.pop('cursor_id', None)
+    
+    return {
+        "certificates": certificates,
+        "total": total,
+        "next_cursor": next_cursor
+    }
+
+
+# Certificate rendering helpers
+def build_certificate_replacements(participant: dict, session: dict, program_name: str, company_name: str) -> dict:
+    """Map certificate template placeholders to participant/session values"""
+    return {
+        '«PARTICIPANT_NAME»': participant['full_name'],
+        '«IC_NUMBER»': participant['id_number'],
+        '«COMPANY_NAME»': company_name,
+        '«PROGRAMME NAME»': program_name,
+        '<<PROGRAMME NAME>>': program_name,
+        '«VENUE»': session['location'],
+        '<<VENUE>>': session['location'],
+        '«DATE»': session['end_date'],
+        '<<DATE>>': session['end_date']
+    }
+
+async def get_certificate_template():
+    """Return the compiled certificate template, compiling it only if the file changed"""
+    if not CERTIFICATE_TEMPLATE_PATH.exists():
+        raise HTTPException(status_code=404, detail="Certificate template not found. Please upload a template first.")
+    return await asyncio.to_thread(certificate_templates.get, CERTIFICATE_TEMPLATE_PATH)
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def certificate_cache_stem(participant_id: str, session_id: str, template, replacements: dict) -> str:
+    """File stem addressed by the template version and the values filled into it"""
+    fingerprint = json.dumps({"template": template.version, "fields": replacements}, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    return f"cert_{participant_id}_{session_id}_{digest[:12]}"
+
+def evict_stale_certificate_files(participant_id: str, session_id: str, keep_stem: str):
+    """Delete earlier renders of this participant's certificate (old template or old details)"""
+    patterns = [f"cert_{participant_id}_{session_id}_*", f"certificate_{participant_id}_{session_id}.*"]
+    for directory in (CERTIFICATE_DIR, CERTIFICATE_PDF_DIR):
+        for pattern in patterns:
+            for path in directory.glob(pattern):
+                if path.stem != keep_stem:
+                    path.unlink(missing_ok=True)
+
+def evict_certificate_renders():
+    """Drop cached certificate DOCX renders after the template changes.
+    
+    Issued PDFs stay in place so existing download links keep working; each one is
+    replaced (and the old file evicted) the next time that certificate is generated.
+    """
+    for path in CERTIFICATE_DIR.glob("cert_*.docx"):
+        path.unlink(missing_ok=True)
 
+def render_certificate_batch(template, jobs: List[dict]) -> List[Path]:
+    """Render one certificate DOCX per job from the compiled template.
+    
+    Each job is {"filename": str, "replacements": dict}.
+    Runs synchronously - call it via asyncio.to_thread from request handlers.
+    """
+    return [
+        template.render_to(CERTIFICATE_DIR / job['filename'], job['replacements'])
+        for job in jobs
+    ]
 
 # Generate Certificate
 @api_router.post("/certificates/generate/{session_id}/{participant_id}")
@@ -6459,54 +6503,24 @@ async def generate_certificate(session_id: str, participant_id: str, current_use
     company = await db.companies.find_one({"id": session['company_id']}, {"_id": 0})
     company_name = company['name'] if company else ""
     
-    # Get settings for company name (already in template, no replacement needed)
-    
-    # Load template
-    template_path = TEMPLATE_DIR / "certificate_template.docx"
-    if not template_path.exists():
-        raise HTTPException(status_code=404, detail="Certificate template not found. Please upload a template first.")
-    
-    # Create document from template
-    doc = Document(template_path)
+    # Fill the compiled template (keeps the template's run formatting)
+    template = await get_certificate_template()
+    replacements = build_certificate_replacements(participant, session, program_name, company_name)
     
-    # Replace placeholders in paragraphs
-    replacements = {
-        '«PARTICIPANT_NAME»': participant['full_name'],
-        '«IC_NUMBER»': participant['id_number'],
-        '«COMPANY_NAME»': company_name,
-        '«PROGRAMME NAME»': program_name,
-        '<<PROGRAMME NAME>>': program_name,
-        '«VENUE»': session['location'],
-        '«DATE»': session['end_date']
-    }
-    
-    # Replace in paragraphs
-    for paragraph in doc.paragraphs:
-        for key, value in replacements.items():
-            if key in paragraph.text:
-                paragraph.text = paragraph.text.replace(key, value)
-    
-    # Replace in tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for key, value in replacements.items():
-                    if key in cell.text:
-                        cell.text = cell.text.replace(key, value)
-    
-    # Save as new DOCX document
-    cert_filename = f"certificate_{participant_id}_{session_id}.docx"
-    cert_path = CERTIFICATE_DIR / cert_filename
-    doc.save(cert_path)
-    
-    # Convert to PDF
-    pdf_filename = f"certificate_{participant_id}_{session_id}.pdf"
+    # Same template + same details = same certificate; reuse the PDF if it exists
+    stem = certificate_cache_stem(participant_id, session_id, template, replacements)
+    pdf_filename = f"{stem}.pdf"
     pdf_path = CERTIFICATE_PDF_DIR / pdf_filename
+    cached = pdf_path.exists()
     
-    # Convert and verify
-    conversion_success = convert_docx_to_pdf(cert_path, pdf_path)
-    if not conversion_success or not pdf_path.exists():
-        raise HTTPException(status_code=500, detail="Failed to convert certificate to PDF. Please contact support.")
+    if not cached:
+        cert_path = CERTIFICATE_DIR / f"{stem}.docx"
+        await asyncio.to_thread(template.render_to, cert_path, replacements)
+        
+        # Convert and verify
+        conversion_success = await convert_docx_to_pdf(cert_path, pdf_path)
+        if not conversion_success or not pdf_path.exists():
+            raise HTTPException(status_code=500, detail="Failed to convert certificate to PDF. Please contact support.")
     
     # Store certificate record (using PDF URL)
     cert_url = f"/api/static/certificates_pdf/{pdf_filename}"
@@ -6517,7 +6531,10 @@ async def generate_certificate(session_id: str, participant_id: str, current_use
         "session_id": session_id
     }, {"_id": 0})
     
-    if existing_cert:
+    if existing_cert and existing_cert.get('certificate_url') == cert_url:
+        # Nothing changed since it was issued
+        cert_id = existing_cert['id']
+    elif existing_cert:
         # Update existing
         await db.certificates.update_one(
             {"id": existing_cert['id']},
@@ -6540,33 +6557,148 @@ async def generate_certificate(session_id: str, participant_id: str, current_use
         await db.certificates.insert_one(doc_cert)
         cert_id = cert_obj.id
     
+    # Old renders go only once the record points at the new PDF
+    if not cached:
+        await asyncio.to_thread(evict_stale_certificate_files, participant_id, session_id, stem)
+    
     return {
         "certificate_id": cert_id,
         "certificate_url": cert_url,
         "download_url": f"/api/certificates/download/{cert_id}",
+        "cached": cached,
         "message": "Certificate generated successfully"
     }
 
-@api_router.get("/certificates/download/{certificate_id}")
-async def download_certificate(certificate_id: str, current_user: User = Depends(get_current_user)):
-    cert = await db.certificates.find_one({"id": certificate_id}, {"_id": 0})
-    if not cert:
-        raise HTTPException(status_code=404, detail="Certificate not found")
+# Generate Certificates for a whole session
+@api_router.post("/certificates/generate-session/{session_id}")
+async def generate_session_certificates(session_id: str, current_user: User = Depends(get_current_user)):
+    """Generate certificates for every participant of a session who has submitted feedback (Admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can generate session certificates")
     
-    # Only participant or admin can download
-    if current_user.role != "admin" and current_user.id != cert['participant_id']:
-        raise HTTPException(status_code=403, detail="Unauthorized")
+    session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
     
-    cert_url = cert['certificate_url']
-    filename = cert_url.split('/')[-1]
+    template = await get_certificate_template()
     
-    # Check if it's a PDF or DOCX
-    if filename.endswith('.pdf'):
-        file_path = CERTIFICATE_PDF_DIR / filename
-        media_type = 'application/pdf'
-    else:
-        file_path = CERTIFICATE_DIR / filename
-        media_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    program = await db.programs.find_one({"id": session['program_id']}, {"_id": 0})
+    program_name = program['name'] if program else "Training Program"
+    company = await db.companies.find_one({"id": session['company_id']}, {"_id": 0})
+    company_name = company['name'] if company else ""
+    
+    # Eligible participants: feedback submitted for this session
+    access_records = await db.participant_access.find(
+        {"session_id": session_id, "feedback_submitted": True},
+        {"_id": 0, "participant_id": 1}
+    ).to_list(None)
+    eligible_ids = [a['participant_id'] for a in access_records]
+    
+    participants = await db.users.find(
+        {"id": {"$in": eligible_ids}},
+        {"_id": 0, "id": 1, "full_name": 1, "id_number": 1}
+    ).to_list(None)
+    
+    if not participants:
+        return {
+            "session_id": session_id,
+            "generated": 0,
+            "failed": [],
+            "certificates": [],
+            "message": "No eligible participants (feedback not yet submitted)"
+        }
+    
+    jobs = []
+    for participant in participants:
+        replacements = build_certificate_replacements(participant, session, program_name, company_name)
+        stem = certificate_cache_stem(participant['id'], session_id, template, replacements)
+        jobs.append({
+            "participant_id": participant['id'],
+            "stem": stem,
+            "filename": f"{stem}.docx",
+            "replacements": replacements
+        })
+    
+    # Certificates whose template and details are unchanged are already on disk
+    pending = [job for job in jobs if not (CERTIFICATE_PDF_DIR / f"{job['stem']}.pdf").exists()]
+    
+    # Rendering is blocking; keep it off the event loop
+    docx_paths = await asyncio.to_thread(render_certificate_batch, template, pending)
+    pdf_paths = await convert_docx_batch_to_pdf(docx_paths, CERTIFICATE_PDF_DIR)
+    converted = {job['participant_id']: pdf_paths.get(docx_path) for job, docx_path in zip(pending, docx_paths)}
+    
+    existing_urls = {
+        c['participant_id']: c.get('certificate_url')
+        for c in await db.certificates.find(
+            {"session_id": session_id, "participant_id": {"$in": [job['participant_id'] for job in jobs]}},
+            {"_id": 0, "participant_id": 1, "certificate_url": 1}
+        ).to_list(None)
+    }
+    
+    issue_date = get_malaysia_time().isoformat()
+    operations = []
+    generated = []
+    failed = []
+    rendered = []
+    for job in jobs:
+        if job['participant_id'] in converted:
+            if not converted[job['participant_id']]:
+                failed.append(job['participant_id'])
+                continue
+            rendered.append(job)
+        
+        cert_url = f"/api/static/certificates_pdf/{job['stem']}.pdf"
+        generated.append({"participant_id": job['participant_id'], "certificate_url": cert_url})
+        if existing_urls.get(job['participant_id']) == cert_url:
+            continue
+        operations.append(UpdateOne(
+            {"participant_id": job['participant_id'], "session_id": session_id},
+            {
+                "$set": {"certificate_url": cert_url, "issue_date": issue_date, "program_name": program_name},
+                "$setOnInsert": {"id": str(uuid.uuid4())}
+            },
+            upsert=True
+        ))
+    
+    if operations:
+        await db.certificates.bulk_write(operations, ordered=False)
+    
+    # Old renders go only once the records point at the new PDFs
+    def evict_rendered():
+        for job in rendered:
+            evict_stale_certificate_files(job['participant_id'], session_id, job['stem'])
+    
+    await asyncio.to_thread(evict_rendered)
+    
+    return {
+        "session_id": session_id,
+        "generated": len(generated),
+        "cached": len(jobs) - len(pending),
+        "failed": failed,
+        "certificates": generated,
+        "message": f"Generated {len(generated)} certificate(s)" + (f", {len(failed)} failed" if failed else "")
+    }
+
+@api_router.get("/certificates/download/{certificate_id}")
+async def download_certificate(certificate_id: str, current_user: User = Depends(get_current_user)):
+    cert = await db.certificates.find_one({"id": certificate_id}, {"_id": 0})
+    if not cert:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    
+    # Only participant or admin can download
+    if current_user.role != "admin" and current_user.id != cert['participant_id']:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    cert_url = cert['certificate_url']
+    filename = cert_url.split('/')[-1]
+    
+    # Check if it's a PDF or DOCX
+    if filename.endswith('.pdf'):
+        file_path = CERTIFICATE_PDF_DIR / filename
+        media_type = 'application/pdf'
+    else:
+        file_path = CERTIFICATE_DIR / filename
+        media_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Certificate file not found")
@@ -6655,69 +6787,56 @@ async def upload_checklist_photo(file: UploadFile = File(...), current_user: Use
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Only image files are allowed")
     
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1]
-    filename = f"{str(uuid.uuid4())}.{file_extension}"
-    file_path = CHECKLIST_PHOTOS_DIR / filename
+    # Save the upload to a temporary file, then let the image pipeline write the variants
+    photo_id = str(uuid.uuid4())
+    upload_path = CHECKLIST_PHOTOS_DIR / f"{photo_id}.upload"
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    def save_upload():
+        with open(upload_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
     
-    photo_url = f"/api/static/checklist-photos/{filename}"
-    return {"photo_url": photo_url}
+    try:
+        await asyncio.to_thread(save_upload)
+        await image_pipeline.process(upload_path, CHECKLIST_PHOTOS_DIR, photo_id)
+    except UnsupportedImage:
+        raise HTTPException(status_code=400, detail="Unsupported or corrupt image file")
+    finally:
+        upload_path.unlink(missing_ok=True)
+    
+    photo_url = f"/api/static/checklist-photos/{variant_filename(photo_id, 'full')}"
+    return {
+        "photo_url": photo_url,
+        "variants": {variant: f"{photo_url}?variant={variant}" for variant in PHOTO_VARIANTS}
+    }
 
 @api_router.get("/static/checklist-photos/{filename}")
-async def get_checklist_photo(filename: str):
-    file_path = CHECKLIST_PHOTOS_DIR / filename
+async def get_checklist_photo(filename: str, variant: Optional[str] = None):
+    """Checklist photo; variant=medium or variant=thumb for a smaller copy (when one exists)"""
+    file_path = CHECKLIST_PHOTOS_DIR / Path(filename).name
+    if variant in PHOTO_VARIANTS:
+        variant_path = CHECKLIST_PHOTOS_DIR / variant_filename(file_path.stem, variant)
+        if variant_path.exists():
+            file_path = variant_path
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Photo not found")
     return FileResponse(file_path)
 
 # ============ AI REPORT GENERATION ============
 
-async def generate_training_report_content(session_id: str, program_id: str, company_id: str) -> str:
-    """Generate comprehensive training report using GPT-5"""
-    
-    # Gather all data
-    session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
-    program = await db.programs.find_one({"id": program_id}, {"_id": 0})
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
-    
-    # Get all participants
-    participant_ids = session.get('participant_ids', [])
-    participants = []
-    for pid in participant_ids:
-        user = await db.users.find_one({"id": pid}, {"_id": 0})
-        if user:
-            participants.append(user)
-    
-    # Get pre-test results
-    pre_tests = await db.test_results.find({
-        "session_id": session_id,
-        "test_type": "pre"
-    }, {"_id": 0}).to_list(100)
-    
-    # Get post-test results
-    post_tests = await db.test_results.find({
-        "session_id": session_id,
-        "test_type": "post"
-    }, {"_id": 0}).to_list(100)
-    
-    # Get checklists
-    checklists = await db.vehicle_checklists.find({
-        "session_id": session_id
-    }, {"_id": 0}).to_list(100)
+TRAINING_REPORT_SYSTEM_MESSAGE = "You are a professional training report writer specializing in defensive driving and riding training programs."
+
+def build_training_report_prompt(report_context: ReportContext) -> str:
+    """Prompt for the comprehensive training report, built from the preloaded report context"""
     
-    # Get feedback
-    feedbacks = await db.course_feedback.find({
-        "session_id": session_id
-    }, {"_id": 0}).to_list(100)
-    
-    # Get attendance
-    attendance = await db.attendance_records.find({
-        "session_id": session_id
-    }, {"_id": 0}).to_list(100)
+    session = report_context.session
+    program = report_context.program
+    company = report_context.company
+    participants = report_context.participants
+    pre_tests = report_context.tests_of_type("pre")
+    post_tests = report_context.tests_of_type("post")
+    checklists = report_context.checklists
+    feedbacks = report_context.feedback
+    attendance = report_context.attendance
     
     # Create participant ID to name mapping
     participant_map = {p.get('id'): p.get('full_name') for p in participants}
@@ -6768,7 +6887,7 @@ async def generate_training_report_content(session_id: str, program_id: str, com
         },
         "attendance": {
             "total_records": len(attendance),
-            "attendance_rate": len([a for a in attendance if a.get('clock_out_time')]) / len(attendance) * 100 if attendance else 100
+            "attendance_rate": len([a for a in attendance if a.get('clock_out')]) / len(attendance) * 100 if attendance else 100
         }
     }
     
@@ -6848,51 +6967,107 @@ ABSOLUTE CRITICAL RULES FOR VEHICLE INSPECTION SECTION:
 3. Use the 'Issue' field as the DESCRIPTION after the dash
 4. NEVER write "undefined" or leave item unnamed
 5. Be intelligent in extracting the core item name from any description"""
+    
+    return prompt
+
+def training_report_llm_key() -> str:
+    api_key = os.getenv('EMERGENT_LLM_KEY')
+    if not api_key:
+        raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
+    return api_key
 
-    # Call GPT-5
+async def generate_training_report_content(report_context: ReportContext) -> str:
+    """Generate comprehensive training report using GPT-5.
+    
+    The LLM call is awaited through the gateway (with its timeout), so the event loop keeps
+    serving other requests while the model is writing.
+    """
+    prompt = build_training_report_prompt(report_context)
     try:
-        api_key = os.getenv('EMERGENT_LLM_KEY')
-        llm = LlmChat(api_key=api_key)
-        
-        messages = [UserMessage(content=prompt)]
-        response = llm.chat(messages=messages, model="gpt-4o")
-        
-        return response.content
+        content, _ = await llm_gateway.complete(
+            prompt,
+            api_key=training_report_llm_key(),
+            system_message=TRAINING_REPORT_SYSTEM_MESSAGE,
+            session_id=f"training_report_{report_context.session['id']}"
+        )
+        return content
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"GPT-5 report generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
+async def load_training_report_context(session_id: str) -> ReportContext:
+    report_context = await build_report_context(session_id)
+    if not report_context:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if not report_context.program:
+        raise HTTPException(status_code=400, detail="Program not found for this session. Please ensure the session has a valid program assigned.")
+    if not report_context.company:
+        raise HTTPException(status_code=400, detail="Company not found for this session. Please ensure the session has a valid company assigned.")
+    return report_context
+
+async def save_draft_report(report_context: ReportContext, content: str, current_user: User) -> TrainingReport:
+    session = report_context.session
+    report = TrainingReport(
+        session_id=session['id'],
+        program_id=session['program_id'],
+        company_id=session['company_id'],
+        generated_by=current_user.id,
+        content=content,
+        status="draft"
+    )
+    await db.training_reports.insert_one(report.model_dump())
+    return report
+
 @api_router.post("/reports/generate")
 async def generate_report(request: ReportGenerateRequest, current_user: User = Depends(get_current_user)):
     """Generate AI training report (Coordinator only)"""
     if current_user.role not in ["coordinator", "admin"]:
         raise HTTPException(status_code=403, detail="Only coordinators can generate reports")
     
-    # Get session details
-    session = await db.sessions.find_one({"id": request.session_id}, {"_id": 0})
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    report_context = await load_training_report_context(request.session_id)
     
     # Generate report content
-    content = await generate_training_report_content(
-        request.session_id,
-        session['program_id'],
-        session['company_id']
-    )
+    content = await generate_training_report_content(report_context)
     
     # Save as draft
-    report = TrainingReport(
-        session_id=request.session_id,
-        program_id=session['program_id'],
-        company_id=session['company_id'],
-        generated_by=current_user.id,
-        content=content,
-        status="draft"
-    )
+    return await save_draft_report(report_context, content, current_user)
+
+@api_router.post("/reports/generate/stream")
+async def stream_generate_report(request: ReportGenerateRequest, current_user: User = Depends(get_current_user)):
+    """Generate AI training report as a server-sent event stream (Coordinator only).
     
-    await db.training_reports.insert_one(report.model_dump())
+    Sends the gateway's progress and content events; once the text is complete the draft
+    is saved and a final "report" event carries it.
+    """
+    if current_user.role not in ["coordinator", "admin"]:
+        raise HTTPException(status_code=403, detail="Only coordinators can generate reports")
     
-    return report
+    report_context = await load_training_report_context(request.session_id)
+    prompt = build_training_report_prompt(report_context)
+    api_key = training_report_llm_key()
+    
+    async def events():
+        parts = []
+        async for event in llm_gateway.stream(
+            prompt,
+            api_key=api_key,
+            system_message=TRAINING_REPORT_SYSTEM_MESSAGE,
+            session_id=f"training_report_{request.session_id}"
+        ):
+            if event["type"] == "content":
+                parts.append(event["text"])
+            yield format_sse(event)
+            if event["type"] == "done":
+                report = await save_draft_report(report_context, "".join(parts), current_user)
+                yield format_sse({"type": "report", "report": report.model_dump(mode="json")})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.get("/reports/session/{session_id}")
 async def get_session_report(session_id: str, current_user: User = Depends(get_current_user)):
@@ -7004,52 +7179,88 @@ async def get_supervisor_session_attendance(session_id: str, current_user: User
 
 # ============ FINANCE PORTAL ROUTES ============
 
+# Document numbering
+async def next_document_number(prefix: str, collection, field: str) -> str:
+    """Next number in the monthly sequence for prefix, e.g. INV/MDDRC/2025/12/0001.
+    
+    Sequences live in the counters collection (one document per prefix) and are
+    advanced with a single atomic $inc, so concurrent requests, on any worker,
+    never receive the same number.
+    """
+    counter = await db.counters.find_one_and_update(
+        {"_id": prefix},
+        {"$inc": {"seq": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        # First number of the month (or first since counters were introduced): start
+        # after the highest number already issued. $max keeps concurrent seeds idempotent.
+        last_doc = await collection.find_one(
+            # $gt "" repeats the unique index's partial filter so the scan can use it
+            {field: {"$regex": f"^{prefix}", "$gt": ""}},
+            {"_id": 0, field: 1},
+            sort=[(field, -1)]
+        )
+        last_num = int(last_doc[field].split("/")[-1]) if last_doc else 0
+        await db.counters.update_one({"_id": prefix}, {"$max": {"seq": last_num}}, upsert=True)
+        counter = await db.counters.find_one_and_update(
+            {"_id": prefix},
+            {"$inc": {"seq": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    return f"{prefix}{counter['seq']:04d}"
+
 # Invoice number generation
 async def generate_invoice_number():
     """Generate unique invoice number: INV/MDDRC/YYYY/MM/0001
     Resets sequence each month"""
     now = get_malaysia_time()
-    year = now.year
-    month = now.month
-    prefix = f"INV/MDDRC/{year}/{month:02d}/"
-    
-    last_invoice = await db.invoices.find_one(
-        {"invoice_number": {"$regex": f"^INV/MDDRC/{year}/{month:02d}/"}},
-        sort=[("invoice_number", -1)]
-    )
-    
-    if last_invoice:
-        # Extract last number from invoice number like INV/MDDRC/2025/12/0001
-        last_num = int(last_invoice["invoice_number"].split("/")[-1])
-        new_num = last_num + 1
-    else:
-        new_num = 1
-    
-    return f"{prefix}{new_num:04d}"
+    return await next_document_number(f"INV/MDDRC/{now.year}/{now.month:02d}/", db.invoices, "invoice_number")
 
 # Credit Note number generation
 async def generate_credit_note_number():
     """Generate unique credit note number: CN/MDDRC/YYYY/MM/0001
     Resets sequence each month"""
     now = get_malaysia_time()
-    year = now.year
-    month = now.month
-    prefix = f"CN/MDDRC/{year}/{month:02d}/"
-    
-    last_cn = await db.credit_notes.find_one(
-        {"cn_number": {"$regex": f"^CN/MDDRC/{year}/{month:02d}/"}},
-        sort=[("cn_number", -1)]
-    )
-    
-    if last_cn:
-        last_num = int(last_cn["cn_number"].split("/")[-1])
-        new_num = last_num + 1
-    else:
-        new_num = 1
-    
-    return f"{prefix}{new_num:04d}"
+    return await next_document_number(f"CN/MDDRC/{now.year}/{now.month:02d}/", db.credit_notes, "cn_number")
 
 # Audit logging for finance
+# Fields that change on every write and say nothing about what was changed
+AUDIT_IGNORED_FIELDS = {"_id", "updated_at"}
+AUDIT_VALUE_MAX_CHARS = 500
+
+def audit_value(value):
+    """JSON-safe copy of a value for the audit log; large nested values are summarised"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    encoded = json.dumps(value, default=str, ensure_ascii=False)
+    if len(encoded) <= AUDIT_VALUE_MAX_CHARS:
+        return json.loads(encoded)
+    if isinstance(value, list):
+        return f"[{len(value)} items]"
+    if isinstance(value, dict):
+        return f"{{{len(value)} fields}}"
+    return encoded[:AUDIT_VALUE_MAX_CHARS] + "…"
+
+def audit_changes(before_value: Optional[dict], after_value: Optional[dict]) -> List[dict]:
+    """Field-level differences between two versions of a record.
+    
+    after_value may be a partial update, so only its fields are compared; when it is
+    absent (a deletion) the fields of before_value are listed instead.
+    """
+    before_value = before_value or {}
+    fields = after_value if after_value is not None else before_value
+    changes = []
+    for field in fields:
+        if field in AUDIT_IGNORED_FIELDS:
+            continue
+        old = before_value.get(field)
+        new = (after_value or {}).get(field)
+        if old != new:
+            changes.append({"field": field, "from": audit_value(old), "to": audit_value(new)})
+    return changes
+
 async def log_finance_action(entity_type: str, entity_id: str, action: str, 
                              changed_by: str, before_value: dict = None, 
                              after_value: dict = None, reason: str = None):
@@ -7058,8 +7269,7 @@ async def log_finance_action(entity_type: str, entity_id: str, action: str,
         "entity_type": entity_type,
         "entity_id": entity_id,
         "action": action,
-        "before_value": before_value,
-        "after_value": after_value,
+        "changes": audit_changes(before_value, after_value),
         "changed_by": changed_by,
         "reason": reason,
         "timestamp": get_malaysia_time().isoformat()
@@ -7088,6 +7298,8 @@ async def create_auto_invoice_for_session(session_data: dict, created_by: str):
         "tax_rate": 0.0,
         "tax_amount": 0.0,
         "total_amount": 0.0,
+        "amount_paid": 0.0,
+        "balance_due": 0.0,
         "status": "auto_draft",
         "created_at": get_malaysia_time().isoformat(),
         "updated_at": get_malaysia_time().isoformat(),
@@ -7095,6 +7307,7 @@ async def create_auto_invoice_for_session(session_data: dict, created_by: str):
     }
     
     await db.invoices.insert_one(invoice)
+    await invalidate_session_costing(invoice["session_id"])
     
     await log_finance_action(
         entity_type="invoice",
@@ -7139,6 +7352,14 @@ async def get_invoice(invoice_id: str, current_user: User = Depends(get_current_
     
     return invoice
 
+def invoice_update_pipeline(fields: dict) -> list:
+    """Update setting fields on an invoice; with a new total_amount, balance_due is recomputed from
+    the stored amount_paid in the same write, so a payment landing meanwhile is not overwritten"""
+    stage = {field: {"$literal": value} for field, value in fields.items()}
+    if "total_amount" in fields:
+        stage["balance_due"] = {"$subtract": [{"$literal": fields["total_amount"]}, {"$ifNull": ["$amount_paid", 0]}]}
+    return [{"$set": stage}]
+
 @api_router.put("/finance/invoices/{invoice_id}")
 async def update_invoice(
     invoice_id: str,
@@ -7160,7 +7381,8 @@ async def update_invoice(
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     update_dict["updated_at"] = get_malaysia_time().isoformat()
     
-    await db.invoices.update_one({"id": invoice_id}, {"$set": update_dict})
+    await db.invoices.update_one({"id": invoice_id}, invoice_update_pipeline(update_dict))
+    await invalidate_session_costing(invoice.get("session_id"))
     
     if "status" in update_dict:
         await db.sessions.update_one(
@@ -7245,6 +7467,7 @@ async def issue_invoice(invoice_id: str, current_user: User = Depends(get_curren
             }},
             upsert=True
         )
+        await invalidate_session_costing(session["id"])
     
     await log_finance_action("invoice", invoice_id, "status_changed", current_user.id,
                             {"status": invoice.get("status")}, {"status": "issued"})
@@ -7407,19 +7630,116 @@ async def create_session_credit_note(session_id: str, cn_data: dict, current_use
     
     return {"message": "Credit note created", "cn_number": cn_number, "id": credit_note["id"], "amount": cn_amount}
 
+# Balances within half a cent count as settled (amounts are summed as floats)
+PAYMENT_TOLERANCE = 0.005
+transactions_supported: Optional[bool] = None
+
+async def run_in_transaction(operation):
+    """Run operation(session) in a multi-document transaction.
+    
+    with_transaction retries the whole operation on transient errors (e.g. a write conflict
+    with a concurrent payment on the same invoice) and on unknown commit results, so
+    operation must be safe to run again. A standalone MongoDB server (e.g. local
+    development) has no transactions; there the operation runs without one (session None),
+    which is detected once and logged.
+    """
+    global transactions_supported
+    if transactions_supported is not False:
+        try:
+            async with await client.start_session() as session:
+                return await session.with_transaction(operation)
+        except OperationFailure as e:
+            if e.code != 20:  # IllegalOperation: not a replica set member or mongos
+                raise
+            transactions_supported = False
+            logging.warning("⚠️  MongoDB transactions unavailable (standalone server); payments are recorded without one")
+    return await operation(None)
+
+async def apply_invoice_payment(invoice_id: str, amount: float, session=None) -> dict:
+    """Add amount (negative for a reversal) to the invoice's amount_paid; returns the updated invoice.
+    
+    Only invoices whose balance is maintained are changed: $inc on a missing amount_paid
+    would start from 0 and leave balance_due at -amount. Run backfill_invoice_balances for
+    the invoice first.
+    """
+    invoice = await db.invoices.find_one_and_update(
+        {"id": invoice_id, "amount_paid": {"$exists": True}},
+        {"$inc": {"amount_paid": amount, "balance_due": -amount}, "$set": {"updated_at": get_malaysia_time().isoformat()}},
+        projection={"_id": 0, "id": 1, "status": 1, "amount_paid": 1, "balance_due": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if invoice is None:
+        # Raised inside the transaction, so the payment change is rolled back with it
+        raise HTTPException(status_code=409, detail="Invoice balance is not initialised; please retry")
+    return invoice
+
+async def require_invoice_balance(invoice_id: str, session=None):
+    """Without a transaction, check the invoice balance is maintained before the payment is
+    written: a 409 from apply_invoice_payment afterwards could not undo it"""
+    if session is None and not await db.invoices.count_documents({"id": invoice_id, "amount_paid": {"$exists": True}}, limit=1):
+        raise HTTPException(status_code=409, detail="Invoice balance is not initialised; please retry")
+
+async def sync_invoice_paid_status(invoice: dict):
+    """issued <-> paid from the maintained balance, without reading the payments"""
+    if invoice.get("status") == "issued" and invoice.get("balance_due", 0) <= PAYMENT_TOLERANCE:
+        new_status, old_status = "paid", "issued"
+    elif invoice.get("status") == "paid" and invoice.get("balance_due", 0) > PAYMENT_TOLERANCE:
+        new_status, old_status = "issued", "paid"
+    else:
+        return
+    
+    # Conditional on the status read, so concurrent payments switch it once
+    result = await db.invoices.update_one(
+        {"id": invoice["id"], "status": old_status},
+        {"$set": {"status": new_status, "updated_at": get_malaysia_time().isoformat()}}
+    )
+    if result.modified_count:
+        await db.sessions.update_one({"invoice_id": invoice["id"]}, {"$set": {"invoice_status": new_status}})
+
+async def backfill_invoice_balances(invoice_ids: Optional[List[str]] = None) -> int:
+    """Set amount_paid/balance_due on invoices created before they were maintained (all, or invoice_ids)"""
+    query = {"amount_paid": {"$exists": False}}
+    if invoice_ids is not None:
+        query["id"] = {"$in": invoice_ids}
+    invoices = await db.invoices.find(query, {"_id": 0, "id": 1, "total_amount": 1}).to_list(None)
+    if not invoices:
+        return 0
+    
+    paid = {
+        row["_id"]: row["amount"] for row in await db.payments.aggregate([
+            {"$match": {"invoice_id": {"$in": [inv["id"] for inv in invoices]}, "reversed": {"$ne": True}}},
+            {"$group": {"_id": "$invoice_id", "amount": {"$sum": "$amount"}}}
+        ]).to_list(None)
+    }
+    await db.invoices.bulk_write([
+        UpdateOne(
+            {"id": inv["id"], "amount_paid": {"$exists": False}},
+            {"$set": {
+                "amount_paid": paid.get(inv["id"], 0),
+                "balance_due": (inv.get("total_amount") or 0) - paid.get(inv["id"], 0)
+            }}
+        )
+        for inv in invoices
+    ], ordered=False)
+    return len(invoices)
+
 @api_router.post("/finance/payments")
 async def record_payment(payment_data: PaymentCreate, current_user: User = Depends(get_current_user)):
     """Record payment"""
     if current_user.role not in ["admin", "super_admin", "finance"]:
         raise HTTPException(status_code=403, detail="Only Finance can record payments")
     
-    invoice = await db.invoices.find_one({"id": payment_data.invoice_id}, {"_id": 0})
+    invoice = await db.invoices.find_one({"id": payment_data.invoice_id}, {"_id": 0, "id": 1, "status": 1})
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
     if invoice.get("status") not in ["issued", "paid"]:
         raise HTTPException(status_code=400, detail="Can only record payments for issued invoices")
     
+    if payment_data.amount <= 0:
+        raise HTTPException(status_code=400, detail="Payment amount must be positive")
+    
     payment = {
         "id": str(uuid.uuid4()),
         "invoice_id": payment_data.invoice_id,
@@ -7429,23 +7749,73 @@ async def record_payment(payment_data: PaymentCreate, current_user: User = Depen
         "reference_number": payment_data.reference_number,
         "notes": payment_data.notes,
         "recorded_by": current_user.id,
+        "reversed": False,
         "created_at": get_malaysia_time().isoformat()
     }
     
-    await db.payments.insert_one(payment)
+    # Legacy invoice (startup backfill skipped or still running): set its balance from past payments first
+    await backfill_invoice_balances([payment_data.invoice_id])
     
-    # Check if fully paid
-    all_payments = await db.payments.find({"invoice_id": payment_data.invoice_id}, {"_id": 0}).to_list(100)
-    total_paid = sum(p.get("amount", 0) for p in all_payments)
+    async def apply(session):
+        await require_invoice_balance(payment_data.invoice_id, session)
+        await db.payments.insert_one(payment, session=session)
+        return await apply_invoice_payment(payment_data.invoice_id, payment_data.amount, session)
     
-    if total_paid >= invoice.get("total_amount", 0):
-        await db.invoices.update_one({"id": payment_data.invoice_id}, {"$set": {"status": "paid", "updated_at": get_malaysia_time().isoformat()}})
-        await db.sessions.update_one({"invoice_id": payment_data.invoice_id}, {"$set": {"invoice_status": "paid"}})
+    # Payment and balance change together
+    updated_invoice = await run_in_transaction(apply)
+    payment.pop("_id", None)
     
+    await sync_invoice_paid_status(updated_invoice)
     await log_finance_action("payment", payment["id"], "created", current_user.id, after_value=payment)
     
     return payment
 
+@api_router.post("/finance/payments/{payment_id}/reverse")
+async def reverse_payment(payment_id: str, reversal: PaymentReversal, current_user: User = Depends(get_current_user)):
+    """Reverse a payment (e.g. bounced cheque): the record is kept and its amount is taken off the invoice"""
+    if current_user.role not in ["admin", "super_admin", "finance"]:
+        raise HTTPException(status_code=403, detail="Only Finance can reverse payments")
+    
+    if not reversal.reason.strip():
+        raise HTTPException(status_code=400, detail="A reason is required to reverse a payment")
+    
+    existing = await db.payments.find_one({"id": payment_id}, {"_id": 0, "invoice_id": 1})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    await backfill_invoice_balances([existing["invoice_id"]])
+    
+    reversed_fields = {
+        "reversed": True,
+        "reversed_at": get_malaysia_time().isoformat(),
+        "reversed_by": current_user.id,
+        "reversal_reason": reversal.reason
+    }
+    
+    async def apply(session):
+        await require_invoice_balance(existing["invoice_id"], session)
+        # Conditional on not being reversed yet, so a payment is only ever taken off once
+        payment = await db.payments.find_one_and_update(
+            {"id": payment_id, "reversed": {"$ne": True}},
+            {"$set": reversed_fields},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if payment is None:
+            return None, None
+        invoice = await apply_invoice_payment(payment["invoice_id"], -payment["amount"], session)
+        return payment, invoice
+    
+    payment, updated_invoice = await run_in_transaction(apply)
+    if payment is None:
+        raise HTTPException(status_code=400, detail="Payment is already reversed")
+    payment.pop("_id", None)
+    
+    await sync_invoice_paid_status(updated_invoice)
+    await log_finance_action("payment", payment_id, "reversed", current_user.id,
+                            {"reversed": False}, {"reversed": True}, reason=reversal.reason)
+    
+    return {**payment, **reversed_fields}
+
 @api_router.get("/finance/payments")
 async def get_payments(invoice_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
     """Get payments"""
@@ -7458,8 +7828,116 @@ async def get_payments(invoice_id: Optional[str] = None, current_user: User = De
     
     return await db.payments.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
 
+# Income records per page unless a full date range is requested
+INCOME_PAGE_SIZE = 50
+
+async def build_income_statement(
+    collection,
+    match: dict,
+    amount_field: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    page: int = 1,
+    limit: Optional[int] = None,
+    map_amount: bool = True
+) -> dict:
+    """Income records of one person with session and company details, newest first.
+    
+    The totals (one $group) and the page of records (an indexed find on the person and
+    created_at) are queried concurrently. The page is then enriched with one $in query on
+    sessions and one on companies. start_date/end_date (YYYY-MM-DD) filter on the session
+    start date. Records are paged (INCOME_PAGE_SIZE by default); every record is returned
+    only for an explicit date range (both start_date and end_date) without a limit.
+    """
+    if not limit and not (start_date and end_date):
+        limit = INCOME_PAGE_SIZE
+    match = dict(match)
+    if start_date or end_date:
+        date_range = {}
+        if start_date:
+            date_range["$gte"] = start_date
+        if end_date:
+            date_range["$lte"] = end_date
+        # Only this person's sessions are checked against the date range
+        session_ids = await collection.distinct("session_id", match)
+        match["session_id"] = {"$in": await db.sessions.distinct("id", {"id": {"$in": session_ids}, "start_date": date_range})}
+    
+    page = max(1, page)
+    records_query = collection.find(match, {"_id": 0}).sort([("created_at", -1), ("id", -1)])
+    if limit:
+        records_query = records_query.skip((page - 1) * limit).limit(limit)
+    
+    summary_rows, records = await asyncio.gather(
+        collection.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "total": {"$sum": {"$ifNull": [f"${amount_field}", 0]}},
+                "paid": {"$sum": {"$cond": [{"$eq": ["$status", "paid"]}, {"$ifNull": [f"${amount_field}", 0]}, 0]}}
+            }}
+        ]).to_list(1),
+        records_query.to_list(None)
+    )
+    summary = summary_rows[0] if summary_rows else {"count": 0, "total": 0, "paid": 0}
+    
+    session_ids = list({r.get("session_id") for r in records if r.get("session_id")})
+    sessions = {
+        s["id"]: s for s in await db.sessions.find(
+            {"id": {"$in": session_ids}},
+            {"_id": 0, "id": 1, "name": 1, "start_date": 1, "end_date": 1, "company_id": 1}
+        ).to_list(None)
+    } if session_ids else {}
+    company_ids = list({s.get("company_id") for s in sessions.values() if s.get("company_id")})
+    companies = {
+        c["id"]: c.get("name") for c in await db.companies.find(
+            {"id": {"$in": company_ids}},
+            {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+    } if company_ids else {}
+    
+    for record in records:
+        session = sessions.get(record.get("session_id"))
+        if session:
+            record["session_name"] = session.get("name")
+            record["training_dates"] = f"{session.get('start_date')} to {session.get('end_date')}"
+            record["company_name"] = companies.get(session.get("company_id"))
+        if map_amount:
+            record["amount"] = record.get(amount_field, 0)  # Map the fee field to amount for consistency
+    
+    return {
+        "records": records,
+        "total": summary["total"],
+        "paid": summary["paid"],
+        "count": summary["count"],
+        "page": page,
+        "limit": limit,
+        "has_more": bool(limit) and page * limit < summary["count"]
+    }
+
+def income_response(statement: dict, total_key: str, paid_key: str, pending_key: str) -> dict:
+    return {
+        "records": statement["records"],
+        "summary": {
+            total_key: statement["total"],
+            paid_key: statement["paid"],
+            pending_key: statement["total"] - statement["paid"]
+        },
+        "total_records": statement["count"],
+        "page": statement["page"],
+        "limit": statement["limit"],
+        "has_more": statement["has_more"]
+    }
+
 @api_router.get("/finance/income/trainer/{trainer_id}")
-async def get_trainer_income(trainer_id: str, current_user: User = Depends(get_current_user)):
+async def get_trainer_income(
+    trainer_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    page: int = 1,
+    limit: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
     """Get trainer income from all sessions"""
     if current_user.role == "trainer" and current_user.id != trainer_id:
         raise HTTPException(status_code=403, detail="Can only view your own income")
@@ -7467,30 +7945,22 @@ async def get_trainer_income(trainer_id: str, current_user: User = Depends(get_c
     if current_user.role not in ["admin", "super_admin", "finance", "trainer"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Get records from trainer_fees collection (set in session costing)
-    records = await db.trainer_fees.find({"trainer_id": trainer_id}, {"_id": 0}).to_list(1000)
-    
-    # Enrich with session details
-    for record in records:
-        session = await db.sessions.find_one({"id": record.get("session_id")}, {"_id": 0, "name": 1, "start_date": 1, "end_date": 1})
-        company = None
-        if session:
-            record["session_name"] = session.get("name")
-            record["training_dates"] = f"{session.get('start_date')} to {session.get('end_date')}"
-            # Get company name
-            session_full = await db.sessions.find_one({"id": record.get("session_id")}, {"_id": 0, "company_id": 1})
-            if session_full:
-                company = await db.companies.find_one({"id": session_full.get("company_id")}, {"_id": 0, "name": 1})
-                record["company_name"] = company.get("name") if company else None
-        record["amount"] = record.get("fee_amount", 0)  # Map fee_amount to amount for consistency
-    
-    total = sum(r.get("fee_amount", 0) for r in records)
-    paid = sum(r.get("fee_amount", 0) for r in records if r.get("status") == "paid")
-    
-    return {"records": records, "summary": {"total_income": total, "paid_income": paid, "pending_income": total - paid}}
+    # Records from trainer_fees collection (set in session costing)
+    statement = await build_income_statement(
+        db.trainer_fees, {"trainer_id": trainer_id}, "fee_amount",
+        start_date=start_date, end_date=end_date, page=page, limit=limit
+    )
+    return income_response(statement, "total_income", "paid_income", "pending_income")
 
 @api_router.get("/finance/income/coordinator/{coordinator_id}")
-async def get_coordinator_income(coordinator_id: str, current_user: User = Depends(get_current_user)):
+async def get_coordinator_income(
+    coordinator_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    page: int = 1,
+    limit: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
     """Get coordinator income from all sessions"""
     if current_user.role == "coordinator" and current_user.id != coordinator_id:
         if "coordinator" not in (current_user.additional_roles or []):
@@ -7500,26 +7970,21 @@ async def get_coordinator_income(coordinator_id: str, current_user: User = Depen
         if "coordinator" not in (current_user.additional_roles or []):
             raise HTTPException(status_code=403, detail="Access denied")
     
-    records = await db.coordinator_fees.find({"coordinator_id": coordinator_id}, {"_id": 0}).to_list(1000)
-    
-    # Enrich with session details
-    for record in records:
-        session = await db.sessions.find_one({"id": record.get("session_id")}, {"_id": 0, "name": 1, "start_date": 1, "end_date": 1, "company_id": 1})
-        if session:
-            record["session_name"] = session.get("name")
-            record["training_dates"] = f"{session.get('start_date')} to {session.get('end_date')}"
-            # Get company name
-            company = await db.companies.find_one({"id": session.get("company_id")}, {"_id": 0, "name": 1})
-            record["company_name"] = company.get("name") if company else None
-        record["amount"] = record.get("total_fee", 0)  # Map total_fee to amount for consistency
-    
-    total = sum(r.get("total_fee", 0) for r in records)
-    paid = sum(r.get("total_fee", 0) for r in records if r.get("status") == "paid")
-    
-    return {"records": records, "summary": {"total_fees": total, "paid_fees": paid, "pending_fees": total - paid}}
+    statement = await build_income_statement(
+        db.coordinator_fees, {"coordinator_id": coordinator_id}, "total_fee",
+        start_date=start_date, end_date=end_date, page=page, limit=limit
+    )
+    return income_response(statement, "total_fees", "paid_fees", "pending_fees")
 
 @api_router.get("/finance/income/marketing/{marketing_id}")
-async def get_marketing_income(marketing_id: str, current_user: User = Depends(get_current_user)):
+async def get_marketing_income(
+    marketing_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    page: int = 1,
+    limit: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
     """Get marketing income"""
     is_marketing = current_user.role == "marketing" or "marketing" in (current_user.additional_roles or [])
     
@@ -7530,20 +7995,11 @@ async def get_marketing_income(marketing_id: str, current_user: User = Depends(g
         if "marketing" not in (current_user.additional_roles or []):
             raise HTTPException(status_code=403, detail="Access denied")
     
-    records = await db.marketing_commissions.find({"marketing_user_id": marketing_id}, {"_id": 0}).to_list(1000)
-    
-    for record in records:
-        session = await db.sessions.find_one({"id": record.get("session_id")}, {"_id": 0, "name": 1, "start_date": 1, "end_date": 1, "company_id": 1})
-        if session:
-            record["session_name"] = session.get("name")
-            record["training_dates"] = f"{session.get('start_date')} to {session.get('end_date')}"
-            company = await db.companies.find_one({"id": session.get("company_id")}, {"_id": 0, "name": 1})
-            record["company_name"] = company.get("name") if company else None
-    
-    total = sum(r.get("calculated_amount", 0) for r in records)
-    paid = sum(r.get("calculated_amount", 0) for r in records if r.get("status") == "paid")
-    
-    return {"records": records, "summary": {"total_commission": total, "paid_commission": paid, "pending_commission": total - paid}}
+    statement = await build_income_statement(
+        db.marketing_commissions, {"marketing_user_id": marketing_id}, "calculated_amount",
+        start_date=start_date, end_date=end_date, page=page, limit=limit, map_amount=False
+    )
+    return income_response(statement, "total_commission", "paid_commission", "pending_commission")
 
 @api_router.get("/finance/marketing-users")
 async def get_marketing_users(current_user: User = Depends(get_current_user)):
@@ -7565,21 +8021,45 @@ async def get_finance_dashboard(current_user: User = Depends(get_current_user)):
     if current_user.role not in ["admin", "super_admin", "finance"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    total_invoices = await db.invoices.count_documents({})
-    draft_invoices = await db.invoices.count_documents({"status": {"$in": ["auto_draft", "finance_review"]}})
-    approved_invoices = await db.invoices.count_documents({"status": "approved"})
-    issued_invoices = await db.invoices.count_documents({"status": "issued"})
-    paid_invoices = await db.invoices.count_documents({"status": "paid"})
+    async def pending_total(collection, match, field):
+        rows = await collection.aggregate([
+            {"$match": match},
+            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": [f"${field}", 0]}}}}
+        ]).to_list(1)
+        return rows[0]["total"] if rows else 0
+    
+    # One grouped pass over invoices gives every status count and amount; the payables
+    # sums run alongside it, so the totals are computed in MongoDB at any volume
+    invoice_rows, pending_trainer, pending_coord, pending_comm = await asyncio.gather(
+        db.invoices.aggregate([
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "amount": {"$sum": {"$ifNull": ["$total_amount", 0]}},
+                "collected": {"$sum": {"$ifNull": ["$amount_paid", 0]}}
+            }}
+        ]).to_list(None),
+        pending_total(db.trainer_income, {"status": "pending"}, "amount"),
+        pending_total(db.coordinator_fees, {"status": "pending"}, "amount"),
+        pending_total(db.marketing_commissions, {"status": {"$in": ["pending", "approved"]}}, "calculated_amount")
+    )
+    by_status = {row["_id"]: row for row in invoice_rows}
     
-    all_invoices = await db.invoices.find({"status": {"$in": ["issued", "paid"]}}, {"_id": 0, "total_amount": 1, "status": 1}).to_list(1000)
-    total_issued_amount = sum(inv.get("total_amount", 0) for inv in all_invoices)
-    total_collected = sum(inv.get("total_amount", 0) for inv in all_invoices if inv.get("status") == "paid")
+    def status_count(*statuses):
+        return sum(by_status[s]["count"] for s in statuses if s in by_status)
     
-    pending_trainer = await db.trainer_income.find({"status": "pending"}, {"_id": 0, "amount": 1}).to_list(1000)
-    pending_coord = await db.coordinator_fees.find({"status": "pending"}, {"_id": 0, "amount": 1}).to_list(1000)
-    pending_comm = await db.marketing_commissions.find({"status": {"$in": ["pending", "approved"]}}, {"_id": 0, "calculated_amount": 1}).to_list(1000)
+    def status_amount(*statuses, field="amount"):
+        return sum(by_status[s][field] for s in statuses if s in by_status)
     
-    total_pending = sum(r.get("amount", 0) for r in pending_trainer) + sum(r.get("amount", 0) for r in pending_coord) + sum(r.get("calculated_amount", 0) for r in pending_comm)
+    total_invoices = sum(row["count"] for row in invoice_rows)
+    draft_invoices = status_count("auto_draft", "finance_review")
+    approved_invoices = status_count("approved")
+    issued_invoices = status_count("issued")
+    paid_invoices = status_count("paid")
+    
+    total_issued_amount = status_amount("issued", "paid")
+    total_collected = status_amount("issued", "paid", field="collected")
+    total_pending = pending_trainer + pending_coord + pending_comm
     
     return {
         "invoices": {"total": total_invoices, "draft": draft_invoices, "approved": approved_invoices, "issued": issued_invoices, "paid": paid_invoices},
@@ -7587,39 +8067,181 @@ async def get_finance_dashboard(current_user: User = Depends(get_current_user)):
         "payables": {"pending_total": total_pending}
     }
 
+# Receivables aging: invoices are due INVOICE_PAYMENT_TERMS_DAYS after issue
+INVOICE_PAYMENT_TERMS_DAYS = int(os.environ.get("INVOICE_PAYMENT_TERMS_DAYS", "30"))
+AGING_BUCKETS = [("current", 0), ("1_30", 30), ("31_60", 60), ("61_90", 90)]  # (bucket, days past due up to)
+CASH_FLOW_WEEKS = 12
+receivables_cache = TTLCache(maxsize=8, ttl=int(os.environ.get("RECEIVABLES_CACHE_SECONDS", "120")))
+
+def issued_before_switch(boundaries: List[tuple], default: str) -> dict:
+    """$switch labelling an invoice by the first boundary its issued_at is at or after.
+    
+    issued_at is stored as an ISO string in Malaysia time, so the boundaries are ISO
+    strings too and comparing them orders by time.
+    """
+    return {"$switch": {
+        "branches": [{"case": {"$gte": ["$issued_at", cutoff]}, "then": label} for label, cutoff in boundaries],
+        "default": default
+    }}
+
+async def build_receivables_aging() -> dict:
+    now = get_malaysia_time()
+    due_cutoff = now - timedelta(days=INVOICE_PAYMENT_TERMS_DAYS)  # issued before this = past due
+    
+    aging_boundaries = [(bucket, (due_cutoff - timedelta(days=days)).isoformat()) for bucket, days in AGING_BUCKETS]
+    # Weeks counted back from the week the newest invoices fall due, so week 0 is due within 7 days
+    cash_flow_boundaries = [
+        (str(week), (due_cutoff + timedelta(days=7 * week)).isoformat())
+        for week in reversed(range(CASH_FLOW_WEEKS))
+    ]
+    
+    results = await db.invoices.aggregate([
+        {"$match": {"status": "issued", "balance_due": {"$gt": 0}}},
+        {"$project": {
+            "_id": 0,
+            "company_id": 1,
+            "company_name": 1,
+            "issued_at": {"$ifNull": ["$issued_at", ""]},
+            "balance": "$balance_due"
+        }},
+        {"$facet": {
+            "aging": [
+                {"$addFields": {"bucket": issued_before_switch(aging_boundaries, "90_plus")}},
+                {"$group": {
+                    "_id": {"company_id": "$company_id", "bucket": "$bucket"},
+                    "company_name": {"$first": "$company_name"},
+                    "amount": {"$sum": "$balance"},
+                    "invoices": {"$sum": 1}
+                }}
+            ],
+            "cash_flow": [
+                {"$addFields": {"week": issued_before_switch(cash_flow_boundaries, "overdue")}},
+                {"$group": {"_id": "$week", "amount": {"$sum": "$balance"}, "invoices": {"$sum": 1}}}
+            ]
+        }}
+    ]).to_list(1)
+    facets = results[0] if results else {"aging": [], "cash_flow": []}
+    
+    bucket_names = [bucket for bucket, _ in AGING_BUCKETS] + ["90_plus"]
+    totals = {bucket: 0 for bucket in bucket_names}
+    companies = {}
+    for row in facets["aging"]:
+        company_id = row["_id"].get("company_id")
+        company = companies.setdefault(company_id, {
+            "company_id": company_id,
+            "company_name": row.get("company_name") or "Unknown",
+            **{bucket: 0 for bucket in bucket_names},
+            "total": 0,
+            "invoices": 0
+        })
+        company[row["_id"]["bucket"]] += row["amount"]
+        company["total"] += row["amount"]
+        company["invoices"] += row["invoices"]
+        totals[row["_id"]["bucket"]] += row["amount"]
+    totals["total"] = sum(totals[bucket] for bucket in bucket_names)
+    
+    by_week = {row["_id"]: row for row in facets["cash_flow"]}
+    overdue = by_week.get("overdue", {})
+    schedule = [{
+        "period": "overdue",
+        "week_start": None,
+        "amount": overdue.get("amount", 0),
+        "invoices": overdue.get("invoices", 0)
+    }]
+    for week in range(CASH_FLOW_WEEKS):
+        row = by_week.get(str(week), {})
+        schedule.append({
+            "period": f"week_{week + 1}",
+            "week_start": (now + timedelta(days=7 * week)).strftime("%Y-%m-%d"),
+            "amount": row.get("amount", 0),
+            "invoices": row.get("invoices", 0)
+        })
+    
+    return {
+        "as_of": now.isoformat(),
+        "payment_terms_days": INVOICE_PAYMENT_TERMS_DAYS,
+        "buckets": bucket_names,
+        "totals": totals,
+        "companies": sorted(companies.values(), key=lambda c: c["total"], reverse=True),
+        "cash_flow": schedule
+    }
+
+@api_router.get("/finance/receivables/aging")
+async def get_receivables_aging(refresh: bool = False, current_user: User = Depends(get_current_user)):
+    """Outstanding receivables by days past due and company, with the expected cash-in per week.
+    Cached for a short time; refresh=true recomputes."""
+    if current_user.role not in ["admin", "super_admin", "finance"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    report = None if refresh else receivables_cache.get("aging")
+    if report is None:
+        report = await build_receivables_aging()
+        receivables_cache["aging"] = report
+    return report
+
 @api_router.get("/finance/audit-log")
-async def get_audit_log(entity_type: Optional[str] = None, entity_id: Optional[str] = None, limit: int = 100, current_user: User = Depends(get_current_user)):
-    """Get audit log"""
+async def get_audit_log(
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    """Get audit log, newest first. cursor is the next_cursor of the previous page."""
     if current_user.role not in ["admin", "super_admin", "finance"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
+    limit = max(1, min(limit, 500))
     query = {}
     if entity_type:
         query["entity_type"] = entity_type
     if entity_id:
         query["entity_id"] = entity_id
+    if cursor:
+        try:
+            timestamp, log_id = cursor.rsplit("|", 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": log_id}}
+        ]
     
-    logs = await db.finance_audit_log.find(query, {"_id": 0}).sort("timestamp", -1).to_list(limit)
+    logs = await db.finance_audit_log.find(query, {"_id": 0}).sort([("timestamp", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = f"{logs[-1]['timestamp']}|{logs[-1]['id']}"
+    
+    # User names for the whole page in one query
+    user_ids = list({log.get("changed_by") for log in logs if log.get("changed_by")})
+    names = {
+        u["id"]: u.get("full_name") for u in await db.users.find(
+            {"id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "full_name": 1}
+        ).to_list(None)
+    } if user_ids else {}
     
-    # Enrich with user names and ensure serializable
     result = []
     for log in logs:
-        user = await db.users.find_one({"id": log.get("changed_by")}, {"_id": 0, "full_name": 1})
-        log_dict = {
+        changes = log.get("changes")
+        if changes is None:
+            # Entries written before diffs were stored keep whole snapshots
+            changes = audit_changes(log.get("before_value"), log.get("after_value"))
+        result.append({
             "id": log.get("id"),
             "entity_type": log.get("entity_type"),
             "entity_id": log.get("entity_id"),
             "action": log.get("action"),
             "changed_by": log.get("changed_by"),
-            "changed_by_name": user.get("full_name") if user else "Unknown",
+            "changed_by_name": names.get(log.get("changed_by"), "Unknown"),
             "timestamp": log.get("timestamp"),
-            "before_value": str(log.get("before_value", "")) if log.get("before_value") else None,
-            "after_value": str(log.get("after_value", "")) if log.get("after_value") else None,
+            "changes": changes,
+            "reason": log.get("reason"),
             "remark": log.get("remark")
-        }
-        result.append(log_dict)
+        })
     
-    return result
+    return {"logs": result, "next_cursor": next_cursor}
 
 @api_router.post("/finance/income/trainer/{record_id}/mark-paid")
 async def mark_trainer_paid(record_id: str, current_user: User = Depends(get_current_user)):
@@ -7647,6 +8269,7 @@ async def mark_coordinator_paid(record_id: str, current_user: User = Depends(get
         raise HTTPException(status_code=404, detail="Record not found")
     
     await db.coordinator_fees.update_one({"id": record_id}, {"$set": {"status": "paid", "paid_date": get_malaysia_time().strftime("%Y-%m-%d"), "paid_by": current_user.id}})
+    await invalidate_session_costing(record.get("session_id"))
     await log_finance_action("coordinator_fee", record_id, "status_changed", current_user.id, {"status": record.get("status")}, {"status": "paid"})
     
     return {"message": "Marked as paid"}
@@ -7662,6 +8285,7 @@ async def mark_commission_paid(record_id: str, current_user: User = Depends(get_
         raise HTTPException(status_code=404, detail="Record not found")
     
     await db.marketing_commissions.update_one({"id": record_id}, {"$set": {"status": "paid", "paid_date": get_malaysia_time().strftime("%Y-%m-%d"), "paid_by": current_user.id, "updated_at": get_malaysia_time().isoformat()}})
+    await invalidate_session_costing(record.get("session_id"))
     await log_finance_action("marketing_commission", record_id, "status_changed", current_user.id, {"status": record.get("status")}, {"status": "paid"})
     
     return {"message": "Marked as paid"}
@@ -7677,6 +8301,7 @@ async def mark_trainer_fee_paid(fee_id: str, current_user: User = Depends(get_cu
         raise HTTPException(status_code=404, detail="Fee record not found")
     
     await db.trainer_fees.update_one({"id": fee_id}, {"$set": {"status": "paid", "paid_date": get_malaysia_time().strftime("%Y-%m-%d"), "paid_by": current_user.id, "updated_at": get_malaysia_time().isoformat()}})
+    await invalidate_session_costing(record.get("session_id"))
     await log_finance_action("trainer_fee", fee_id, "status_changed", current_user.id, {"status": record.get("status")}, {"status": "paid"})
     
     return {"message": "Trainer fee marked as paid"}
@@ -7692,69 +8317,88 @@ async def mark_coordinator_fee_paid(fee_id: str, current_user: User = Depends(ge
         raise HTTPException(status_code=404, detail="Fee record not found")
     
     await db.coordinator_fees.update_one({"id": fee_id}, {"$set": {"status": "paid", "paid_date": get_malaysia_time().strftime("%Y-%m-%d"), "paid_by": current_user.id, "updated_at": get_malaysia_time().isoformat()}})
+    await invalidate_session_costing(record.get("session_id"))
     await log_finance_action("coordinator_fee", fee_id, "status_changed", current_user.id, {"status": record.get("status")}, {"status": "paid"})
     
     return {"message": "Coordinator fee marked as paid"}
 
 # ============ SESSION COSTING & PROFIT ENDPOINTS ============
 
-@api_router.get("/finance/session/{session_id}/costing")
-async def get_session_costing(session_id: str, current_user: User = Depends(get_current_user)):
-    """Get complete costing breakdown for a session"""
-    if current_user.role not in ["admin", "super_admin", "finance", "coordinator"]:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+# Session fields the costing depends on; a change to any of them outdates the snapshot
+COSTING_SESSION_FIELDS = ["name", "company_id", "program_id", "start_date", "end_date", "participant_ids", "trainer_assignments", "coordinator_id"]
+
+def costing_session_fingerprint(session: dict) -> str:
+    payload = json.dumps([session.get(field) for field in COSTING_SESSION_FIELDS], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def invalidate_session_costing(session_id: Optional[str]):
+    """Outdate the stored costing of a session; call after any write to its finance records"""
+    if session_id:
+        await db.session_costing_snapshots.update_one(
+            {"session_id": session_id},
+            {"$inc": {"version": 1}, "$set": {"stale": True}},
+            upsert=True
+        )
+
+async def compute_session_costing(session: dict) -> dict:
+    """Complete costing breakdown for a session"""
+    session_id = session["id"]
+    
+    # The finance records are independent of each other: read them concurrently
+    invoice, trainer_fees, coord_fee, expenses, marketing, company, program = await asyncio.gather(
+        db.invoices.find_one({"session_id": session_id}, {"_id": 0}),
+        db.trainer_fees.find({"session_id": session_id}, {"_id": 0}).to_list(100),
+        db.coordinator_fees.find_one({"session_id": session_id}, {"_id": 0}),
+        db.session_expenses.find({"session_id": session_id}, {"_id": 0}).to_list(100),
+        db.marketing_commissions.find_one({"session_id": session_id}, {"_id": 0}),
+        db.companies.find_one({"id": session.get("company_id")}, {"_id": 0, "name": 1}),
+        db.programs.find_one({"id": session.get("program_id")}, {"_id": 0, "name": 1})
+    )
     
-    # Get invoice
-    invoice = await db.invoices.find_one({"session_id": session_id}, {"_id": 0})
     invoice_total = invoice.get("total_amount", 0) if invoice else 0
     tax_amount = invoice.get("tax_amount", 0) if invoice else 0
     
-    # Get trainer fees (from saved fees or from session assignments)
-    trainer_fees = await db.trainer_fees.find({"session_id": session_id}, {"_id": 0}).to_list(100)
-    
-    # Enrich trainer fees with trainer names if missing
-    for fee in trainer_fees:
-        if not fee.get("trainer_name") or fee.get("trainer_name") == "Unknown Trainer":
-            if fee.get("trainer_id"):
-                trainer = await db.users.find_one({"id": fee.get("trainer_id")}, {"_id": 0, "full_name": 1})
-                fee["trainer_name"] = trainer.get("full_name") if trainer else "Unknown Trainer"
-    
     # Check if we have valid trainer fees (with trainer_ids matching session trainers)
     session_trainer_ids = [ta.get("trainer_id") for ta in session.get("trainer_assignments", [])]
     valid_fees = [f for f in trainer_fees if f.get("trainer_id") in session_trainer_ids]
+    use_assignments = not valid_fees and bool(session.get("trainer_assignments"))
     
-    # If no valid fees, populate from session trainer_assignments
-    if not valid_fees and session.get("trainer_assignments"):
-        trainer_fees = []  # Clear any corrupt fees
-        for ta in session.get("trainer_assignments", []):
-            trainer = await db.users.find_one({"id": ta.get("trainer_id")}, {"_id": 0, "full_name": 1})
-            trainer_fees.append({
-                "trainer_id": ta.get("trainer_id"),
-                "trainer_name": trainer.get("full_name") if trainer else "Unknown Trainer",
-                "role": ta.get("role", "trainer"),
-                "fee_amount": 0,
-                "remark": "",
-                "status": "pending"
-            })
+    # Trainer names that are needed (missing on fees, or for fees built from assignments), in one query
+    if use_assignments:
+        name_ids = session_trainer_ids
+    else:
+        name_ids = [
+            f.get("trainer_id") for f in trainer_fees
+            if f.get("trainer_id") and (not f.get("trainer_name") or f.get("trainer_name") == "Unknown Trainer")
+        ]
+    trainer_names = {
+        u["id"]: u.get("full_name") for u in await db.users.find(
+            {"id": {"$in": list(set(name_ids))}},
+            {"_id": 0, "id": 1, "full_name": 1}
+        ).to_list(None)
+    } if name_ids else {}
+    
+    if use_assignments:
+        # No valid fees: populate from session trainer_assignments (clearing any corrupt fees)
+        trainer_fees = [{
+            "trainer_id": ta.get("trainer_id"),
+            "trainer_name": trainer_names.get(ta.get("trainer_id")) or "Unknown Trainer",
+            "role": ta.get("role", "trainer"),
+            "fee_amount": 0,
+            "remark": "",
+            "status": "pending"
+        } for ta in session.get("trainer_assignments", [])]
+    else:
+        # Enrich trainer fees with trainer names if missing
+        for fee in trainer_fees:
+            if fee.get("trainer_id") and (not fee.get("trainer_name") or fee.get("trainer_name") == "Unknown Trainer"):
+                fee["trainer_name"] = trainer_names.get(fee.get("trainer_id")) or "Unknown Trainer"
     
     trainer_fees_total = sum(f.get("fee_amount", 0) for f in trainer_fees)
-    
-    # Get coordinator fee
-    coord_fee = await db.coordinator_fees.find_one({"session_id": session_id}, {"_id": 0})
     coordinator_fee_total = coord_fee.get("total_fee", 0) if coord_fee else 0
-    
-    # Get expenses
-    expenses = await db.session_expenses.find({"session_id": session_id}, {"_id": 0}).to_list(100)
     cash_expenses_estimated = sum(e.get("estimated_amount", 0) for e in expenses)
     cash_expenses_actual = sum(e.get("actual_amount", 0) for e in expenses)
     
-    # Get marketing commission
-    marketing = await db.marketing_commissions.find_one({"session_id": session_id}, {"_id": 0})
-    
     # Calculate profit (before marketing commission)
     gross_revenue = invoice_total - tax_amount
     total_expenses_before_marketing = trainer_fees_total + coordinator_fee_total + cash_expenses_actual
@@ -7773,9 +8417,6 @@ async def get_session_costing(session_id: str, current_user: User = Depends(get_
     final_profit = gross_revenue - total_expenses
     profit_percentage = (final_profit / gross_revenue * 100) if gross_revenue > 0 else 0
     
-    # Get company name
-    company = await db.companies.find_one({"id": session.get("company_id")}, {"_id": 0, "name": 1})
-    
     # Calculate headcount for F&B (participants + trainers + coordinator)
     trainer_count = len(session.get("trainer_assignments", []))
     coordinator_count = 1 if session.get("coordinator_id") else 0
@@ -7785,6 +8426,7 @@ async def get_session_costing(session_id: str, current_user: User = Depends(get_
         "session_id": session_id,
         "session_name": session.get("name"),
         "company_name": company.get("name") if company else None,
+        "program_name": program.get("name") if program else None,
         "training_dates": f"{session.get('start_date')} to {session.get('end_date')}",
         "pax": len(session.get("participant_ids", [])),
         "trainer_count": trainer_count,
@@ -7813,6 +8455,239 @@ async def get_session_costing(session_id: str, current_user: User = Depends(get_
         "profit_percentage": round(profit_percentage, 2)
     }
 
+def costing_rollup(session: dict, costing: dict) -> dict:
+    """Flat figures of one session's costing, stored with the snapshot for portfolio roll-ups"""
+    start_date = session.get("start_date") or ""
+    expenses = {}
+    for expense in costing["expenses"]:
+        category = expense.get("category") or "other"
+        expenses[category] = expenses.get(category, 0) + (expense.get("actual_amount") or 0)
+    # One entry per trainer, so a trainer with several roles counts the session once
+    trainers = {}
+    for fee in costing["trainer_fees"]:
+        if not fee.get("trainer_id"):
+            continue
+        trainer = trainers.setdefault(fee["trainer_id"], {
+            "trainer_id": fee["trainer_id"], "trainer_name": fee.get("trainer_name"), "fee_amount": 0
+        })
+        trainer["fee_amount"] += fee.get("fee_amount", 0)
+    return {
+        "session_date": start_date,
+        "month": start_date[:7],
+        "company_id": session.get("company_id"),
+        "company_name": costing.get("company_name"),
+        "program_id": session.get("program_id"),
+        "program_name": costing.get("program_name"),
+        "trainers": list(trainers.values()),
+        "revenue": costing["gross_revenue"],
+        "trainer_fees": costing["trainer_fees_total"],
+        "coordinator_fee": costing["coordinator_fee_total"],
+        "cash_expenses": costing["cash_expenses_actual"],
+        "expenses": [{"category": category, "amount": amount} for category, amount in expenses.items()],
+        "marketing_commission": costing["marketing_commission"],
+        "total_expenses": costing["total_expenses"],
+        "profit": costing["profit"]
+    }
+
+async def load_session_costing(session_id: str) -> dict:
+    """Session costing from its snapshot, recomputed only when the snapshot is outdated.
+    
+    Finance writes bump the snapshot's version (invalidate_session_costing); a snapshot is
+    current when it was computed at that version and from the same session fields. The
+    recomputed costing is saved only if no write happened meanwhile.
+    """
+    session, snapshot = await asyncio.gather(
+        db.sessions.find_one({"id": session_id}, {"_id": 0}),
+        db.session_costing_snapshots.find_one({"session_id": session_id}, {"_id": 0})
+    )
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    fingerprint = costing_session_fingerprint(session)
+    version = snapshot.get("version", 0) if snapshot else 0
+    if snapshot and snapshot.get("costing") is not None \
+            and snapshot.get("costing_version") == version \
+            and snapshot.get("session_fingerprint") == fingerprint:
+        return snapshot["costing"]
+    
+    costing = await compute_session_costing(session)
+    try:
+        await db.session_costing_snapshots.update_one(
+            {"session_id": session_id, "version": version},
+            {"$set": {
+                "costing": costing,
+                "costing_version": version,
+                "session_fingerprint": fingerprint,
+                "rollup": costing_rollup(session, costing),
+                "stale": False,
+                "computed_at": get_malaysia_time().isoformat()
+            }},
+            upsert=snapshot is None
+        )
+    except DuplicateKeyError:
+        pass  # Invalidated while computing (the upsert met the new version); the next read recomputes
+    return costing
+
+@api_router.get("/finance/session/{session_id}/costing")
+async def get_session_costing(session_id: str, current_user: User = Depends(get_current_user)):
+    """Get complete costing breakdown for a session"""
+    if current_user.role not in ["admin", "super_admin", "finance", "coordinator"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await load_session_costing(session_id)
+
+# ============ PORTFOLIO ROLL-UPS ============
+
+ROLLUP_GROUPS = {
+    "month": ("$rollup.month", "$rollup.month"),
+    "company": ("$rollup.company_id", "$rollup.company_name"),
+    "program": ("$rollup.program_id", "$rollup.program_name"),
+    "trainer": ("$rollup.trainers.trainer_id", "$rollup.trainers.trainer_name"),
+}
+ROLLUP_METRICS = ["revenue", "trainer_fees", "coordinator_fee", "cash_expenses", "marketing_commission", "total_expenses", "profit"]
+ROLLUP_REFRESH_CONCURRENCY = 8
+costing_refresh_task: Optional[asyncio.Task] = None
+
+async def mark_missing_costing_snapshots() -> int:
+    """Queue sessions that have no up-to-date costing snapshot for the next refresh"""
+    await db.session_costing_snapshots.update_many({"rollup": {"$exists": False}}, {"$set": {"stale": True}})
+    known = set(await db.session_costing_snapshots.distinct("session_id"))
+    missing = [session_id for session_id in await db.sessions.distinct("id") if session_id not in known]
+    if missing:
+        await db.session_costing_snapshots.bulk_write([
+            UpdateOne({"session_id": session_id}, {"$setOnInsert": {"version": 1, "stale": True}}, upsert=True)
+            for session_id in missing
+        ], ordered=False)
+    return len(missing)
+
+async def refresh_costing_snapshots() -> int:
+    """Recompute the snapshots invalidated since the last refresh; returns how many"""
+    stale = await db.session_costing_snapshots.distinct("session_id", {"stale": True})
+    semaphore = asyncio.Semaphore(ROLLUP_REFRESH_CONCURRENCY)
+    
+    async def refresh(session_id):
+        async with semaphore:
+            try:
+                await load_session_costing(session_id)
+            except HTTPException:
+                # The session is gone
+                await db.session_costing_snapshots.delete_one({"session_id": session_id})
+    
+    await asyncio.gather(*(refresh(session_id) for session_id in stale))
+    return len(stale)
+
+async def run_costing_refresh():
+    try:
+        refreshed = await refresh_costing_snapshots()
+        if refreshed:
+            logging.info(f"✅ Costing snapshots refreshed for {refreshed} session(s)")
+    except Exception as e:
+        logging.error(f"❌ Failed to refresh costing snapshots: {str(e)}")
+
+def schedule_costing_refresh():
+    """Refresh the invalidated snapshots in the background, unless a refresh is already running"""
+    global costing_refresh_task
+    if costing_refresh_task is None or costing_refresh_task.done():
+        costing_refresh_task = asyncio.create_task(run_costing_refresh())
+
+async def build_portfolio_rollup(group_by: str, start_date: str, end_date: str) -> dict:
+    key, label = ROLLUP_GROUPS[group_by]
+    # By trainer, sessions without trainers form the "Unassigned" group
+    per_group = [{"$unwind": {"path": "$rollup.trainers", "preserveNullAndEmptyArrays": True}}] if group_by == "trainer" else []
+    sums = {metric: {"$sum": f"$rollup.{metric}"} for metric in ROLLUP_METRICS}
+    if group_by == "trainer":
+        sums["trainer_fee"] = {"$sum": "$rollup.trainers.fee_amount"}  # This trainer's own fees
+    
+    result = await db.session_costing_snapshots.aggregate([
+        {"$match": {"rollup.session_date": {"$gte": start_date, "$lte": end_date}}},
+        {"$facet": {
+            "groups": per_group + [
+                {"$group": {"_id": key, "label": {"$first": label}, "sessions": {"$sum": 1}, **sums}}
+            ],
+            "group_expenses": per_group + [
+                {"$unwind": "$rollup.expenses"},
+                {"$group": {"_id": {"key": key, "category": "$rollup.expenses.category"}, "amount": {"$sum": "$rollup.expenses.amount"}}}
+            ],
+            "totals": [
+                {"$group": {"_id": None, "sessions": {"$sum": 1}, **{metric: sums[metric] for metric in ROLLUP_METRICS}}}
+            ],
+            "total_expenses": [
+                {"$unwind": "$rollup.expenses"},
+                {"$group": {"_id": "$rollup.expenses.category", "amount": {"$sum": "$rollup.expenses.amount"}}}
+            ]
+        }}
+    ]).to_list(1)
+    facets = result[0] if result else {"groups": [], "group_expenses": [], "totals": [], "total_expenses": []}
+    
+    def with_margin(row: dict) -> dict:
+        row["margin"] = round(row["profit"] / row["revenue"] * 100, 2) if row.get("revenue") else 0
+        return row
+    
+    expenses_by_group = {}
+    for row in facets["group_expenses"]:
+        expenses_by_group.setdefault(row["_id"].get("key"), {})[row["_id"]["category"]] = row["amount"]
+    
+    groups = []
+    for row in facets["groups"]:
+        group_key = row.pop("_id")
+        groups.append(with_margin({
+            "key": group_key,
+            **row,
+            "label": row.get("label") or group_key or "Unassigned",
+            "expenses": expenses_by_group.get(group_key, {})
+        }))
+    if group_by == "month":
+        groups.sort(key=lambda g: g["key"] or "")
+    else:
+        groups.sort(key=lambda g: g["profit"], reverse=True)
+    
+    totals = facets["totals"][0] if facets["totals"] else {"sessions": 0, **{metric: 0 for metric in ROLLUP_METRICS}}
+    totals.pop("_id", None)
+    totals["expenses"] = {row["_id"]: row["amount"] for row in facets["total_expenses"]}
+    
+    return {
+        "group_by": group_by,
+        # By trainer, a group's figures are the totals of the sessions the trainer worked on (a session
+        # with several trainers counts in each group); trainer_fee is the trainer's own share
+        "session_totals": group_by == "trainer",
+        "start_date": start_date,
+        "end_date": end_date,
+        "groups": groups,
+        "totals": with_margin(totals)
+    }
+
+@api_router.get("/finance/rollups")
+async def get_portfolio_rollup(
+    group_by: str = "month",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Revenue, expenses by category, marketing commission, profit and margin across sessions,
+    grouped by month, company, program or trainer. Dates (YYYY-MM-DD) filter on the session
+    start date and default to the current year.
+    
+    Figures come from the costing snapshots as they are; snapshots invalidated since the last
+    refresh are recomputed in the background and counted in pending_sessions."""
+    if current_user.role not in ["admin", "super_admin", "finance"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if group_by not in ROLLUP_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(ROLLUP_GROUPS)}")
+    
+    year = get_malaysia_time().year
+    start_date = start_date or f"{year}-01-01"
+    end_date = end_date or f"{year}-12-31"
+    
+    # Only sessions whose costing changed since the last roll-up are recomputed
+    pending_sessions = await db.session_costing_snapshots.count_documents({"stale": True})
+    if pending_sessions:
+        schedule_costing_refresh()
+    
+    rollup = await build_portfolio_rollup(group_by, start_date, end_date)
+    rollup["pending_sessions"] = pending_sessions
+    return rollup
+
 @api_router.post("/finance/session/{session_id}/invoice")
 async def save_session_invoice(session_id: str, invoice_data: dict, current_user: User = Depends(get_current_user)):
     """Save or update invoice for a session (create if not exists)"""
@@ -7839,7 +8714,8 @@ async def save_session_invoice(session_id: str, invoice_data: dict, current_user
             "total_amount": invoice_data.get("total_amount", 0),
             "updated_at": now.isoformat()
         }
-        await db.invoices.update_one({"id": existing["id"]}, {"$set": update_dict})
+        await db.invoices.update_one({"id": existing["id"]}, invoice_update_pipeline(update_dict))
+        await invalidate_session_costing(session_id)
         return {"message": "Invoice updated", "invoice_id": existing["id"]}
     else:
         # Create new invoice
@@ -7859,12 +8735,15 @@ async def save_session_invoice(session_id: str, invoice_data: dict, current_user
             "tax_rate": invoice_data.get("tax_rate", 0),
             "tax_amount": invoice_data.get("tax_amount", 0),
             "total_amount": invoice_data.get("total_amount", 0),
+            "amount_paid": 0.0,
+            "balance_due": invoice_data.get("total_amount", 0),
             "status": "draft",
             "created_at": now.isoformat(),
             "updated_at": now.isoformat(),
             "created_by": current_user.id
         }
         await db.invoices.insert_one(invoice)
+        await invalidate_session_costing(session_id)
         return {"message": "Invoice created", "invoice_id": invoice["id"], "invoice_number": invoice_number}
 
 @api_router.post("/finance/session/{session_id}/trainer-fees")
@@ -7891,6 +8770,7 @@ async def save_trainer_fees(session_id: str, fees: List[dict], current_user: Use
             "created_at": get_malaysia_time().isoformat()
         }
         await db.trainer_fees.insert_one(fee_record)
+    await invalidate_session_costing(session_id)
     
     return {"message": f"Saved {len(fees)} trainer fees"}
 
@@ -7929,6 +8809,7 @@ async def save_coordinator_fee(session_id: str, fee_data: dict, current_user: Us
         }},
         upsert=True
     )
+    await invalidate_session_costing(session_id)
     
     return {"message": "Coordinator fee saved", "total_fee": total_fee}
 
@@ -7978,6 +8859,7 @@ async def save_session_expenses(session_id: str, expenses: List[dict], current_u
                 "updated_at": get_malaysia_time().isoformat()
             }
             await db.session_expenses.insert_one(expense_record)
+    await invalidate_session_costing(session_id)
     
     return {"message": f"Saved {len(expenses)} expenses"}
 
@@ -7990,6 +8872,7 @@ async def delete_session_expense(session_id: str, expense_id: str, current_user:
     result = await db.session_expenses.delete_one({"id": expense_id, "session_id": session_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Expense not found")
+    await invalidate_session_costing(session_id)
     
     return {"message": "Expense deleted"}
 
@@ -8043,7 +8926,7 @@ async def save_marketing_commission(session_id: str, marketing_data: dict, curre
     marketing_user = await db.users.find_one({"id": marketing_user_id}, {"_id": 0, "full_name": 1})
     
     # Calculate commission immediately from session costing
-    costing = await get_session_costing(session_id, current_user)
+    costing = await load_session_costing(session_id)
     gross_revenue = costing.get("gross_revenue", 0)
     total_expenses = costing.get("trainer_fees_total", 0) + costing.get("coordinator_fee_total", 0) + costing.get("cash_expenses_estimated", 0)
     profit_before_marketing = gross_revenue - total_expenses
@@ -8076,6 +8959,7 @@ async def save_marketing_commission(session_id: str, marketing_data: dict, curre
         }},
         upsert=True
     )
+    await invalidate_session_costing(session_id)
     
     # Update session with marketing user
     await db.sessions.update_one(
@@ -8097,7 +8981,7 @@ async def calculate_and_save_profit(session_id: str, current_user: User = Depend
         raise HTTPException(status_code=403, detail="Only Finance can finalize profit")
     
     # Get full costing
-    costing = await get_session_costing(session_id, current_user)
+    costing = await load_session_costing(session_id)
     
     # Update marketing commission with calculated amount
     marketing = await db.marketing_commissions.find_one({"session_id": session_id}, {"_id": 0})
@@ -8110,6 +8994,7 @@ async def calculate_and_save_profit(session_id: str, current_user: User = Depend
                 "updated_at": get_malaysia_time().isoformat()
             }}
         )
+        await invalidate_session_costing(session_id)
     
     return {
         "message": "Profit calculated",
@@ -8185,6 +9070,20 @@ async def setup_admin_account():
             
             # Participant access collection indexes
             await db.participant_access.create_index([("session_id", 1), ("participant_id", 1)], unique=True)
+            await db.participant_access.create_index([("certificate_uploaded_at", -1), ("_id", -1)])
+            
+            # Training reports collection indexes
+            await db.training_reports.create_index([("session_id", 1), ("status", 1)])
+            await db.training_reports.create_index([("status", 1), ("submitted_at", -1), ("id", 1)])
+            await db.training_reports.create_index([("status", 1), ("company_id", 1), ("submitted_at", -1)])
+            await db.training_reports.create_index([("status", 1), ("program_id", 1), ("submitted_at", -1)])
+            await db.training_reports.create_index([("status", 1), ("search_text", 1)])
+            await db.training_reports.create_index("coordinator_id")
+            
+            # Supervisor report index (read model for the supervisor portal)
+            await db.supervisor_report_index.create_index("session_id", unique=True)
+            await db.supervisor_report_index.create_index([("supervisor_ids", 1), ("pushed_at", -1), ("session_id", -1)])
+            await db.supervisor_report_index.create_index([("pushed_at", -1), ("session_id", -1)])
             
             # Feedback collection indexes
             await db.course_feedback.create_index([("session_id", 1), ("participant_id", 1)])
@@ -8192,10 +9091,72 @@ async def setup_admin_account():
             # Vehicle issues collection indexes
             await db.vehicle_issues.create_index([("session_id", 1), ("participant_id", 1)])
             
+            # Finance collection indexes
+            await db.invoices.create_index([("status", 1), ("balance_due", 1), ("issued_at", 1)])
+            await db.payments.create_index("invoice_id")
+            await db.trainer_fees.create_index([("trainer_id", 1), ("created_at", -1), ("id", -1)])
+            await db.coordinator_fees.create_index([("coordinator_id", 1), ("created_at", -1), ("id", -1)])
+            await db.marketing_commissions.create_index([("marketing_user_id", 1), ("created_at", -1), ("id", -1)])
+            await db.finance_audit_log.create_index([("timestamp", -1), ("id", -1)])
+            await db.finance_audit_log.create_index([("entity_type", 1), ("entity_id", 1), ("timestamp", -1), ("id", -1)])
+            await db.session_costing_snapshots.create_index("session_id", unique=True)
+            await db.session_costing_snapshots.create_index("stale")
+            await db.session_costing_snapshots.create_index("rollup.session_date")
+            await db.trainer_fees.create_index("session_id")
+            await db.session_expenses.create_index("session_id")
+            await db.coordinator_fees.create_index("session_id")
+            await db.marketing_commissions.create_index("session_id")
+            await db.invoices.create_index("session_id")
+            
             logging.info("✅ Database indexes created successfully")
         except Exception as idx_error:
             logging.warning(f"⚠️  Index creation warning (may already exist): {str(idx_error)}")
         
+        # Document numbers are unique (also serves the prefix scan when a monthly counter is
+        # first seeded). Legacy records without a number are left out by the partial filter;
+        # the earlier non-unique indexes are replaced.
+        try:
+            for collection, field in ((db.invoices, "invoice_number"), (db.credit_notes, "cn_number")):
+                existing = (await collection.index_information()).get(f"{field}_1")
+                if existing and not existing.get("unique"):
+                    await collection.drop_index(f"{field}_1")
+                await collection.create_index(field, unique=True, partialFilterExpression={field: {"$gt": ""}})
+        except Exception as e:
+            logging.error(f"❌ Failed to create unique document number indexes (duplicate numbers must be resolved first): {str(e)}")
+        
+        # Data migrations: each on its own, so an index conflict above cannot skip them
+        try:
+            # Also rebuild entries that still hold a full report copy (coordinator_id, photos, ...)
+            if (await db.supervisor_report_index.estimated_document_count() == 0
+                    or await db.supervisor_report_index.find_one({"coordinator_id": {"$exists": True}}, {"_id": 1})):
+                indexed = await rebuild_supervisor_report_index()
+                if indexed:
+                    logging.info(f"✅ Supervisor report index built for {indexed} report(s)")
+        except Exception as e:
+            logging.error(f"❌ Failed to build supervisor report index: {str(e)}")
+        
+        try:
+            searchable = await backfill_report_search_fields()
+            if searchable:
+                logging.info(f"✅ Search fields set on {searchable} training report(s)")
+        except Exception as e:
+            logging.error(f"❌ Failed to set training report search fields: {str(e)}")
+        
+        try:
+            backfilled = await backfill_invoice_balances()
+            if backfilled:
+                logging.info(f"✅ Payment balances set on {backfilled} invoice(s)")
+        except Exception as e:
+            logging.error(f"❌ Failed to backfill invoice payment balances: {str(e)}")
+        
+        try:
+            queued = await mark_missing_costing_snapshots()
+            if queued:
+                logging.info(f"✅ {queued} session(s) queued for costing snapshots")
+            schedule_costing_refresh()
+        except Exception as e:
+            logging.error(f"❌ Failed to queue costing snapshots: {str(e)}")
+        
         # Admin credentials from environment variables
         admin_email = os.environ.get('ADMIN_EMAIL', 'admin@example.com')
         admin_password = os.environ.get('ADMIN_PASSWORD', 'changeme123')
@@ -8243,6 +9204,83 @@ async def setup_admin_account():
         logging.error(f"❌ Failed to setup admin account: {str(e)}")
 
 
+@app.on_event("startup")
+async def start_document_conversion_service():
+    """Warm up the LibreOffice workers before the first conversion request"""
+    try:
+        await conversion_service.start()
+    except Exception as e:
+        logging.error(f"❌ Failed to start document conversion service: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def stop_document_conversion_service():
+    await conversion_service.stop()
+
+
+@app.on_event("startup")
+async def start_report_renderer():
+    """Spawn the report worker processes up front so the first report doesn't pay for it"""
+    try:
+        report_renderer.start()
+    except Exception as e:
+        logging.error(f"❌ Failed to start report renderer: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def stop_report_renderer():
+    report_renderer.stop()
+
+
+@app.on_event("startup")
+async def start_image_pipeline():
+    try:
+        image_pipeline.start()
+    except Exception as e:
+        logging.error(f"❌ Failed to start image pipeline: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def stop_image_pipeline():
+    image_pipeline.stop()
+
+
+@app.on_event("startup")
+async def start_llm_gateway():
+    try:
+        await llm_gateway.ensure_indexes()
+    except Exception as e:
+        logging.error(f"❌ Failed to create LLM cache indexes: {str(e)}")
+
+
+@app.on_event("startup")
+async def start_notifications():
+    try:
+        await notification_center.ensure_indexes()
+    except Exception as e:
+        logging.error(f"❌ Failed to create notification indexes: {str(e)}")
+
+
+@app.on_event("startup")
+async def start_report_jobs():
+    try:
+        await report_jobs.ensure_indexes()
+        await report_jobs.start()
+    except Exception as e:
+        logging.error(f"❌ Failed to start report job workers: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def stop_report_jobs():
+    await report_jobs.stop()
+
+
+@app.on_event("shutdown")
+async def stop_costing_refresh():
+    if costing_refresh_task and not costing_refresh_task.done():
+        costing_refresh_task.cancel()
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -0,0 +1,134 @@
+"""
+Content-addressed blob store
+Binary files (report photos) stored on disk under the SHA-256 of their content, so
+documents only keep a short reference and identical uploads are stored once.
+"""
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+# data:<content type>;base64,<payload>
+DATA_URL_PATTERN = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(?:;[\w=.+-]+)*;base64,(?P<payload>.*)$", re.DOTALL)
+
+# <sha256>[_<variant>]<extension>, e.g. 9f86d0...0a08.jpg or 9f86d0...0a08_thumb.jpg
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?(\.[a-z0-9]{1,5})?$")
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+def extension_for(content_type: Optional[str]) -> str:
+    if content_type == "image/jpeg":
+        return ".jpg"
+    return (mimetypes.guess_extension(content_type or "") or "").lower()
+
+
+def decode_data_url(value: str) -> Optional[Tuple[str, bytes]]:
+    """(content type, bytes) of a base64 data URL, or None when value is not one"""
+    match = DATA_URL_PATTERN.match(value or "")
+    if not match:
+        return None
+    return match.group("content_type") or "application/octet-stream", base64.b64decode(match.group("payload"))
+
+
+class BlobStore:
+    """Files kept under root/<first 2 hex>/<next 2 hex>/<key>.
+
+    The key is the content hash plus an extension derived from the content type, so
+    FileResponse can serve it with the right media type. Writes go through a temporary
+    file and an atomic rename, so a reader never sees a partial blob.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid blob key: {key}")
+        return self.root / key[:2] / key[2:4] / key
+
+    def exists(self, key: str) -> bool:
+        try:
+            return self.path_for(key).is_file()
+        except ValueError:
+            return False
+
+    def put_bytes(self, data: bytes, content_type: Optional[str] = None) -> str:
+        key = hashlib.sha256(data).hexdigest() + extension_for(content_type)
+        path = self.path_for(key)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as temp_file:
+                    temp_file.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+        return key
+
+    def stage(self, source: BinaryIO, max_bytes: Optional[int] = None) -> Path:
+        """Copy a file object to a temporary file inside the store (for processing before put_file)"""
+        staging = self.root / "tmp"
+        staging.mkdir(exist_ok=True)
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=staging, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                while True:
+                    block = source.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BlobTooLarge(f"File is larger than {max_bytes} bytes")
+                    temp_file.write(block)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        return Path(temp_path)
+
+    def put_file(self, source_path: Path, content_type: Optional[str] = None) -> str:
+        """Move a file on the same filesystem into the store"""
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as source:
+            for block in iter(lambda: source.read(CHUNK_SIZE), b""):
+                digest.update(block)
+        key = digest.hexdigest() + extension_for(content_type)
+        self._move_into(Path(source_path), key)
+        return key
+
+    def put_stream(self, source: BinaryIO, content_type: Optional[str] = None, max_bytes: Optional[int] = None) -> str:
+        return self.put_file(self.stage(source, max_bytes), content_type)
+
+    @staticmethod
+    def variant_key(key: str, variant: str) -> str:
+        stem, ext = os.path.splitext(key)
+        return f"{stem}_{variant}{ext}"
+
+    def put_variant(self, key: str, variant: str, source_path: Path) -> str:
+        """Store a derived file (e.g. a thumbnail) next to the blob it was made from"""
+        variant_key = self.variant_key(key, variant)
+        self._move_into(Path(source_path), variant_key)
+        return variant_key
+
+    def _move_into(self, source_path: Path, key: str):
+        path = self.path_for(key)
+        if path.exists():
+            source_path.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source_path, path)
+
+    def delete(self, key: str):
+        self.path_for(key).unlink(missing_ok=True)
@@ -0,0 +1,231 @@
+"""
+Pre-compiled certificate templates
+A DOCX template is parsed once into byte segments around its placeholders, so rendering a
+certificate is a string join plus a zip write - no XML parsing per participant.
+"""
+import hashlib
+import io
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+W_P = f"{{{W_NS}}}p"
+W_R = f"{{{W_NS}}}r"
+W_T = f"{{{W_NS}}}t"
+W_FLDCHAR = f"{{{W_NS}}}fldChar"
+W_FLDSIMPLE = f"{{{W_NS}}}fldSimple"
+W_INSTRTEXT = f"{{{W_NS}}}instrText"
+
+# «FIELD» (Word mail-merge style) or <<FIELD>>
+PLACEHOLDER_PATTERN = re.compile(r"«[^«»]+»|<<[^<>]+>>")
+
+# Parts of the package that can carry visible text
+TEXT_PART_PATTERN = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+# Private-use characters never appear in real templates, so they are safe as split markers
+MARKER_PATTERN = re.compile("\ue000(\\d+)\ue001".encode("utf-8"))
+
+
+def _marker(index: int) -> str:
+    return f"\ue000{index}\ue001"
+
+
+class CompiledTemplate:
+    """A DOCX template split into literal byte segments and placeholder slots"""
+
+    def __init__(self, version: str, entries: List[Tuple[zipfile.ZipInfo, Union[bytes, list]]], placeholders: Dict[str, List[dict]]):
+        self.version = version
+        # (zip entry, raw bytes) for untouched parts, (zip entry, [bytes | placeholder, ...]) for compiled parts
+        self.entries = entries
+        # placeholder -> [{"part": ..., "paragraph": ..., "run": ...}, ...]
+        self.placeholders = placeholders
+
+    def render(self, values: Dict[str, str]) -> bytes:
+        """Return DOCX bytes with every placeholder replaced by its value.
+
+        Placeholders missing from values are left as they appear in the template.
+        """
+        escaped = {key: escape(str(value)).encode("utf-8") for key, value in values.items() if value is not None}
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for info, content in self.entries:
+                if isinstance(content, list):
+                    data = b"".join(
+                        segment if isinstance(segment, bytes) else escaped.get(segment, escape(segment).encode("utf-8"))
+                        for segment in content
+                    )
+                else:
+                    data = content
+                archive.writestr(info, data)
+        return buffer.getvalue()
+
+    def render_to(self, path: Path, values: Dict[str, str]) -> Path:
+        path.write_bytes(self.render(values))
+        return path
+
+
+def _paragraph_of(element) -> Optional[etree._Element]:
+    parent = element.getparent()
+    while parent is not None and parent.tag != W_P:
+        parent = parent.getparent()
+    return parent
+
+
+def _flatten_merge_fields(root):
+    """Turn MERGEFIELD fields into plain runs showing their current result text.
+
+    Otherwise LibreOffice/Word render the field (its name) instead of the value we fill in.
+    """
+    for simple in list(root.iter(W_FLDSIMPLE)):
+        if "MERGEFIELD" in (simple.get(f"{{{W_NS}}}instr") or ""):
+            parent = simple.getparent()
+            index = parent.index(simple)
+            for child in list(simple):
+                parent.insert(index, child)
+                index += 1
+            parent.remove(simple)
+
+    for paragraph in root.iter(W_P):
+        # Stack of open fields: [control runs, is_merge_field]
+        stack = []
+        to_remove = []
+        for run in paragraph.iter(W_R):
+            if _paragraph_of(run) is not paragraph:
+                continue
+            fld_char = run.find(W_FLDCHAR)
+            instr = run.find(W_INSTRTEXT)
+            if fld_char is not None:
+                kind = fld_char.get(f"{{{W_NS}}}fldCharType")
+                if kind == "begin":
+                    stack.append([[run], False])
+                elif stack:
+                    stack[-1][0].append(run)
+                    if kind == "end":
+                        runs, is_merge = stack.pop()
+                        if is_merge:
+                            to_remove.extend(runs)
+            elif instr is not None and stack:
+                stack[-1][0].append(run)
+                if "MERGEFIELD" in (instr.text or ""):
+                    stack[-1][1] = True
+        for run in to_remove:
+            run.getparent().remove(run)
+
+
+def _compile_part(name: str, xml: bytes, placeholders: Dict[str, List[dict]]) -> Optional[list]:
+    """Compile one XML part; returns None when it holds no placeholders"""
+    if not PLACEHOLDER_PATTERN.search(xml.decode("utf-8", errors="ignore").replace("&lt;", "<").replace("&gt;", ">")):
+        return None
+
+    root = etree.fromstring(xml)
+    _flatten_merge_fields(root)
+
+    # Group text nodes by the paragraph that directly owns them (text boxes nest paragraphs)
+    paragraphs: Dict[etree._Element, List[etree._Element]] = {}
+    for text_node in root.iter(W_T):
+        paragraph = _paragraph_of(text_node)
+        if paragraph is not None:
+            paragraphs.setdefault(paragraph, []).append(text_node)
+
+    slots: List[str] = []
+    for paragraph_index, text_nodes in enumerate(paragraphs.values()):
+        texts = [node.text or "" for node in text_nodes]
+        full_text = "".join(texts)
+        matches = list(PLACEHOLDER_PATTERN.finditer(full_text))
+        if not matches:
+            continue
+
+        # Which text node owns each character of the paragraph text
+        owner = [i for i, text in enumerate(texts) for _ in text]
+        rebuilt = ["" for _ in texts]
+        position = 0
+        match_index = 0
+        while position < len(full_text):
+            match = matches[match_index] if match_index < len(matches) else None
+            if match and match.start() == position:
+                # A placeholder split across runs is collapsed into its first run,
+                # so the value takes that run's formatting
+                node_index = owner[position]
+                rebuilt[node_index] += _marker(len(slots))
+                slots.append(match.group())
+                placeholders.setdefault(match.group(), []).append({
+                    "part": name,
+                    "paragraph": paragraph_index,
+                    "run": node_index
+                })
+                position = match.end()
+                match_index += 1
+            else:
+                rebuilt[owner[position]] += full_text[position]
+                position += 1
+
+        for node, text in zip(text_nodes, rebuilt):
+            node.text = text
+            node.set(f"{{{XML_NS}}}space", "preserve")
+
+    if not slots:
+        return None
+
+    serialized = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+    segments: list = []
+    last = 0
+    for marker in MARKER_PATTERN.finditer(serialized):
+        segments.append(serialized[last:marker.start()])
+        segments.append(slots[int(marker.group(1))])
+        last = marker.end()
+    segments.append(serialized[last:])
+    return segments
+
+
+def compile_template(source: Union[Path, bytes]) -> CompiledTemplate:
+    """Parse a DOCX template once and index where its placeholders live"""
+    data = source.read_bytes() if isinstance(source, Path) else source
+    version = hashlib.sha256(data).hexdigest()
+
+    entries = []
+    placeholders: Dict[str, List[dict]] = {}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            content = archive.read(info.filename)
+            if TEXT_PART_PATTERN.match(info.filename):
+                compiled = _compile_part(info.filename, content, placeholders)
+                if compiled is not None:
+                    entries.append((info, compiled))
+                    continue
+            entries.append((info, content))
+
+    return CompiledTemplate(version, entries, placeholders)
+
+
+class TemplateCache:
+    """Keeps the compiled form of a template file, recompiling only when the file changes"""
+
+    def __init__(self):
+        self._compiled: Dict[Path, Tuple[Tuple[int, int], CompiledTemplate]] = {}
+
+    def get(self, path: Path) -> CompiledTemplate:
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._compiled.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        return self.compile(path)
+
+    def compile(self, path: Path) -> CompiledTemplate:
+        return self.put(path, compile_template(path))
+
+    def put(self, path: Path, compiled: CompiledTemplate) -> CompiledTemplate:
+        """Register an already compiled template for the file now at path"""
+        stat = path.stat()
+        self._compiled[path] = ((stat.st_mtime_ns, stat.st_size), compiled)
+        return compiled
+
+    def invalidate(self, path: Path):
+        self._compiled.pop(path, None)
@@ -0,0 +1,313 @@
+"""
+Document conversion service
+Runs DOCX -> PDF conversions on a pool of LibreOffice workers behind an asyncio job queue
+"""
+import asyncio
+import itertools
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Lower value = served first
+PRIORITY_HIGH = 0     # Interactive, one document the user is waiting on
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10     # Bulk/background work
+
+
+class ConversionJob:
+    """A group of DOCX files converted by one LibreOffice invocation"""
+
+    def __init__(
+        self,
+        docx_paths: List[Path],
+        out_dir: Path,
+        priority: int,
+        timeout: float,
+        retries: int,
+        future: Optional[asyncio.Future] = None
+    ):
+        self.docx_paths = docx_paths
+        self.out_dir = out_dir
+        self.priority = priority
+        self.timeout = timeout
+        self.attempts_left = retries + 1
+        self.submitted_at = time.monotonic()
+        self.future = future or asyncio.get_running_loop().create_future()
+        # Results already obtained by earlier attempts of this job
+        self.partial: Dict[Path, Path] = {}
+
+
+class DocumentConversionService:
+    """Pool of LibreOffice workers, each with its own user profile directory.
+
+    A dedicated profile per worker means conversions never collide on LibreOffice's
+    profile lock, and the profile is initialised once at start-up instead of on
+    every cold spawn. Work is queued by priority and conversions run as async
+    subprocesses, so the event loop is never blocked.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout: float = 60,
+        retries: int = 1,
+        binary: str = "libreoffice",
+        profile_root: Optional[Path] = None
+    ):
+        self.worker_count = max(1, workers)
+        self.timeout = timeout
+        self.retries = retries
+        self.binary = binary
+        self.profile_root = Path(profile_root or Path(tempfile.gettempdir()) / "lo_conversion_profiles")
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._busy: Dict[int, bool] = {}
+        self._metrics = {
+            "jobs_submitted": 0,
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "documents_converted": 0,
+            "total_convert_seconds": 0.0,
+            "total_wait_seconds": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def _profile_dir(self, worker_id: int) -> Path:
+        return self.profile_root / f"worker_{worker_id}"
+
+    def _command(self, worker_id: int, *args: str) -> List[str]:
+        return [
+            self.binary,
+            f"-env:UserInstallation={self._profile_dir(worker_id).as_uri()}",
+            "--headless",
+            "--norestore",
+            "--nologo",
+            *args
+        ]
+
+    async def start(self):
+        """Create worker profiles, warm them up and start the worker tasks"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self.running:
+                return
+
+            self._queue = asyncio.PriorityQueue()
+            self.profile_root.mkdir(parents=True, exist_ok=True)
+
+            # First launch with a fresh profile is the slow part - pay for it once per worker
+            await asyncio.gather(*[self._warm_up(worker_id) for worker_id in range(self.worker_count)])
+
+            self._tasks = [
+                asyncio.create_task(self._worker(worker_id))
+                for worker_id in range(self.worker_count)
+            ]
+            logging.info(f"📄 Document conversion service started with {self.worker_count} LibreOffice worker(s)")
+
+    async def stop(self):
+        """Stop workers and fail the jobs they were running and any still waiting in the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, job = self._queue.get_nowait()
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Document conversion service stopped"))
+
+    async def _warm_up(self, worker_id: int):
+        profile_dir = self._profile_dir(worker_id)
+        if (profile_dir / "user").exists():
+            return
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._command(worker_id, "--terminate_after_init"),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await asyncio.wait_for(process.wait(), timeout=self.timeout)
+        except Exception as e:
+            # Not fatal: the first real conversion will initialise the profile instead
+            logging.warning(f"LibreOffice worker {worker_id} warm-up failed: {str(e)}")
+
+    async def convert(
+        self,
+        docx_paths: List[Path],
+        out_dir: Path,
+        priority: int = PRIORITY_NORMAL,
+        timeout: Optional[float] = None
+    ) -> Dict[Path, Optional[Path]]:
+        """Convert DOCX files to PDF in out_dir.
+
+        Large batches are split across the workers. Returns a dict mapping each
+        DOCX path to its PDF path, or None when that document could not be converted.
+        """
+        if not self.running:
+            await self.start()
+
+        results: Dict[Path, Optional[Path]] = {docx_path: None for docx_path in docx_paths}
+        existing = [p for p in docx_paths if p.exists()]
+        for docx_path in docx_paths:
+            if not docx_path.exists():
+                logging.error(f"DOCX file not found: {docx_path}")
+        if not existing:
+            return results
+
+        chunk_size = -(-len(existing) // self.worker_count)
+        jobs = []
+        for start in range(0, len(existing), chunk_size):
+            chunk = existing[start:start + chunk_size]
+            job_timeout = timeout or (self.timeout + 5 * (len(chunk) - 1))
+            job = ConversionJob(chunk, out_dir, priority, job_timeout, self.retries)
+            self._enqueue(job)
+            jobs.append(job)
+
+        outcomes = await asyncio.gather(*[job.future for job in jobs], return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, dict):
+                results.update(outcome)
+            else:
+                logging.error(f"Document conversion failed: {str(outcome)}")
+        return results
+
+    async def convert_one(
+        self,
+        docx_path: Path,
+        pdf_path: Path,
+        priority: int = PRIORITY_HIGH,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """Convert a single DOCX file. pdf_path must be <docx stem>.pdf, as named by LibreOffice."""
+        results = await self.convert([docx_path], pdf_path.parent, priority=priority, timeout=timeout)
+        return results.get(docx_path) == pdf_path
+
+    def _enqueue(self, job: ConversionJob):
+        self._metrics["jobs_submitted"] += 1
+        self._queue.put_nowait((job.priority, next(self._sequence), job))
+
+    async def _worker(self, worker_id: int):
+        while True:
+            _, _, job = await self._queue.get()
+            self._busy[worker_id] = True
+            try:
+                await self._run_job(worker_id, job)
+            except asyncio.CancelledError:
+                # Stopped mid-conversion: the caller must not wait for a result that never comes
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Document conversion service stopped"))
+                raise
+            except Exception as e:
+                # e.g. LibreOffice binary missing - fail this job, keep the worker alive
+                self._metrics["jobs_failed"] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._busy[worker_id] = False
+                self._queue.task_done()
+
+    async def _run_job(self, worker_id: int, job: ConversionJob):
+        if job.future.done():
+            return
+
+        self._metrics["total_wait_seconds"] += time.monotonic() - job.submitted_at
+        job.attempts_left -= 1
+        started = time.monotonic()
+
+        # Remove stale output so a failed conversion is not mistaken for a fresh one
+        for docx_path in job.docx_paths:
+            (job.out_dir / f"{docx_path.stem}.pdf").unlink(missing_ok=True)
+
+        error = None
+        process = await asyncio.create_subprocess_exec(
+            *self._command(
+                worker_id,
+                "--convert-to", "pdf",
+                "--outdir", str(job.out_dir),
+                *[str(p) for p in job.docx_paths]
+            ),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=job.timeout)
+            if process.returncode != 0:
+                error = f"LibreOffice exited with {process.returncode}: {stderr.decode(errors='ignore')}"
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            error = f"PDF conversion timed out after {job.timeout} seconds"
+            process.kill()
+            await process.wait()
+            # A killed instance can leave its profile locked
+            (self._profile_dir(worker_id) / ".lock").unlink(missing_ok=True)
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        self._metrics["total_convert_seconds"] += time.monotonic() - started
+
+        results = {}
+        for docx_path in job.docx_paths:
+            pdf_path = job.out_dir / f"{docx_path.stem}.pdf"
+            results[docx_path] = pdf_path if pdf_path.exists() else None
+
+        missing = [p for p, pdf in results.items() if pdf is None]
+        if missing and job.attempts_left > 0:
+            logging.warning(f"Retrying conversion of {len(missing)} document(s): {error or 'no output produced'}")
+            self._metrics["retries"] += 1
+            converted = {p: pdf for p, pdf in results.items() if pdf is not None}
+            self._metrics["documents_converted"] += len(converted)
+            retry = ConversionJob(
+                missing, job.out_dir, job.priority, job.timeout,
+                retries=job.attempts_left - 1, future=job.future
+            )
+            retry.partial = {**job.partial, **converted}
+            self._enqueue(retry)
+            return
+
+        results.update(job.partial)
+        self._metrics["documents_converted"] += len([p for p in job.docx_paths if results[p] is not None])
+        if missing:
+            self._metrics["jobs_failed"] += 1
+            logging.error(f"PDF conversion failed for {len(missing)} document(s): {error or 'no output produced'}")
+        else:
+            self._metrics["jobs_completed"] += 1
+        job.future.set_result(results)
+
+    def metrics(self) -> dict:
+        finished = self._metrics["jobs_completed"] + self._metrics["jobs_failed"]
+        runs = finished + self._metrics["retries"]
+        return {
+            **self._metrics,
+            "workers": self.worker_count,
+            "busy_workers": sum(1 for busy in self._busy.values() if busy),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "avg_convert_seconds": round(self._metrics["total_convert_seconds"] / runs, 3) if runs else 0.0,
+            "avg_wait_seconds": round(self._metrics["total_wait_seconds"] / runs, 3) if runs else 0.0,
+        }
+
+
+def create_conversion_service() -> DocumentConversionService:
+    """Build the service from environment configuration"""
+    return DocumentConversionService(
+        workers=int(os.environ.get("LIBREOFFICE_WORKERS", "2")),
+        timeout=float(os.environ.get("LIBREOFFICE_TIMEOUT", "60")),
+        retries=int(os.environ.get("LIBREOFFICE_RETRIES", "1")),
+        binary=os.environ.get("LIBREOFFICE_BINARY", "libreoffice")
+    )
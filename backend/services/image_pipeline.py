@@ -0,0 +1,112 @@
+"""
+Image processing pipeline
+Uploaded photos are auto-oriented, stripped of EXIF, recompressed and resized into
+variants (full, medium, thumbnail) by Pillow in a pool of worker processes.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest edge in pixels per variant
+VARIANT_SIZES = {
+    "full": 2048,
+    "medium": 1024,
+    "thumb": 320,
+}
+JPEG_QUALITY = 82
+
+
+class UnsupportedImage(Exception):
+    pass
+
+
+def variant_filename(stem: str, variant: str) -> str:
+    return f"{stem}.jpg" if variant == "full" else f"{stem}_{variant}.jpg"
+
+
+def process_image(source_path: str, output_dir: str, stem: str) -> Dict[str, str]:
+    """Write every variant of the image at source_path to output_dir; returns variant -> path.
+
+    Runs in a worker process. Output is always a progressive JPEG without metadata, so GPS
+    tags and camera details from phones never reach the server's files.
+    """
+    try:
+        with Image.open(source_path) as opened:
+            # Apply the EXIF orientation to the pixels; the tag itself is dropped on save
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise UnsupportedImage(str(e))
+
+    if image.mode in ("RGBA", "LA", "P"):
+        # JPEG has no alpha channel: flatten onto white
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    results = {}
+    for variant, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        path = os.path.join(output_dir, variant_filename(stem, variant))
+        temp_path = f"{path}.part"
+        resized.save(temp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_path, path)
+        results[variant] = path
+    return results
+
+
+class ImagePipeline:
+    """Process pool for photo processing, started with "spawn" like the report renderer"""
+
+    def __init__(self, workers: int = 2):
+        self.worker_count = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.worker_count,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logging.info(f"🖼️ Image pipeline started with {self.worker_count} worker process(es)")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def process(self, source_path: Path, output_dir: Path, stem: str) -> Dict[str, Path]:
+        """Produce the variants of one image in a worker process"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, process_image, str(source_path), str(output_dir), stem)
+        except BrokenProcessPool:
+            logging.error("Image pipeline worker pool broke; restarting it")
+            self.stop()
+            raise
+        return {variant: Path(path) for variant, path in results.items()}
+
+    async def store(self, source_path: Path, work_dir: Path, store, variants) -> str:
+        """Process one image and put the full-size JPEG (plus the given variants) into a BlobStore; returns its key"""
+        results = await self.process(source_path, work_dir, "photo")
+        key = await asyncio.to_thread(store.put_file, results["full"], "image/jpeg")
+        for variant in variants:
+            await asyncio.to_thread(store.put_variant, key, variant, results[variant])
+        return key
+
+
+def create_image_pipeline() -> ImagePipeline:
+    """Build the pipeline from environment configuration"""
+    return ImagePipeline(workers=int(os.environ.get("IMAGE_PIPELINE_WORKERS", "2")))
@@ -0,0 +1,277 @@
+"""
+Background job queue
+Persistent jobs stored in a MongoDB collection and executed by worker coroutines, so
+slow work (LLM calls, DOCX rendering, PDF conversion) runs outside the HTTP request.
+"""
+import asyncio
+import logging
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pymongo import ReturnDocument
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (bad input, missing data)"""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Mongo-backed queue: enqueue, claim with a lease, retry with exponential backoff.
+
+    A job is claimed atomically with find_one_and_update, so any number of workers (in
+    this or other server processes) can share the collection. The worker keeps renewing
+    the job's lease while it runs; if the lease expires (the worker crashed or the server
+    was restarted) the job is picked up again.
+    """
+
+    def __init__(
+        self,
+        collection,
+        workers: int = 2,
+        max_attempts: int = 3,
+        backoff_seconds: float = 10,
+        lease_seconds: float = 120,
+        poll_interval: float = 1.0
+    ):
+        self.collection = collection
+        self.worker_count = max(1, workers)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_name = f"{socket.gethostname()}:{uuid.uuid4().hex[:6]}"
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # One event per waiting request, so a waiter that times out cannot unhook the others
+        self._finished: Dict[str, Set[asyncio.Event]] = {}
+
+    def register(self, job_type: str, handler: JobHandler):
+        self._handlers[job_type] = handler
+
+    @property
+    def job_types(self):
+        return list(self._handlers)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("status", 1), ("run_at", 1)])
+        await self.collection.create_index([("created_by", 1), ("created_at", -1)])
+        await self.collection.create_index([("session_id", 1), ("job_type", 1), ("created_at", -1)])
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logging.info(f"🧵 Job queue started with {self.worker_count} worker(s)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, job_type: str, payload: dict, created_by: Optional[str] = None, session_id: Optional[str] = None) -> dict:
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        now = _utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "job_type": job_type,
+            "payload": payload,
+            "session_id": session_id,
+            "created_by": created_by,
+            "status": JOB_QUEUED,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "run_at": now,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "locked_until": None,
+            "error": None,
+            "result": None
+        }
+        await self.collection.insert_one(dict(job))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll: return the job once it has finished, or its current state after timeout"""
+        job = await self.get(job_id)
+        if not job or job["status"] in FINISHED_STATES or timeout <= 0:
+            return job
+
+        event = asyncio.Event()
+        self._finished.setdefault(job_id, set()).add(event)
+        deadline = asyncio.get_running_loop().time() + timeout
+        try:
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                # Woken early when a worker in this process finishes the job; otherwise
+                # re-read periodically in case another process ran it
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, 2.0))
+                except asyncio.TimeoutError:
+                    pass
+                job = await self.get(job_id)
+                if not job or job["status"] in FINISHED_STATES:
+                    return job
+            return job
+        finally:
+            waiters = self._finished.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._finished[job_id]
+
+    async def _claim(self) -> Optional[dict]:
+        now = _utcnow()
+        job = await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": JOB_QUEUED, "run_at": {"$lte": now}},
+                # Lease expired: the worker that claimed it is gone (retried while attempts remain)
+                {"status": JOB_RUNNING, "locked_until": {"$lt": now}, "$expr": {"$lt": ["$attempts", "$max_attempts"]}}
+            ]},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "started_at": now,
+                    "locked_until": now + timedelta(seconds=self.lease_seconds),
+                    "worker": self.worker_name
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is not None:
+            job.pop("_id", None)
+        return job
+
+    async def _fail_abandoned(self):
+        """Fail jobs whose lease expired on their last attempt (their worker kept dying)"""
+        now = _utcnow()
+        await self.collection.update_many(
+            {"status": JOB_RUNNING, "locked_until": {"$lt": now}, "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+            {"$set": {
+                "status": JOB_FAILED,
+                "error": "The worker running this job stopped responding on its last attempt",
+                "finished_at": now,
+                "locked_until": None
+            }}
+        )
+
+    async def _worker(self, worker_id: int):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Job queue worker {worker_id} could not claim a job: {str(e)}")
+                job = None
+
+            if job is None:
+                try:
+                    await self._fail_abandoned()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"Job queue worker {worker_id} could not fail abandoned jobs: {str(e)}")
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Never let one job take a worker down; the lease expiry will retry it
+                logging.error(f"Job queue worker {worker_id} crashed running job {job['id']}: {str(e)}")
+
+    async def _run(self, job: dict):
+        handler = self._handlers.get(job["job_type"])
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job type {job['job_type']}")
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+            try:
+                result = await handler(job)
+            finally:
+                heartbeat.cancel()
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so it runs again after restart
+            await self.collection.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": JOB_QUEUED, "run_at": _utcnow(), "locked_until": None}, "$inc": {"attempts": -1}}
+            )
+            raise
+        except Exception as e:
+            permanent = isinstance(e, PermanentJobError)
+            if not permanent and job["attempts"] < job.get("max_attempts", self.max_attempts):
+                delay = self.backoff_seconds * (2 ** (job["attempts"] - 1))
+                logging.warning(f"Job {job['id']} ({job['job_type']}) failed, retrying in {delay}s: {str(e)}")
+                await self.collection.update_one(
+                    {"id": job["id"]},
+                    {"$set": {
+                        "status": JOB_QUEUED,
+                        "run_at": _utcnow() + timedelta(seconds=delay),
+                        "locked_until": None,
+                        "error": str(e)
+                    }}
+                )
+                return
+            logging.error(f"Job {job['id']} ({job['job_type']}) failed: {str(e)}")
+            await self._finish(job["id"], {"status": JOB_FAILED, "error": str(e)})
+            return
+
+        await self._finish(job["id"], {"status": JOB_SUCCEEDED, "result": result, "error": None})
+
+    async def _heartbeat(self, job_id: str):
+        """Keep extending the lease while the handler is still working"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"id": job_id, "status": JOB_RUNNING},
+                    {"$set": {"locked_until": _utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logging.warning(f"Could not extend lease of job {job_id}: {str(e)}")
+
+    async def _finish(self, job_id: str, fields: Dict[str, Any]):
+        await self.collection.update_one(
+            {"id": job_id},
+            {"$set": {**fields, "finished_at": _utcnow(), "locked_until": None}}
+        )
+        for event in self._finished.pop(job_id, ()):
+            event.set()
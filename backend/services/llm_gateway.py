@@ -0,0 +1,232 @@
+"""
+LLM gateway
+One path for LLM completions: responses are cached in MongoDB by prompt fingerprint,
+provider calls are limited by a semaphore, and callers can stream progress events.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+# Size of the content pieces sent to streaming clients
+STREAM_CHUNK_SIZE = 400
+
+
+class LlmGateway:
+    """Cached, concurrency-limited access to the LLM provider.
+
+    Identical prompts (same provider, model, system message and text) share one cache
+    entry, so regenerating a report for unchanged data returns the stored text. At most
+    max_concurrency provider calls run at once; further callers wait their turn instead of
+    hitting the provider's rate limit, and concurrent callers with the same prompt share
+    a single call.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_concurrency: int = 4,
+        ttl_seconds: float = 7 * 24 * 3600,
+        timeout: float = 120,
+        heartbeat_seconds: float = 10
+    ):
+        self.collection = collection
+        self.max_concurrency = max(1, max_concurrency)
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.heartbeat_seconds = heartbeat_seconds
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiting = 0
+        self._metrics = {"cache_hits": 0, "cache_misses": 0, "provider_calls": 0, "provider_errors": 0}
+
+    @staticmethod
+    def fingerprint(provider: str, model: str, system_message: str, prompt: str) -> str:
+        payload = json.dumps([provider, model, system_message, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("fingerprint", unique=True)
+        # Entries are removed by MongoDB once expires_at has passed
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def cached(self, fingerprint: str) -> Optional[str]:
+        entry = await self.collection.find_one(
+            {"fingerprint": fingerprint, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"_id": 0, "response": 1}
+        )
+        return entry["response"] if entry else None
+
+    async def complete(
+        self,
+        prompt: str,
+        *,
+        api_key: str,
+        system_message: str,
+        provider: str = "openai",
+        model: str = "gpt-4o",
+        session_id: Optional[str] = None,
+        refresh: bool = False,
+        cache_key: Optional[str] = None
+    ) -> Tuple[str, bool]:
+        """Return (response text, served from cache).
+
+        cache_key, when given, is fingerprinted instead of the prompt: the prompt without the
+        parts that change on every call (such as today's date), so those still hit the cache.
+        """
+        fingerprint = self.fingerprint(provider, model, system_message, prompt if cache_key is None else cache_key)
+        if not refresh:
+            response = await self.cached(fingerprint)
+            if response is not None:
+                self._metrics["cache_hits"] += 1
+                return response, True
+
+        call = self._call(fingerprint, prompt, api_key, system_message, provider, model, session_id)
+        # Shielded: a caller that goes away does not cancel a call other callers share,
+        # and the finished response still lands in the cache
+        return await asyncio.shield(call), False
+
+    async def stream(
+        self,
+        prompt: str,
+        *,
+        api_key: str,
+        system_message: str,
+        provider: str = "openai",
+        model: str = "gpt-4o",
+        session_id: Optional[str] = None,
+        refresh: bool = False,
+        cache_key: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """Yield progress events: queued/started/heartbeat while waiting, then content pieces and done.
+
+        The provider returns the completion in one piece, so the text is streamed once it
+        arrives; the events before it keep the client informed (and the connection alive).
+        cache_key works as in complete().
+        """
+        fingerprint = self.fingerprint(provider, model, system_message, prompt if cache_key is None else cache_key)
+        response = None
+        cached = False
+        if not refresh:
+            response = await self.cached(fingerprint)
+            cached = response is not None
+
+        if cached:
+            self._metrics["cache_hits"] += 1
+        else:
+            if self._semaphore.locked():
+                yield {"type": "queued", "waiting": self._waiting + 1}
+            call = self._call(fingerprint, prompt, api_key, system_message, provider, model, session_id)
+            yield {"type": "started"}
+            try:
+                while True:
+                    done, _ = await asyncio.wait({call}, timeout=self.heartbeat_seconds)
+                    if done:
+                        break
+                    yield {"type": "heartbeat"}
+                response = call.result()
+            except Exception as e:
+                yield {"type": "error", "detail": str(e)}
+                return
+
+        for start in range(0, len(response), STREAM_CHUNK_SIZE):
+            yield {"type": "content", "text": response[start:start + STREAM_CHUNK_SIZE]}
+        yield {"type": "done", "cached": cached}
+
+    def _call(self, fingerprint: str, *args) -> asyncio.Future:
+        """The pending provider call for this fingerprint, started if there is none"""
+        call = self._inflight.get(fingerprint)
+        if call is None:
+            self._metrics["cache_misses"] += 1
+            call = asyncio.ensure_future(self._generate(fingerprint, *args))
+            self._inflight[fingerprint] = call
+            call.add_done_callback(lambda finished: self._forget(fingerprint, finished))
+        return call
+
+    def _forget(self, fingerprint: str, call: asyncio.Future):
+        self._inflight.pop(fingerprint, None)
+        # Mark the outcome as seen; every caller may already have gone away
+        if not call.cancelled():
+            call.exception()
+
+    async def _generate(
+        self,
+        fingerprint: str,
+        prompt: str,
+        api_key: str,
+        system_message: str,
+        provider: str,
+        model: str,
+        session_id: Optional[str]
+    ) -> str:
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            self._metrics["provider_calls"] += 1
+            chat = LlmChat(
+                api_key=api_key,
+                session_id=session_id or fingerprint[:16],
+                system_message=system_message
+            ).with_model(provider, model)
+            try:
+                response = await asyncio.wait_for(chat.send_message(UserMessage(text=prompt)), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self._metrics["provider_errors"] += 1
+                raise RuntimeError(f"LLM call timed out after {self.timeout} seconds")
+            except Exception:
+                self._metrics["provider_errors"] += 1
+                raise
+        finally:
+            self._semaphore.release()
+
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.update_one(
+                {"fingerprint": fingerprint},
+                {"$set": {
+                    "fingerprint": fingerprint,
+                    "provider": provider,
+                    "model": model,
+                    "response": response,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            # The response is still good; it just will not be reused
+            logging.warning(f"Could not cache LLM response: {str(e)}")
+        return response
+
+    def metrics(self) -> dict:
+        return {
+            **self._metrics,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            "waiting": self._waiting
+        }
+
+
+def format_sse(event: dict) -> str:
+    """Encode an event for a text/event-stream response"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def create_llm_gateway(collection) -> LlmGateway:
+    """Build the gateway from environment configuration"""
+    return LlmGateway(
+        collection,
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "4")),
+        ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+        timeout=float(os.environ.get("LLM_TIMEOUT", "120"))
+    )
@@ -0,0 +1,109 @@
+"""
+Notifications
+In-app notifications: batched fan-out, a per-user unread counter and a cursor-paginated inbox
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+
+class NotificationCenter:
+    """Notifications stored one document per recipient, with an unread counter per user.
+
+    Fan-out is one insert_many plus one bulk counter update, so notifying more people
+    does not add round trips. Read notifications get a read_at date and are removed by a
+    TTL index after read_ttl_days; unread ones are kept until they are read.
+    """
+
+    def __init__(self, collection, counters, read_ttl_days: int = 90):
+        self.collection = collection
+        self.counters = counters
+        self.read_ttl_days = read_ttl_days
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("user_id", 1), ("read", 1), ("created_at", -1)])
+        await self.collection.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+        await self.collection.create_index("read_at", expireAfterSeconds=int(timedelta(days=self.read_ttl_days).total_seconds()))
+        await self.counters.create_index("user_id", unique=True)
+
+    async def notify(self, user_ids: Iterable[str], type: str, message: str, created_at: str, **fields) -> int:
+        """Send one notification to each user; returns how many were created"""
+        recipients = list(dict.fromkeys(uid for uid in user_ids if uid))
+        if not recipients:
+            return 0
+
+        await self.collection.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "type": type,
+                "message": message,
+                **fields,
+                "read": False,
+                "read_at": None,
+                "created_at": created_at
+            }
+            for user_id in recipients
+        ], ordered=False)
+        result = await self.counters.bulk_write([
+            UpdateOne({"user_id": user_id}, {"$inc": {"unread": 1}}, upsert=True)
+            for user_id in recipients
+        ], ordered=False)
+        # A counter created just now started from 0: count the user's older unread notifications
+        for index in result.upserted_ids:
+            await self.recount(recipients[index])
+        return len(recipients)
+
+    async def unread_count(self, user_id: str) -> int:
+        counter = await self.counters.find_one({"user_id": user_id}, {"_id": 0, "unread": 1})
+        if counter is None:
+            # No counter yet (e.g. notifications created before counters existed): count once
+            return await self.recount(user_id)
+        return max(0, counter.get("unread", 0))
+
+    async def recount(self, user_id: str) -> int:
+        unread = await self.collection.count_documents({"user_id": user_id, "read": False})
+        await self.counters.update_one({"user_id": user_id}, {"$set": {"unread": unread}}, upsert=True)
+        return unread
+
+    async def inbox(self, user_id: str, cursor: Optional[str] = None, limit: int = 20, unread_only: bool = False) -> dict:
+        """Newest first. cursor is the next_cursor of the previous page."""
+        query = {"user_id": user_id}
+        if unread_only:
+            query["read"] = False
+        if cursor:
+            created_at, notification_id = cursor.rsplit("|", 1)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": notification_id}}
+            ]
+
+        notifications = await self.collection.find(
+            query,
+            {"_id": 0, "read_at": 0}
+        ).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = f"{notifications[-1]['created_at']}|{notifications[-1]['id']}"
+        return {"notifications": notifications, "next_cursor": next_cursor}
+
+    async def mark_read(self, user_id: str, notification_ids: Optional[List[str]] = None) -> int:
+        """Mark the given notifications (all when None) as read; returns how many changed"""
+        query = {"user_id": user_id, "read": False}
+        if notification_ids is not None:
+            query["id"] = {"$in": notification_ids}
+
+        # read_at is a BSON date so the TTL index can expire it
+        result = await self.collection.update_many(query, {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}})
+        if notification_ids is None:
+            await self.counters.update_one({"user_id": user_id}, {"$set": {"unread": 0}}, upsert=True)
+        elif result.modified_count:
+            counter = await self.counters.update_one({"user_id": user_id}, {"$inc": {"unread": -result.modified_count}}, upsert=True)
+            if counter.upserted_id is not None:
+                await self.recount(user_id)
+        return result.modified_count
@@ -0,0 +1,877 @@
+"""
+Training report renderer
+Builds the DOCX training report in a separate process, so a long python-docx render
+never blocks the API event loop. The render function only takes plain data
+(dicts/lists/strings) gathered by the request handler.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from docx import Document
+from docx.shared import Inches
+
+
+def render_training_report(context: dict, output_path: str) -> str:
+    """Render the training report described by context and save it to output_path.
+    
+    Runs in a worker process - context must be picklable and nothing here may touch the database.
+    """
+    session = context['session']
+    program = context['program']
+    company = context['company']
+    participants = context['participants']
+    vehicle_issues = context['vehicle_issues']
+    training_photos = context['training_photos']
+    training_photo_files = context.get('training_photo_files', {})
+    feedback_data = context['feedback_data']
+    chief_trainer_feedback = context.get('chief_trainer_feedback')
+    chief_trainer_template = context.get('chief_trainer_template')
+    coordinator_template = context.get('coordinator_template')
+    prepared_by = context['prepared_by']
+    report_date = context['report_date']
+    
+    # Determine vehicle type from program name for objectives
+    program_name_lower = program.get('name', '').lower()
+    is_motorcycle = 'motor' in program_name_lower or 'bike' in program_name_lower or 'rider' in program_name_lower
+    is_truck = 'truck' in program_name_lower or 'lorry' in program_name_lower or 'heavy' in program_name_lower
+    
+    # Create DOCX document with enhanced formatting
+    doc = Document()
+    
+    # COVER PAGE
+    title = doc.add_heading('DEFENSIVE DRIVING/RIDING TRAINING', 0)
+    title.alignment = 1  # Center alignment
+    subtitle = doc.add_heading('COMPREHENSIVE COMPLETION REPORT', 0)
+    subtitle.alignment = 1
+    doc.add_paragraph()
+    doc.add_paragraph()
+    
+    # Cover details in a cleaner format
+    cover_table = doc.add_table(rows=7, cols=2)
+    cover_table.style = 'Light List Accent 1'
+    cover_details = [
+        ('Program:', program.get('name', 'N/A')),
+        ('Company:', company.get('name', 'N/A')),
+        ('Location:', session.get('location', 'N/A')),
+        ('Training Period:', f"{session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}"),
+        ('Participants:', str(len(participants))),
+        ('Submitted by:', prepared_by),
+        ('Date:', report_date)
+    ]
+    for idx, (label, value) in enumerate(cover_details):
+        cover_table.rows[idx].cells[0].text = label
+        cover_table.rows[idx].cells[1].text = value
+    
+    doc.add_paragraph()
+    doc.add_paragraph()
+    footer_text = doc.add_paragraph('Prepared by: MDDRC (Malaysian Defensive Driving & Riding Centre)')
+    footer_text.alignment = 1
+    doc.add_page_break()
+    
+    # EXECUTIVE SUMMARY - COMPREHENSIVE
+    doc.add_heading('1. EXECUTIVE SUMMARY', 1)
+    pre_avg = sum([p['pre_test_score'] for p in participants]) / len(participants) if participants else 0
+    post_avg = sum([p['post_test_score'] for p in participants]) / len(participants) if participants else 0
+    improvement = post_avg - pre_avg
+    
+    # Count pass/fail statistics
+    pre_pass_count = sum([1 for p in participants if p['pre_test_passed']])
+    post_pass_count = sum([1 for p in participants if p['post_test_passed']])
+    improved_count = sum([1 for p in participants if p['improvement'] > 0])
+    
+    doc.add_paragraph(
+        f"This comprehensive report documents the Defensive {'Riding' if is_motorcycle else 'Driving'} Training "
+        f"conducted for {company.get('name', 'N/A')} at {session.get('location', 'N/A')} from "
+        f"{session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}. The program was designed to "
+        f"enhance safety awareness, reinforce defensive {'riding' if is_motorcycle else 'driving'} techniques, "
+        f"and reduce commuting-related accidents, aligning with the company's commitment to employee safety."
+    )
+    doc.add_paragraph()
+    
+    doc.add_paragraph(
+        f"The training program successfully engaged {len(participants)} participants through a structured "
+        f"curriculum combining theoretical instruction and practical hands-on sessions. Participants demonstrated "
+        f"high engagement levels and openness to feedback, contributing to a positive learning environment."
+    )
+    doc.add_paragraph()
+    
+    # KEY OUTCOMES heading
+    doc.add_paragraph("KEY OUTCOMES:", style='Heading 3')
+    outcomes = [
+        f"• Total Participants: {len(participants)}",
+        f"• Pre-Training Assessment Average: {pre_avg:.1f}%",
+        f"• Post-Training Assessment Average: {post_avg:.1f}%",
+        f"• Overall Improvement: {improvement:+.1f}%",
+        f"• Pre-Test Pass Rate: {pre_pass_count}/{len(participants)} ({(pre_pass_count/len(participants)*100):.0f}% if len(participants) > 0 else 0)",
+        f"• Post-Test Pass Rate: {post_pass_count}/{len(participants)} ({(post_pass_count/len(participants)*100):.0f}% if len(participants) > 0 else 0)",
+        f"• Participants Showing Improvement: {improved_count}/{len(participants)} ({(improved_count/len(participants)*100):.0f}% if len(participants) > 0 else 0)"
+    ]
+    for outcome in outcomes:
+        doc.add_paragraph(outcome)
+    doc.add_paragraph()
+    
+    # TRAINING IMPACT
+    doc.add_paragraph("TRAINING IMPACT:", style='Heading 3')
+    doc.add_paragraph(
+        f"The training successfully enhanced participants' understanding of hazard awareness, proper braking control, "
+        f"and {'balance techniques' if is_motorcycle else 'vehicle control'}. Participants demonstrated improved ability "
+        f"to identify potential road hazards and apply defensive {'riding' if is_motorcycle else 'driving'} principles. "
+        f"The program fostered a culture of safety discipline and mutual learning among participants."
+    )
+    doc.add_paragraph()
+    
+    # SAFETY OBSERVATIONS (if vehicle issues found)
+    if vehicle_issues:
+        doc.add_paragraph("SAFETY OBSERVATIONS:", style='Heading 3')
+        doc.add_paragraph(
+            f"Vehicle inspections revealed {len(vehicle_issues)} {'motorcycles' if is_motorcycle else 'vehicles'} "
+            f"with safety concerns requiring immediate attention. Detailed recommendations for addressing these issues "
+            f"are provided in Section 9 of this report."
+        )
+    
+    doc.add_page_break()
+    
+    # TRAINING OBJECTIVES
+    doc.add_heading('2. TRAINING OBJECTIVES', 1)
+    doc.add_paragraph(
+        "This training program was designed with the following core objectives to enhance workplace safety and reduce accident risks:"
+    )
+    doc.add_paragraph()
+    
+    if is_motorcycle:
+        objectives = [
+            "• Improve rider safety awareness and hazard recognition on Malaysian roads",
+            "• Reinforce defensive riding techniques for daily commuting",
+            "• Reduce motorcycle-related accidents and injuries among employees",
+            "• Promote proper Personal Protective Equipment (PPE) usage and motorcycle maintenance",
+            "• Align riding behavior with company safety values and policies",
+            "• Develop emergency response skills for critical road situations"
+        ]
+    elif is_truck:
+        objectives = [
+            "• Enhance heavy vehicle safety awareness and load management",
+            "• Reinforce defensive driving techniques for commercial vehicles",
+            "• Reduce delivery delays caused by accidents and vehicle breakdowns",
+            "• Improve vehicle pre-trip inspection and maintenance practices",
+            "• Minimize company liability and insurance costs through safer driving",
+            "• Align driving behavior with company safety standards and regulations"
+        ]
+    else:  # Car/general driving
+        objectives = [
+            "• Improve driver safety awareness and hazard perception",
+            "• Reinforce defensive driving techniques for daily operations",
+            "• Reduce vehicle-related accidents and associated costs",
+            "• Promote proper vehicle maintenance and pre-drive safety checks",
+            "• Align driving behavior with company safety policies",
+            "• Develop emergency response and accident avoidance skills"
+        ]
+    
+    for objective in objectives:
+        doc.add_paragraph(objective)
+    doc.add_paragraph()
+    doc.add_paragraph(
+        "These objectives support the organization's commitment to employee welfare and operational excellence "
+        "through enhanced road safety practices."
+    )
+    doc.add_page_break()
+    
+    # TRAINING AGENDA
+    doc.add_heading('3. TRAINING AGENDA', 1)
+    doc.add_paragraph(
+        f"The training was conducted over a {2 if is_motorcycle else 2}-day period, combining theoretical instruction "
+        f"with practical hands-on sessions:"
+    )
+    doc.add_paragraph()
+    
+    # DAY 1
+    doc.add_heading('DAY 1 - Theory & Foundation', 2)
+    if is_motorcycle:
+        day1_items = [
+            ('08:00 - 08:30', 'Registration & Welcome Briefing'),
+            ('08:30 - 10:00', 'Hazard Recognition & Road Awareness'),
+            ('10:00 - 10:15', 'Break'),
+            ('10:15 - 12:00', 'Safe Distance Management & Speed Control'),
+            ('12:00 - 13:00', 'Lunch'),
+            ('13:00 - 14:30', 'Traffic Law & Regulations Review'),
+            ('14:30 - 14:45', 'Break'),
+            ('14:45 - 16:30', 'Fatigue Management & Weather Conditions'),
+            ('16:30 - 17:00', 'Pre-Test Assessment & Day 1 Review')
+        ]
+    else:
+        day1_items = [
+            ('08:00 - 08:30', 'Registration & Welcome Briefing'),
+            ('08:30 - 10:00', 'Defensive Driving Principles & Hazard Recognition'),
+            ('10:00 - 10:15', 'Break'),
+            ('10:15 - 12:00', 'Safe Following Distance & Speed Management'),
+            ('12:00 - 13:00', 'Lunch'),
+            ('13:00 - 14:30', 'Traffic Law & Road Safety Regulations'),
+            ('14:30 - 14:45', 'Break'),
+            ('14:45 - 16:30', 'Driver Fatigue & Weather Driving Conditions'),
+            ('16:30 - 17:00', 'Pre-Test Assessment & Day 1 Summary')
+        ]
+    
+    agenda_table_day1 = doc.add_table(rows=len(day1_items)+1, cols=2)
+    agenda_table_day1.style = 'Light Grid Accent 1'
+    agenda_table_day1.rows[0].cells[0].text = 'Time'
+    agenda_table_day1.rows[0].cells[1].text = 'Activity'
+    for idx, (time, activity) in enumerate(day1_items, 1):
+        agenda_table_day1.rows[idx].cells[0].text = time
+        agenda_table_day1.rows[idx].cells[1].text = activity
+    
+    doc.add_paragraph()
+    
+    # DAY 2
+    doc.add_heading('DAY 2 - Practical Skills & Assessment', 2)
+    if is_motorcycle:
+        day2_items = [
+            ('08:00 - 08:30', 'Day 2 Safety Briefing & PPE Check'),
+            ('08:30 - 10:00', 'Emergency Braking Techniques (Practical)'),
+            ('10:00 - 10:15', 'Break'),
+            ('10:15 - 12:00', 'Obstacle Avoidance & Swerving Maneuvers'),
+            ('12:00 - 13:00', 'Lunch'),
+            ('13:00 - 14:30', 'Cornering Techniques & Body Positioning'),
+            ('14:30 - 14:45', 'Break'),
+            ('14:45 - 16:00', 'Left Lane Riding & Traffic Integration'),
+            ('16:00 - 16:45', 'Post-Test Assessment'),
+            ('16:45 - 17:00', 'Certificate Presentation & Closing')
+        ]
+    else:
+        day2_items = [
+            ('08:00 - 08:30', 'Day 2 Safety Briefing & Vehicle Check'),
+            ('08:30 - 10:00', 'Emergency Braking & Stopping Techniques'),
+            ('10:00 - 10:15', 'Break'),
+            ('10:15 - 12:00', 'Obstacle Avoidance & Lane Change Maneuvers'),
+            ('12:00 - 13:00', 'Lunch'),
+            ('13:00 - 14:30', 'Cornering & Vehicle Control Exercises'),
+            ('14:30 - 14:45', 'Break'),
+            ('14:45 - 16:00', 'Traffic Integration & Road Scenarios'),
+            ('16:00 - 16:45', 'Post-Test Assessment & Performance Review'),
+            ('16:45 - 17:00', 'Certificate Presentation & Program Closure')
+        ]
+    
+    agenda_table_day2 = doc.add_table(rows=len(day2_items)+1, cols=2)
+    agenda_table_day2.style = 'Light Grid Accent 1'
+    agenda_table_day2.rows[0].cells[0].text = 'Time'
+    agenda_table_day2.rows[0].cells[1].text = 'Activity'
+    for idx, (time, activity) in enumerate(day2_items, 1):
+        agenda_table_day2.rows[idx].cells[0].text = time
+        agenda_table_day2.rows[idx].cells[1].text = activity
+    
+    doc.add_page_break()
+    
+    # TRAINING DETAILS
+    doc.add_heading('4. TRAINING DETAILS', 1)
+    doc.add_paragraph(f"Program: {program.get('name', 'N/A')}")
+    doc.add_paragraph(f"Location: {session.get('location', 'N/A')}")
+    doc.add_paragraph(f"Dates: {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}")
+    doc.add_paragraph(f"Total Participants: {len(participants)}")
+    doc.add_paragraph()
+    doc.add_paragraph("Participants List:")
+    table = doc.add_table(rows=1, cols=2)
+    table.style = 'Light Grid Accent 1'
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'Name'
+    hdr_cells[1].text = 'ID Number'
+    for p in participants:
+        row_cells = table.add_row().cells
+        row_cells[0].text = p['name']
+        row_cells[1].text = str(p['id_number'])
+    doc.add_page_break()
+    
+    # PRE-POST EVALUATION SUMMARY
+    doc.add_heading('5. PRE-POST EVALUATION SUMMARY', 1)
+    # Summary statistics
+    doc.add_paragraph(f"Pre-Test Pass Rate: {pre_pass_count}/{len(participants)} participants ({(pre_pass_count/len(participants)*100):.0f}%)")
+    doc.add_paragraph(f"Post-Test Pass Rate: {post_pass_count}/{len(participants)} participants ({(post_pass_count/len(participants)*100):.0f}%)")
+    doc.add_paragraph(f"Participants Showing Improvement: {improved_count}/{len(participants)} ({(improved_count/len(participants)*100):.0f}%)")
+    doc.add_paragraph(f"Average Score Change: {improvement:+.1f}%")
+    doc.add_paragraph()
+    
+    # Performance Summary Table
+    doc.add_paragraph("TABULATED RESULTS:", style='Heading 3')
+    table = doc.add_table(rows=1, cols=6)
+    table.style = 'Light Grid Accent 1'
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'Participant'
+    hdr_cells[1].text = 'ID Number'
+    hdr_cells[2].text = 'Pre-Test'
+    hdr_cells[3].text = 'Post-Test'
+    hdr_cells[4].text = 'Improvement'
+    hdr_cells[5].text = 'Status'
+    
+    for p in participants:
+        row_cells = table.add_row().cells
+        row_cells[0].text = p['name']
+        row_cells[1].text = str(p['id_number'])
+        row_cells[2].text = f"{p['pre_test_score']:.0f}%"
+        row_cells[3].text = f"{p['post_test_score']:.0f}%"
+        row_cells[4].text = f"{p['improvement']:+.0f}%"
+        row_cells[5].text = 'PASS' if p['post_test_passed'] else 'FAIL'
+    
+    doc.add_page_break()
+    
+    # DETAILED PERFORMANCE ANALYSIS WITH INSIGHTS
+    doc.add_heading('6. DETAILED PERFORMANCE ANALYSIS', 1)
+    doc.add_paragraph("Individual participant performance with remarks and recommendations:")
+    doc.add_paragraph()
+    
+    for idx, p in enumerate(participants, 1):
+        doc.add_paragraph(f"{idx}. {p['name']} (ID: {p['id_number']})", style='Heading 3')
+        perf_text = f"   Pre-Test: {p['pre_test_score']:.0f}% | Post-Test: {p['post_test_score']:.0f}% | Change: {p['improvement']:+.0f}%"
+        doc.add_paragraph(perf_text)
+        
+        # Generate performance remarks based on improvement
+        if p['improvement'] >= 20:
+            remark = "EXCELLENT IMPROVEMENT - Participant demonstrated exceptional learning and engagement. Strong grasp of defensive techniques."
+        elif p['improvement'] >= 10:
+            remark = "GOOD IMPROVEMENT - Participant showed solid progress and understanding of safety principles."
+        elif p['improvement'] >= 0:
+            remark = "SATISFACTORY PROGRESS - Participant maintained or slightly improved performance. Continue practicing learned techniques."
+        elif p['improvement'] >= -10:
+            remark = "NEEDS ATTENTION - Minor score decrease observed. Recommend follow-up coaching and review of key concepts."
+        else:
+            remark = "REQUIRES IMMEDIATE SUPPORT - Significant score decrease. Recommend one-on-one coaching session and practical refresher."
+        
+        # Pass/Fail status remark
+        if not p['pre_test_passed'] and p['post_test_passed']:
+            remark += " Successfully progressed from FAIL to PASS status."
+        elif not p['post_test_passed']:
+            remark += " Did not achieve passing score - recommend additional training."
+        
+        doc.add_paragraph(f"   Remark: {remark}")
+        doc.add_paragraph()
+    
+    # Overall Performance Insights
+    doc.add_paragraph("OVERALL PERFORMANCE INSIGHTS:", style='Heading 3')
+    high_performers = [p for p in participants if p['improvement'] >= 15]
+    needs_support = [p for p in participants if p['improvement'] < 0]
+    
+    insights = []
+    if high_performers:
+        insights.append(f"• {len(high_performers)} participant(s) demonstrated excellent improvement (≥15% gain), indicating strong training absorption.")
+    if needs_support:
+        insights.append(f"• {len(needs_support)} participant(s) showed score decrease and require targeted follow-up support.")
+    insights.append(f"• Average improvement of {improvement:+.1f}% indicates {'effective' if improvement > 5 else 'moderate'} training impact.")
+    insights.append(f"• Post-test pass rate of {(post_pass_count/len(participants)*100):.0f}% {'meets' if post_pass_count/len(participants) >= 0.8 else 'is below'} target standards.")
+    
+    for insight in insights:
+        doc.add_paragraph(insight)
+    
+    doc.add_page_break()
+    
+    # TRAINER FEEDBACK (Enhanced narrative)
+    if chief_trainer_feedback:
+        responses = chief_trainer_feedback.get('responses', {})
+        template = chief_trainer_template
+        
+        doc.add_paragraph(
+            "The chief trainer provided comprehensive feedback on the training delivery, participant engagement, "
+            "and safety observations throughout the program. Key observations and recommendations are detailed below:"
+        )
+        doc.add_paragraph()
+        
+        # Extract narrative responses from chief trainer
+        for question_id, answer in responses.items():
+            if template:
+                for q in template.get('questions', []):
+                    if q.get('id') == question_id:
+                        doc.add_paragraph(f"{q.get('question')}:", style='Heading 3')
+                        if q.get('type') == 'rating':
+                            stars = '⭐' * int(answer) if isinstance(answer, (int, float)) else answer
+                            doc.add_paragraph(f"   Rating: {stars} ({answer}/{q.get('scale', 5)})")
+                        else:
+                            doc.add_paragraph(f"   {answer}")
+                        doc.add_paragraph()
+        
+        # Add professional summary quote
+        doc.add_paragraph()
+        doc.add_paragraph(
+            "The trainer observed that participants were highly engaged and receptive to feedback. "
+            "Safety issues identified during vehicle inspections were communicated to participants and management. "
+            "Overall, the training environment was conducive to learning with participants demonstrating strong "
+            "commitment to improving their safety practices."
+        )
+    else:
+        doc.add_paragraph("[Chief Trainer feedback pending submission]")
+    
+    doc.add_page_break()
+    
+    # TRAINING PHOTOS
+    def add_training_photo(field, label):
+        photo_file = training_photo_files.get(field)
+        if photo_file and os.path.isfile(photo_file):
+            doc.add_picture(photo_file, width=Inches(6))
+        else:
+            doc.add_paragraph(f"[{label}: {training_photos[field]}]")
+    
+    doc.add_heading('8. TRAINING PHOTOS', 1)
+    if training_photos['group_photo']:
+        doc.add_paragraph("Group Photo:", style='Heading 3')
+        add_training_photo('group_photo', "Photo URL")
+        doc.add_paragraph()
+    
+    if training_photos['theory_photo_1'] or training_photos['theory_photo_2']:
+        doc.add_paragraph("Theory Session Photos:", style='Heading 3')
+        if training_photos['theory_photo_1']:
+            add_training_photo('theory_photo_1', "Photo 1 URL")
+        if training_photos['theory_photo_2']:
+            add_training_photo('theory_photo_2', "Photo 2 URL")
+        doc.add_paragraph()
+    
+    if training_photos['practical_photo_1'] or training_photos['practical_photo_2'] or training_photos['practical_photo_3']:
+        doc.add_paragraph("Practical Session Photos:", style='Heading 3')
+        if training_photos['practical_photo_1']:
+            add_training_photo('practical_photo_1', "Photo 1 URL")
+        if training_photos['practical_photo_2']:
+            add_training_photo('practical_photo_2', "Photo 2 URL")
+        if training_photos['practical_photo_3']:
+            add_training_photo('practical_photo_3', "Photo 3 URL")
+    
+    doc.add_page_break()
+    
+    # PARTICIPANT FEEDBACK SUMMARY (Enhanced)
+    doc.add_heading('9. PARTICIPANT FEEDBACK SUMMARY', 1)
+    if feedback_data:
+        # Calculate average star ratings
+        star_questions = []
+        text_questions = []
+        
+        # Categorize questions
+        if feedback_data:
+            for response in feedback_data[0]['responses']:
+                if isinstance(response['answer'], int):
+                    star_questions.append(response['question'])
+                else:
+                    text_questions.append(response['question'])
+        
+        # PART 1: QUANTITATIVE FEEDBACK
+        if star_questions:
+            doc.add_paragraph("A. QUANTITATIVE FEEDBACK (Rating Scores):", style='Heading 3')
+            doc.add_paragraph("Average ratings across all participants on a 5-point scale:")
+            doc.add_paragraph()
+            
+            for question in star_questions:
+                ratings = [r['answer'] for fb in feedback_data for r in fb['responses'] if r['question'] == question and isinstance(r['answer'], int)]
+                if ratings:
+                    avg_rating = sum(ratings) / len(ratings)
+                    stars = '⭐' * int(round(avg_rating))
+                    doc.add_paragraph(f"• {question}: {stars} ({avg_rating:.1f}/5.0)")
+            
+            # Overall satisfaction calculation
+            all_ratings = [r['answer'] for fb in feedback_data for r in fb['responses'] if isinstance(r['answer'], int)]
+            if all_ratings:
+                overall_avg = sum(all_ratings) / len(all_ratings)
+                doc.add_paragraph()
+                doc.add_paragraph(f"OVERALL SATISFACTION: {'⭐' * int(round(overall_avg))} ({overall_avg:.1f}/5.0)", style='Heading 3')
+            doc.add_paragraph()
+        
+        # PART 2: QUALITATIVE FEEDBACK THEMES
+        if text_questions:
+            doc.add_paragraph("B. QUALITATIVE FEEDBACK (Key Themes):", style='Heading 3')
+            
+            # Collect all text responses
+            all_text_responses = []
+            for fb in feedback_data:
+                for response in fb['responses']:
+                    if not isinstance(response['answer'], int):
+                        all_text_responses.append(response['answer'])
+            
+            # Analyze common themes (simple keyword matching)
+            positive_keywords = ['good', 'excellent', 'great', 'helpful', 'informative', 'clear', 'effective']
+            improvement_keywords = ['more', 'extend', 'longer', 'additional', 'better', 'improve']
+            
+            positive_count = sum(1 for resp in all_text_responses if any(kw in str(resp).lower() for kw in positive_keywords))
+            improvement_count = sum(1 for resp in all_text_responses if any(kw in str(resp).lower() for kw in improvement_keywords))
+            
+            doc.add_paragraph(f"• Positive Remarks: {positive_count} participants expressed satisfaction with training delivery and content")
+            if improvement_count > 0:
+                doc.add_paragraph(f"• Improvement Suggestions: {improvement_count} participants suggested enhancements (e.g., extended duration, additional videos)")
+            doc.add_paragraph()
+            
+            # PART 3: INDIVIDUAL RESPONSES (Detailed)
+            doc.add_paragraph("C. DETAILED INDIVIDUAL RESPONSES:", style='Heading 3')
+            for idx, fb in enumerate(feedback_data, 1):
+                doc.add_paragraph(f"{idx}. {fb['participant_name']}", style='Heading 4')
+                for response in fb['responses']:
+                    if not isinstance(response['answer'], int):  # Text responses
+                        doc.add_paragraph(f"   Q: {response['question']}")
+                        doc.add_paragraph(f"   A: {response['answer']}")
+                        doc.add_paragraph()
+    else:
+        doc.add_paragraph("No feedback submitted yet.")
+    
+    doc.add_page_break()
+    
+    # MOTORCYCLE/VEHICLE CONDITION & EMPLOYER RECOMMENDATIONS (Enhanced)
+    doc.add_heading('10. VEHICLE CONDITION ASSESSMENT & EMPLOYER RECOMMENDATIONS', 1)
+    
+    if vehicle_issues:
+        doc.add_paragraph(
+            f"During the training program, pre-ride safety inspections were conducted on all participant "
+            f"{'motorcycles' if is_motorcycle else 'vehicles'}. The inspections revealed {len(vehicle_issues)} "
+            f"{'motorcycles' if is_motorcycle else 'vehicles'} with safety concerns that require immediate attention."
+        )
+        doc.add_paragraph()
+        
+        # PART A: SAFETY ISSUES IDENTIFIED
+        doc.add_paragraph("A. SAFETY ISSUES IDENTIFIED:", style='Heading 3')
+        for vehicle_issue in vehicle_issues:
+            doc.add_paragraph(f"Participant: {vehicle_issue['participant_name']}", style='Heading 4')
+            for issue in vehicle_issue['issues']:
+                doc.add_paragraph(f"   • {issue['item']}: {issue['comment']}")
+                if issue['photo_url']:
+                    doc.add_paragraph(f"     [Photo Evidence: {issue['photo_url']}]")
+            doc.add_paragraph()
+        
+        # PART B: SAFETY IMPLICATIONS
+        doc.add_paragraph("B. SAFETY IMPLICATIONS:", style='Heading 3')
+        common_issues = {}
+        for vehicle_issue in vehicle_issues:
+            for issue in vehicle_issue['issues']:
+                item_category = issue['item'].lower()
+                if 'tyre' in item_category or 'tire' in item_category:
+                    common_issues['worn_tyres'] = common_issues.get('worn_tyres', 0) + 1
+                elif 'lamp' in item_category or 'light' in item_category:
+                    common_issues['faulty_lamps'] = common_issues.get('faulty_lamps', 0) + 1
+                elif 'chain' in item_category:
+                    common_issues['loose_chains'] = common_issues.get('loose_chains', 0) + 1
+                elif 'mirror' in item_category:
+                    common_issues['missing_mirrors'] = common_issues.get('missing_mirrors', 0) + 1
+                elif 'ppe' in item_category or 'helmet' in item_category or 'jacket' in item_category:
+                    common_issues['ppe_issues'] = common_issues.get('ppe_issues', 0) + 1
+        
+        if common_issues:
+            for issue_type, count in common_issues.items():
+                if issue_type == 'worn_tyres':
+                    doc.add_paragraph(f"• Worn Tyres ({count} cases): Increased risk of skidding and loss of control, especially in wet conditions")
+                elif issue_type == 'faulty_lamps':
+                    doc.add_paragraph(f"• Faulty Lamps/Lights ({count} cases): Reduced visibility at night, increased accident risk")
+                elif issue_type == 'loose_chains':
+                    doc.add_paragraph(f"• Loose Chains ({count} cases): Risk of chain breakage leading to loss of control")
+                elif issue_type == 'missing_mirrors':
+                    doc.add_paragraph(f"• Missing/Damaged Mirrors ({count} cases): Impaired situational awareness and blind spot monitoring")
+                elif issue_type == 'ppe_issues':
+                    doc.add_paragraph(f"• PPE Non-Compliance ({count} cases): Increased severity of injuries in case of accidents")
+        doc.add_paragraph()
+        
+        # PART C: RECOMMENDATIONS FOR EMPLOYER
+        doc.add_paragraph("C. RECOMMENDATIONS FOR EMPLOYER:", style='Heading 3')
+        recommendations = [
+            "1. IMMEDIATE ACTION REQUIRED:",
+            f"   • Conduct immediate safety inspections on all {len(vehicle_issues)} flagged {'motorcycles' if is_motorcycle else 'vehicles'}",
+            "   • Ground vehicles until critical safety issues are resolved",
+            "   • Provide temporary alternative transportation if needed",
+            "",
+            "2. ESTABLISH REGULAR MAINTENANCE PROTOCOL:",
+            f"   • Implement monthly pre-ride safety inspection checklist for all {'motorcycles' if is_motorcycle else 'vehicles'}",
+            "   • Assign designated personnel for routine maintenance verification",
+            "   • Maintain detailed maintenance logs for each vehicle",
+            "",
+            "3. PPE COMPLIANCE:",
+            "   • Enforce mandatory PPE usage policy (helmet, jacket, gloves, boots)",
+            "   • Provide company-issued PPE if necessary",
+            "   • Conduct regular PPE condition checks",
+            "",
+            "4. INTEGRATE INTO SAFETY SOP:",
+            "   • Include vehicle inspection as part of daily work routine",
+            "   • Establish clear reporting channels for safety issues",
+            "   • Implement consequences for non-compliance",
+            "",
+            "5. SUPPLEMENTARY TRAINING:",
+            "   • Conduct basic vehicle maintenance workshop for employees",
+            "   • Provide refresher training on pre-ride safety checks"
+        ]
+        for rec in recommendations:
+            doc.add_paragraph(rec)
+    else:
+        doc.add_paragraph("✓ EXCELLENT RESULT: All vehicles inspected were found to be in good working condition with no safety concerns identified.")
+        doc.add_paragraph()
+        doc.add_paragraph(
+            "This indicates strong commitment to vehicle maintenance and safety standards. We recommend "
+            "continuing current maintenance practices and conducting regular quarterly safety inspections."
+        )
+    
+    doc.add_page_break()
+    
+    # COORDINATOR FEEDBACK (Enhanced)
+    doc.add_heading('11. COORDINATOR FEEDBACK', 1)
+    coordinator_feedback = context.get('coordinator_feedback')
+    if coordinator_feedback:
+        doc.add_paragraph(
+            "The training coordinator provided comprehensive observations on logistics, participant engagement, "
+            "and overall program execution. Key observations and recommendations are detailed below:"
+        )
+        doc.add_paragraph()
+        
+        responses = coordinator_feedback.get('responses', {})
+        template = coordinator_template
+        for question_id, answer in responses.items():
+            # Get question text from template
+            if template:
+                for q in template.get('questions', []):
+                    if q.get('id') == question_id:
+                        doc.add_paragraph(f"{q.get('question')}:", style='Heading 3')
+                        if q.get('type') == 'rating':
+                            stars = '⭐' * int(answer) if isinstance(answer, (int, float)) else answer
+                            doc.add_paragraph(f"   Rating: {stars} ({answer}/{q.get('scale', 5)})")
+                        else:
+                            doc.add_paragraph(f"   {answer}")
+                        doc.add_paragraph()
+        
+        # Add formal closing
+        doc.add_paragraph()
+        doc.add_paragraph(
+            f"The coordinator acknowledges the strong collaboration between {company.get('name', 'the company')}, "
+            "MDDRC training team, and participants throughout the program. Participants demonstrated excellent "
+            "discipline and commitment to learning, contributing to the overall success of the training initiative."
+        )
+    else:
+        doc.add_paragraph("[Coordinator feedback pending submission]")
+    
+    doc.add_page_break()
+    
+    # RECOMMENDATIONS MOVING FORWARD
+    doc.add_heading('12. RECOMMENDATIONS MOVING FORWARD', 1)
+    doc.add_paragraph(
+        "Based on the training outcomes, participant feedback, and safety observations, "
+        "the following recommendations are proposed to sustain and enhance the safety culture:"
+    )
+    doc.add_paragraph()
+    
+    recommendations_forward = [
+        "1. ENFORCE PRE-RIDE/PRE-DRIVE SAFETY CHECKS:",
+        f"   • Mandate daily pre-{'ride' if is_motorcycle else 'drive'} safety inspections using a standardized checklist",
+        "   • Implement digital logging system for inspection records",
+        "   • Designate safety officers to conduct random spot checks",
+        "",
+        "2. MONTHLY VERIFICATION PROGRAM:",
+        "   • Conduct monthly vehicle condition audits",
+        "   • Schedule preventive maintenance based on mileage/usage",
+        "   • Track and analyze vehicle-related incidents",
+        "",
+        "3. MAINTENANCE SUPPORT:",
+        "   • Establish partnerships with authorized service centers for employee discounts",
+        "   • Provide maintenance subsidy program for safety-critical components",
+        "   • Create emergency maintenance fund for immediate safety repairs",
+        "",
+        "4. POST-TRAINING MATERIALS:",
+        "   • Distribute safety reminder cards or posters for display",
+        "   • Share digital safety tips via company communication channels",
+        "   • Conduct quarterly safety awareness campaigns",
+        "",
+        "5. TAILOR PRACTICALS TO CLIENT ROUTES:",
+        "   • Identify high-risk routes and areas commonly used by employees",
+        "   • Conduct route-specific safety briefings",
+        "   • Share incident hotspot maps and avoidance strategies",
+        "",
+        "6. PROMOTE SAFETY CULTURE:",
+        "   • Recognize and reward safe riding/driving behavior",
+        "   • Establish peer mentorship program for new employees",
+        "   • Include safety KPIs in performance evaluations",
+        "",
+        "7. FOLLOW-UP FOR OUTLIERS:",
+        f"   • Provide one-on-one coaching for {len([p for p in participants if p['improvement'] < 0])} participants who showed score decrease" if any(p['improvement'] < 0 for p in participants) else "   • Continue monitoring participant performance in real-world scenarios",
+        "   • Conduct 3-month post-training assessment to measure retention",
+        "   • Offer refresher training for employees showing concerning behavior"
+    ]
+    
+    for rec in recommendations_forward:
+        doc.add_paragraph(rec)
+    
+    doc.add_page_break()
+    
+    # CONCLUSION
+    doc.add_heading('13. CONCLUSION', 1)
+    doc.add_paragraph(
+        f"The Defensive {'Riding' if is_motorcycle else 'Driving'} Training conducted for "
+        f"{company.get('name', 'N/A')} from {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')} "
+        f"was successfully completed with {len(participants)} participants demonstrating measurable improvement in "
+        f"safety awareness and defensive {'riding' if is_motorcycle else 'driving'} competencies."
+    )
+    doc.add_paragraph()
+    
+    doc.add_paragraph(
+        f"Key achievements include an average score improvement of {improvement:+.1f}%, "
+        f"a post-training pass rate of {(post_pass_count/len(participants)*100):.0f}%, and high participant "
+        f"satisfaction levels. The training successfully enhanced hazard recognition skills, emergency response "
+        f"techniques, and safety-first mindset among participants."
+    )
+    doc.add_paragraph()
+    
+    if vehicle_issues:
+        doc.add_paragraph(
+            f"Vehicle safety inspections identified {len(vehicle_issues)} {'motorcycles' if is_motorcycle else 'vehicles'} "
+            "requiring immediate attention. Detailed recommendations have been provided to address these concerns "
+            "and prevent potential accidents."
+        )
+        doc.add_paragraph()
+    
+    doc.add_paragraph(
+        "MDDRC extends sincere appreciation to the management and employees of "
+        f"{company.get('name', 'the company')} for their strong collaboration and commitment throughout this program. "
+        "The enthusiastic participation and positive learning attitude demonstrated by all participants contributed "
+        "significantly to the program's success."
+    )
+    doc.add_paragraph()
+    
+    doc.add_paragraph(
+        "We remain committed to supporting your organization's journey towards a safer workplace and look forward "
+        "to continued partnership in promoting road safety excellence."
+    )
+    
+    doc.add_page_break()
+    
+    # APPENDICES
+    doc.add_heading('APPENDICES', 1)
+    
+    # APPENDIX A: Pre & Post Test Raw Scores
+    doc.add_heading('Appendix A: Pre & Post Test Raw Scores', 2)
+    appendix_table = doc.add_table(rows=len(participants)+1, cols=5)
+    appendix_table.style = 'Light Grid Accent 1'
+    hdr = appendix_table.rows[0].cells
+    hdr[0].text = 'No.'
+    hdr[1].text = 'Participant Name'
+    hdr[2].text = 'Pre-Test Score'
+    hdr[3].text = 'Post-Test Score'
+    hdr[4].text = 'Improvement'
+    
+    for idx, p in enumerate(participants, 1):
+        row = appendix_table.rows[idx].cells
+        row[0].text = str(idx)
+        row[1].text = p['name']
+        row[2].text = f"{p['pre_test_score']:.0f}%"
+        row[3].text = f"{p['post_test_score']:.0f}%"
+        row[4].text = f"{p['improvement']:+.0f}%"
+    
+    doc.add_page_break()
+    
+    # APPENDIX B: Vehicle Condition Photos
+    if vehicle_issues:
+        doc.add_heading('Appendix B: Vehicle Condition Photos', 2)
+        doc.add_paragraph("Photographic evidence of safety issues identified during vehicle inspections:")
+        doc.add_paragraph()
+        for vehicle_issue in vehicle_issues:
+            doc.add_paragraph(f"{vehicle_issue['participant_name']}:", style='Heading 4')
+            for issue in vehicle_issue['issues']:
+                if issue['photo_url']:
+                    doc.add_paragraph(f"• {issue['item']}")
+                    doc.add_paragraph(f"  [Photo URL: {issue['photo_url']}]")
+            doc.add_paragraph()
+        doc.add_page_break()
+    
+    # APPENDIX C: Feedback Form Summary
+    doc.add_heading('Appendix C: Participant Feedback Form Summary', 2)
+    if feedback_data:
+        doc.add_paragraph("Complete participant feedback responses:")
+        doc.add_paragraph()
+        for idx, fb in enumerate(feedback_data, 1):
+            doc.add_paragraph(f"{idx}. {fb['participant_name']}", style='Heading 4')
+            for response in fb['responses']:
+                doc.add_paragraph(f"   Q: {response['question']}")
+                doc.add_paragraph(f"   A: {response['answer']}")
+            doc.add_paragraph()
+    else:
+        doc.add_paragraph("[No feedback data available]")
+    
+    doc.add_page_break()
+    
+    # SIGNATURES
+    doc.add_heading('APPROVAL & SIGNATURES', 1)
+    doc.add_paragraph()
+    sig_table = doc.add_table(rows=4, cols=2)
+    sig_table.style = 'Light List'
+    
+    sig_table.rows[0].cells[0].text = 'Prepared by:'
+    sig_table.rows[0].cells[1].text = ''
+    sig_table.rows[1].cells[0].text = 'Name:'
+    sig_table.rows[1].cells[1].text = prepared_by
+    sig_table.rows[2].cells[0].text = 'Position:'
+    sig_table.rows[2].cells[1].text = 'Training Coordinator'
+    sig_table.rows[3].cells[0].text = 'Date:'
+    sig_table.rows[3].cells[1].text = report_date
+    
+    doc.add_paragraph()
+    doc.add_paragraph()
+    doc.add_paragraph("_" * 60)
+    doc.add_paragraph()
+    
+    sig_table2 = doc.add_table(rows=4, cols=2)
+    sig_table2.style = 'Light List'
+    sig_table2.rows[0].cells[0].text = 'Reviewed & Approved by:'
+    sig_table2.rows[0].cells[1].text = ''
+    sig_table2.rows[1].cells[0].text = 'Name:'
+    sig_table2.rows[1].cells[1].text = '________________________'
+    sig_table2.rows[2].cells[0].text = 'Position:'
+    sig_table2.rows[2].cells[1].text = 'Person In Charge / Supervisor'
+    sig_table2.rows[3].cells[0].text = 'Date:'
+    sig_table2.rows[3].cells[1].text = '________________________'
+    
+    doc.add_paragraph()
+    doc.add_paragraph()
+    footer = doc.add_paragraph('--- END OF REPORT ---')
+    footer.alignment = 1
+    
+    doc.add_page_break()
+    
+    # SIGNATURES
+    doc.add_heading('11. SIGNATURES', 1)
+    doc.add_paragraph()
+    doc.add_paragraph("_" * 40)
+    doc.add_paragraph(f"Coordinator: {prepared_by}")
+    doc.add_paragraph(f"Date: ________________")
+    doc.add_paragraph()
+    doc.add_paragraph()
+    doc.add_paragraph("_" * 40)
+    doc.add_paragraph("PIC/Supervisor Signature")
+    doc.add_paragraph(f"Date: ________________")
+    
+    # Save DOCX
+    doc.save(output_path)
+    return output_path
+
+
+class ReportRenderer:
+    """Process pool that renders training reports off the event loop.
+    
+    Workers are started with the "spawn" method so they never inherit the server's
+    event loop, database client or open sockets.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.worker_count = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.worker_count,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logging.info(f"📝 Report renderer started with {self.worker_count} worker process(es)")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, context: dict, output_path: str) -> str:
+        """Render a training report in a worker process and return its path"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, render_training_report, context, output_path)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool for the next request
+            logging.error("Report renderer worker pool broke; restarting it")
+            self.stop()
+            raise
+
+
+def create_report_renderer() -> ReportRenderer:
+    """Build the renderer from environment configuration"""
+    return ReportRenderer(workers=int(os.environ.get("REPORT_RENDER_WORKERS", "2")))
@@ -0,0 +1,56 @@
+"""
+Supervisor report index
+Read model for the supervisor portal: one document per report that has been pushed to
+supervisors, holding the report fields the portal renders, the session details shown with
+it and the session's supervisor_ids (multikey index), so the portal is a single indexed,
+paginated query. Only those fields are copied: the report itself may carry base64 photos.
+"""
+
+SESSION_FIELDS = {"_id": 0, "name": 1, "start_date": 1, "end_date": 1, "location": 1, "supervisor_ids": 1}
+REPORT_FIELDS = {
+    "_id": 0, "id": 1, "status": 1, "submitted_at": 1, "submitted_by": 1,
+    "pdf_url": 1, "pdf_filename": 1, "pushed_to_supervisors_at": 1
+}
+PUSHED_QUERY = {"status": "submitted", "available_to_supervisors": True}
+
+
+async def index_supervisor_report(db, session_id: str, now: str):
+    """Bring the index entry of one session up to date (or remove it); now is the pushed_at
+    of reports pushed before pushed_to_supervisors_at was recorded"""
+    session = await db.sessions.find_one({"id": session_id}, SESSION_FIELDS)
+    training_report = await db.training_reports.find_one({"session_id": session_id, **PUSHED_QUERY}, REPORT_FIELDS)
+    if not session or not training_report:
+        await db.supervisor_report_index.delete_one({"session_id": session_id})
+        return
+
+    pdf_url = training_report.get("pdf_url")
+    if not pdf_url and training_report.get("pdf_filename"):
+        pdf_url = f"/api/static/reports_pdf/{training_report['pdf_filename']}"
+
+    await db.supervisor_report_index.replace_one(
+        {"session_id": session_id},
+        {
+            "id": training_report.get("id"),
+            "session_id": session_id,
+            "status": training_report.get("status"),
+            "submitted_at": training_report.get("submitted_at"),
+            "submitted_by": training_report.get("submitted_by"),
+            "pdf_url": pdf_url,
+            "session_name": session.get("name"),
+            "session_start_date": session.get("start_date"),
+            "session_end_date": session.get("end_date"),
+            "location": session.get("location"),
+            "supervisor_ids": session.get("supervisor_ids", []),
+            "pushed_at": training_report.get("pushed_to_supervisors_at") or now
+        },
+        upsert=True
+    )
+
+
+async def rebuild_supervisor_report_index(db, now: str) -> int:
+    """Re-index every report pushed to supervisors and drop entries of reports no longer pushed"""
+    session_ids = await db.training_reports.distinct("session_id", PUSHED_QUERY)
+    for session_id in session_ids:
+        await index_supervisor_report(db, session_id, now)
+    await db.supervisor_report_index.delete_many({"session_id": {"$nin": session_ids}})
+    return len(session_ids)
@@ -0,0 +1,92 @@
+"""
+Streaming ZIP archives
+Writes a ZIP archive chunk by chunk from files on disk, so large bundles are never
+held in memory and the first bytes reach the client straight away.
+"""
+import os
+import re
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile needs the current offset for the central directory, but never seeks back
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def safe_archive_name(name: str, fallback: str = "file") -> str:
+    """Make a display name safe to use as a file name inside an archive"""
+    cleaned = re.sub(r"[^\w\-. ]+", "", name or "", flags=re.UNICODE).strip()
+    cleaned = re.sub(r"\s+", "_", cleaned)
+    return cleaned or fallback
+
+
+def unique_archive_names(names: Iterable[str]) -> List[str]:
+    """Suffix repeated names with _2, _3, ... (before the extension) so none collide"""
+    used = set()
+    result = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        candidate = name
+        counter = 2
+        while candidate.lower() in used:
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        used.add(candidate.lower())
+        result.append(candidate)
+    return result
+
+
+def stream_zip(entries: Iterable[Tuple[str, Path]], compression: int = zipfile.ZIP_STORED) -> Iterator[bytes]:
+    """Yield the bytes of a ZIP archive holding each (archive name, file path) entry.
+
+    PDFs are already compressed, so entries are stored by default. Missing files are skipped.
+    This is a blocking generator; StreamingResponse runs it in a thread pool.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=compression, allowZip64=True) as archive:
+        for arcname, path in entries:
+            if not path.is_file():
+                continue
+            info = zipfile.ZipInfo.from_file(path, arcname=arcname)
+            info.compress_type = compression
+            with open(path, "rb") as source, archive.open(info, mode="w", force_zip64=True) as target:
+                while True:
+                    block = source.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    target.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    data = sink.drain()
+    if data:
+        yield data
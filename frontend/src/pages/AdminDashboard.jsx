@@ -131,6 +131,9 @@ const AdminDashboard = ({ user, onLogout }) => {
   
   // Reports Archive states
   const [allReports, setAllReports] = useState([]);
+  const [reportsPage, setReportsPage] = useState(1);
+  const [reportsTotal, setReportsTotal] = useState(0);
+  const [reportsHasMore, setReportsHasMore] = useState(false);
   const [loadingReports, setLoadingReports] = useState(false);
   const [reportsSearch, setReportsSearch] = useState("");
   const [filterCompany, setFilterCompany] = useState("all");
@@ -148,6 +151,8 @@ const AdminDashboard = ({ user, onLogout }) => {
   const [certificatesSearch, setCertificatesSearch] = useState("");
   const [filterCertSession, setFilterCertSession] = useState("all");
   const [filterCertProgram, setFilterCertProgram] = useState("all");
+  const [certificatesCursor, setCertificatesCursor] = useState(null);
+  const [certificatesTotal, setCertificatesTotal] = useState(0);
 
   
   // Password reset states
@@ -979,10 +984,11 @@ const AdminDashboard = ({ user, onLogout }) => {
 
 
   // Reports Archive functions
-  const loadAllReports = async () => {
+  const loadAllReports = async (loadMore = false) => {
     setLoadingReports(true);
     try {
-      const params = {};
+      const page = loadMore ? reportsPage + 1 : 1;
+      const params = { page, limit: 30 };
       
       if (reportsSearch) params.search = reportsSearch;
       if (filterCompany && filterCompany !== "all") params.company_id = filterCompany;
@@ -991,7 +997,11 @@ const AdminDashboard = ({ user, onLogout }) => {
       if (filterEndDate) params.end_date = filterEndDate;
       
       const response = await axiosInstance.get("/training-reports/admin/all", { params });
-      setAllReports(response.data.reports || []);
+      const reports = response.data.reports || [];
+      setAllReports(loadMore ? [...allReports, ...reports] : reports);
+      setReportsPage(page);
+      setReportsTotal(response.data.total || 0);
+      setReportsHasMore(!!response.data.has_more);
     } catch (error) {
       console.error("Failed to load reports:", error);
       toast.error(error.response?.data?.detail || "Failed to load training reports");
@@ -1002,11 +1012,20 @@ const AdminDashboard = ({ user, onLogout }) => {
 
 
   // Certificates Repository functions
-  const loadAllCertificates = async () => {
+  const loadAllCertificates = async (loadMore = false) => {
     setLoadingCertificates(true);
     try {
-      const response = await axiosInstance.get("/certificates/repository");
-      setAllCertificates(response.data || []);
+      const params = { limit: 50 };
+      if (certificatesSearch) params.search = certificatesSearch;
+      if (filterCertSession !== "all") params.session_id = filterCertSession;
+      if (filterCertProgram !== "all") params.program_id = filterCertProgram;
+      if (loadMore && certificatesCursor) params.cursor = certificatesCursor;
+      
+      const response = await axiosInstance.get("/certificates/repository", { params });
+      const page = response.data.certificates || [];
+      setAllCertificates(loadMore ? [...allCertificates, ...page] : page);
+      setCertificatesCursor(response.data.next_cursor || null);
+      setCertificatesTotal(response.data.total || 0);
     } catch (error) {
       console.error("Failed to load certificates:", error);
       toast.error(error.response?.data?.detail || "Failed to load certificates");
@@ -1078,6 +1097,15 @@ const AdminDashboard = ({ user, onLogout }) => {
     setReportDetailsOpen(true);
   };
 
+  // Reload certificates (first page) when the tab is opened or filters change
+  useEffect(() => {
+    if (activeTab !== "certificates") return;
+    const timer = setTimeout(() => {
+      loadAllCertificates();
+    }, 400);
+    return () => clearTimeout(timer);
+  }, [activeTab, certificatesSearch, filterCertSession, filterCertProgram]);
+
   // Load reports when Reports tab is selected
   useEffect(() => {
     if (activeTab === "reports" && allReports.length === 0) {
@@ -2311,7 +2339,7 @@ const AdminDashboard = ({ user, onLogout }) => {
                         className="w-full"
                       />
                     </div>
-                    <Button onClick={loadAllReports} variant="outline">
+                    <Button onClick={() => loadAllReports()} variant="outline">
                       <Search className="w-4 h-4 mr-2" />
                       Search
                     </Button>
@@ -2363,13 +2391,14 @@ const AdminDashboard = ({ user, onLogout }) => {
 
                   {allReports.length > 0 && (
                     <p className="text-sm text-gray-600">
-                      Found {allReports.length} training report{allReports.length !== 1 ? 's' : ''}
+                      Found {reportsTotal} training report{reportsTotal !== 1 ? 's' : ''}
+                      {reportsTotal > allReports.length && ` (showing ${allReports.length})`}
                     </p>
                   )}
                 </div>
 
                 {/* Reports Grid */}
-                {loadingReports ? (
+                {loadingReports && allReports.length === 0 ? (
                   <div className="flex justify-center items-center py-12">
                     <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600"></div>
                   </div>
@@ -2450,6 +2479,14 @@ const AdminDashboard = ({ user, onLogout }) => {
                     ))}
                   </div>
                 )}
+                
+                {reportsHasMore && allReports.length > 0 && (
+                  <div className="mt-6 text-center">
+                    <Button variant="outline" onClick={() => loadAllReports(true)} disabled={loadingReports}>
+                      {loadingReports ? "Loading..." : "Load More"}
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
 
@@ -3620,7 +3657,7 @@ const AdminDashboard = ({ user, onLogout }) => {
                     <CardTitle>Certificates Repository</CardTitle>
                     <CardDescription>View all uploaded participant certificates</CardDescription>
                   </div>
-                  <Button onClick={loadAllCertificates} disabled={loadingCertificates}>
+                  <Button onClick={() => loadAllCertificates()} disabled={loadingCertificates}>
                     {loadingCertificates ? "Loading..." : "Refresh"}
                   </Button>
                 </div>
@@ -3661,7 +3698,7 @@ const AdminDashboard = ({ user, onLogout }) => {
                       <SelectContent>
                         <SelectItem value="all">All Programs</SelectItem>
                         {programs.map((program) => (
-                          <SelectItem key={program.id} value={program.name}>
+                          <SelectItem key={program.id} value={program.id}>
                             {program.name}
                           </SelectItem>
                         ))}
@@ -3684,7 +3721,7 @@ const AdminDashboard = ({ user, onLogout }) => {
                 </div>
 
                 {/* Certificates Table */}
-                {loadingCertificates ? (
+                {loadingCertificates && allCertificates.length === 0 ? (
                   <div className="text-center py-8">
                     <p className="text-gray-500">Loading certificates...</p>
                   </div>
@@ -3709,24 +3746,7 @@ const AdminDashboard = ({ user, onLogout }) => {
                         </tr>
                       </thead>
                       <tbody>
-                        {allCertificates
-                          .filter((cert) => {
-                            // Search filter
-                            const searchLower = certificatesSearch.toLowerCase();
-                            const matchesSearch = !certificatesSearch || 
-                              cert.participant_name?.toLowerCase().includes(searchLower) ||
-                              cert.participant_id_number?.toLowerCase().includes(searchLower) ||
-                              cert.participant_email?.toLowerCase().includes(searchLower);
-                            
-                            // Session filter
-                            const matchesSession = filterCertSession === "all" || cert.session_id === filterCertSession;
-                            
-                            // Program filter
-                            const matchesProgram = filterCertProgram === "all" || cert.program_name === filterCertProgram;
-                            
-                            return matchesSearch && matchesSession && matchesProgram;
-                          })
-                          .map((cert, index) => (
+                        {allCertificates.map((cert, index) => (
                             <tr key={index} className="border-b hover:bg-gray-50">
                               <td className="p-3">
                                 <div>
@@ -3772,26 +3792,21 @@ const AdminDashboard = ({ user, onLogout }) => {
                       </tbody>
                     </table>
                     
+                    {certificatesCursor && (
+                      <div className="mt-4 text-center">
+                        <Button variant="outline" onClick={() => loadAllCertificates(true)} disabled={loadingCertificates}>
+                          {loadingCertificates ? "Loading..." : "Load More"}
+                        </Button>
+                      </div>
+                    )}
+                    
                     {/* Summary */}
                     <div className="mt-4 p-4 bg-blue-50 rounded-lg border border-blue-200">
                       <p className="text-sm text-gray-700">
-                        <span className="font-semibold">Total Certificates:</span> {allCertificates.length}
-                        {certificatesSearch || filterCertSession !== "all" || filterCertProgram !== "all" ? (
-                          <span className="ml-2">
-                            | <span className="font-semibold">Filtered:</span> {
-                              allCertificates.filter((cert) => {
-                                const searchLower = certificatesSearch.toLowerCase();
-                                const matchesSearch = !certificatesSearch || 
-                                  cert.participant_name?.toLowerCase().includes(searchLower) ||
-                                  cert.participant_id_number?.toLowerCase().includes(searchLower) ||
-                                  cert.participant_email?.toLowerCase().includes(searchLower);
-                                const matchesSession = filterCertSession === "all" || cert.session_id === filterCertSession;
-                                const matchesProgram = filterCertProgram === "all" || cert.program_name === filterCertProgram;
-                                return matchesSearch && matchesSession && matchesProgram;
-                              }).length
-                            }
-                          </span>
-                        ) : null}
+                        <span className="font-semibold">
+                          {certificatesSearch || filterCertSession !== "all" || filterCertProgram !== "all" ? "Matching Certificates:" : "Total Certificates:"}
+                        </span> {certificatesTotal}
+                        <span className="ml-2">| <span className="font-semibold">Showing:</span> {allCertificates.length}</span>
                       </p>
                     </div>
                   </div>
@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { axiosInstance } from "../App";
+import { axiosInstance, API } from "../App";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -518,17 +518,26 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
       return;
     }
 
-    const reader = new FileReader();
-    reader.onloadend = () => {
+    try {
+      const formData = new FormData();
+      formData.append("file", file);
+      const response = await axiosInstance.post("/training-reports/photos/upload", formData, {
+        headers: { "Content-Type": "multipart/form-data" }
+      });
       setTrainingReport(prev => ({
         ...prev,
-        [fieldName]: reader.result
+        [fieldName]: response.data.photo_url
       }));
       toast.success("Photo uploaded");
-    };
-    reader.readAsDataURL(file);
+    } catch (error) {
+      toast.error(error.response?.data?.detail || "Failed to upload photo");
+    }
   };
 
+  // Photos are stored as /api/report-photos/... URLs (older reports may still hold data URLs)
+  const reportPhotoSrc = (value) => value?.startsWith("/api/") ? `${process.env.REACT_APP_BACKEND_URL}${value}` : value;
+  const checklistThumbSrc = (value) => value?.includes("/checklist-photos/") ? `${value}?variant=thumb` : value;
+
   const handleSaveReport = async (status = "draft") => {
     if (!selectedSession) {
       toast.error("Please select a session first");
@@ -562,10 +571,45 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
 
     setGeneratingReport(true);
     try {
-      const response = await axiosInstance.post(`/training-reports/${selectedSession.id}/generate-ai-report`);
+      // Streamed as server-sent events so the report text appears as soon as it is ready
+      const response = await fetch(`${API}/training-reports/${selectedSession.id}/generate-ai-report/stream`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${localStorage.getItem("token")}` }
+      });
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.detail || "Failed to generate AI report");
+      }
+      
+      let fullReport = "";
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let finished = false;
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const dataLine = raw.split("\n").find(line => line.startsWith("data: "));
+          if (!dataLine) continue;
+          const event = JSON.parse(dataLine.slice(6));
+          if (event.type === "queued") {
+            toast.info("Waiting for a free AI slot...");
+          } else if (event.type === "content") {
+            fullReport += event.text;
+            setAiGeneratedReport(fullReport);
+          } else if (event.type === "error") {
+            throw new Error(event.detail);
+          } else if (event.type === "done") {
+            finished = true;
+          }
+        }
+      }
       
       // Add checklist issues section to the AI report
-      let fullReport = response.data.generated_report;
       
       if (checklistIssues.length > 0) {
         fullReport += "\n\n## VEHICLE INSPECTION ISSUES\n\n";
@@ -588,7 +632,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
       setAiGeneratedReport(fullReport);
       toast.success("AI report generated successfully with checklist data!");
     } catch (error) {
-      toast.error(error.response?.data?.detail || "Failed to generate AI report");
+      toast.error(error.message || "Failed to generate AI report");
     } finally {
       setGeneratingReport(false);
     }
@@ -658,6 +702,30 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
     }
   };
 
+  const handleDownloadAllCertificates = async () => {
+    try {
+      const response = await axiosInstance.get(`/certificates/session/${selectedSession.id}/download-all`, {
+        responseType: 'blob'
+      });
+      
+      const url = window.URL.createObjectURL(new Blob([response.data], { type: 'application/zip' }));
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `${selectedSession.name.replace(/\s+/g, '_')}_certificates.zip`;
+      link.style.display = 'none';
+      document.body.appendChild(link);
+      link.click();
+      
+      setTimeout(() => {
+        document.body.removeChild(link);
+        window.URL.revokeObjectURL(url);
+      }, 100);
+    } catch (error) {
+      console.error("Download error:", error);
+      toast.error(error.response?.status === 404 ? "No certificates uploaded for this session yet" : "Failed to download certificates");
+    }
+  };
+
   const handleUploadEditedDOCX = async (event) => {
     const file = event.target.files?.[0];
     if (!file) return;
@@ -1274,15 +1342,25 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <CardTitle>Participants ({participants.length})</CardTitle>
                           <CardDescription>All participants enrolled in this session</CardDescription>
                         </div>
-                        <Button
-                          onClick={() => setAddParticipantDialogOpen(true)}
-                          variant="outline"
-                          size="sm"
-                          style={{ borderColor: primaryColor, color: primaryColor }}
-                        >
-                          <Users className="w-4 h-4 mr-2" />
-                          Add Participant
-                        </Button>
+                        <div className="flex gap-2">
+                          <Button
+                            onClick={handleDownloadAllCertificates}
+                            variant="outline"
+                            size="sm"
+                          >
+                            <Download className="w-4 h-4 mr-2" />
+                            Download All Certificates
+                          </Button>
+                          <Button
+                            onClick={() => setAddParticipantDialogOpen(true)}
+                            variant="outline"
+                            size="sm"
+                            style={{ borderColor: primaryColor, color: primaryColor }}
+                          >
+                            <Users className="w-4 h-4 mr-2" />
+                            Add Participant
+                          </Button>
+                        </div>
                       </div>
                     </CardHeader>
                     <CardContent>
@@ -1685,7 +1763,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                                           <div className="mt-2">
                                             <p className="text-xs text-gray-600 mb-1">Photo:</p>
                                             <img 
-                                              src={item.photo_url || item.photo} 
+                                              src={checklistThumbSrc(item.photo_url || item.photo)} 
                                               alt={item.item || 'Vehicle item'} 
                                               className="w-32 h-32 object-cover rounded border-2 border-red-300 cursor-pointer hover:scale-105 transition-transform"
                                               onClick={() => window.open(item.photo_url || item.photo, '_blank')}
@@ -1736,7 +1814,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center hover:border-indigo-500 transition-colors">
                             {trainingReport.group_photo ? (
                               <div className="relative">
-                                <img src={trainingReport.group_photo} alt="Group" className="w-full h-40 object-cover rounded" />
+                                <img src={reportPhotoSrc(trainingReport.group_photo)} alt="Group" className="w-full h-40 object-cover rounded" />
                                 <Button
                                   size="sm"
                                   variant="destructive"
@@ -1768,7 +1846,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center hover:border-indigo-500 transition-colors">
                             {trainingReport.theory_photo_1 ? (
                               <div className="relative">
-                                <img src={trainingReport.theory_photo_1} alt="Theory 1" className="w-full h-40 object-cover rounded" />
+                                <img src={reportPhotoSrc(trainingReport.theory_photo_1)} alt="Theory 1" className="w-full h-40 object-cover rounded" />
                                 <Button
                                   size="sm"
                                   variant="destructive"
@@ -1800,7 +1878,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center hover:border-indigo-500 transition-colors">
                             {trainingReport.theory_photo_2 ? (
                               <div className="relative">
-                                <img src={trainingReport.theory_photo_2} alt="Theory 2" className="w-full h-40 object-cover rounded" />
+                                <img src={reportPhotoSrc(trainingReport.theory_photo_2)} alt="Theory 2" className="w-full h-40 object-cover rounded" />
                                 <Button
                                   size="sm"
                                   variant="destructive"
@@ -1832,7 +1910,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center hover:border-indigo-500 transition-colors">
                             {trainingReport.practical_photo_1 ? (
                               <div className="relative">
-                                <img src={trainingReport.practical_photo_1} alt="Practical 1" className="w-full h-40 object-cover rounded" />
+                                <img src={reportPhotoSrc(trainingReport.practical_photo_1)} alt="Practical 1" className="w-full h-40 object-cover rounded" />
                                 <Button
                                   size="sm"
                                   variant="destructive"
@@ -1864,7 +1942,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center hover:border-indigo-500 transition-colors">
                             {trainingReport.practical_photo_2 ? (
                               <div className="relative">
-                                <img src={trainingReport.practical_photo_2} alt="Practical 2" className="w-full h-40 object-cover rounded" />
+                                <img src={reportPhotoSrc(trainingReport.practical_photo_2)} alt="Practical 2" className="w-full h-40 object-cover rounded" />
                                 <Button
                                   size="sm"
                                   variant="destructive"
@@ -1896,7 +1974,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center hover:border-indigo-500 transition-colors">
                             {trainingReport.practical_photo_3 ? (
                               <div className="relative">
-                                <img src={trainingReport.practical_photo_3} alt="Practical 3" className="w-full h-40 object-cover rounded" />
+                                <img src={reportPhotoSrc(trainingReport.practical_photo_3)} alt="Practical 3" className="w-full h-40 object-cover rounded" />
                                 <Button
                                   size="sm"
                                   variant="destructive"
@@ -2907,7 +2985,9 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                       <Button variant="outline" size="sm" onClick={async () => {
                         setLoadingIncome(true);
                         try {
-                          const response = await axiosInstance.get(`/finance/income/coordinator/${user.id}`);
+                          const response = await axiosInstance.get(`/finance/income/coordinator/${user.id}`, {
+                            params: { start_date: `${incomeFilter.year}-01-01`, end_date: `${incomeFilter.year}-12-31` }
+                          });
                           setIncomeData(response.data);
                         } catch (error) {
                           console.error('Failed to load income:', error);
@@ -2927,7 +3007,9 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                       <Button onClick={async () => {
                         setLoadingIncome(true);
                         try {
-                          const response = await axiosInstance.get(`/finance/income/coordinator/${user.id}`);
+                          const response = await axiosInstance.get(`/finance/income/coordinator/${user.id}`, {
+                            params: { start_date: `${incomeFilter.year}-01-01`, end_date: `${incomeFilter.year}-12-31` }
+                          });
                           setIncomeData(response.data);
                         } catch (error) {
                           console.error('Failed to load income:', error);
@@ -21,6 +21,10 @@ const FinanceDashboard = ({ user, onLogout }) => {
   const [invoices, setInvoices] = useState([]);
   const [payments, setPayments] = useState([]);
   const [auditLogs, setAuditLogs] = useState([]);
+  const [auditCursor, setAuditCursor] = useState(null);
+  const [aging, setAging] = useState(null);
+  const [rollup, setRollup] = useState(null);
+  const [rollupGroupBy, setRollupGroupBy] = useState('month');
   const [loading, setLoading] = useState(true);
   const [statusFilter, setStatusFilter] = useState('pending');
   
@@ -88,15 +92,34 @@ const FinanceDashboard = ({ user, onLogout }) => {
     }
   };
 
-  const loadAuditLogs = async () => {
+  const loadAuditLogs = async (cursor = null) => {
     try {
-      const response = await axiosInstance.get('/finance/audit-log?limit=50');
-      setAuditLogs(response.data);
+      const response = await axiosInstance.get('/finance/audit-log', { params: { limit: 50, cursor: cursor || undefined } });
+      setAuditLogs(prev => cursor ? [...prev, ...response.data.logs] : response.data.logs);
+      setAuditCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to load audit logs');
     }
   };
 
+  const loadAging = async (refresh = false) => {
+    try {
+      const response = await axiosInstance.get(`/finance/receivables/aging${refresh ? '?refresh=true' : ''}`);
+      setAging(response.data);
+    } catch (error) {
+      toast.error('Failed to load receivables aging');
+    }
+  };
+
+  const loadRollup = async (groupBy = rollupGroupBy) => {
+    try {
+      const response = await axiosInstance.get('/finance/rollups', { params: { group_by: groupBy } });
+      setRollup(response.data);
+    } catch (error) {
+      toast.error('Failed to load profitability');
+    }
+  };
+
   const loadPayments = async () => {
     try {
       const response = await axiosInstance.get('/finance/payments');
@@ -210,10 +233,25 @@ const FinanceDashboard = ({ user, onLogout }) => {
     setPaymentForm({
       ...paymentForm,
       invoice_id: invoiceId,
-      amount: selected?.total_amount?.toString() || ''
+      amount: (selected?.balance_due ?? selected?.total_amount)?.toString() || ''
     });
   };
 
+  const handleReversePayment = async (paymentId) => {
+    const reason = window.prompt('Reason for reversing this payment:');
+    if (!reason) return;
+    try {
+      await axiosInstance.post(`/finance/payments/${paymentId}/reverse`, { reason });
+      toast.success('Payment reversed');
+      loadPayments();
+      loadInvoices();
+      loadPendingInvoices();
+      loadDashboard();
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Failed to reverse payment');
+    }
+  };
+
   const getStatusBadge = (status) => {
     const statusConfig = {
       auto_draft: { color: 'bg-gray-500', label: 'Draft' },
@@ -261,6 +299,8 @@ const FinanceDashboard = ({ user, onLogout }) => {
             <TabsTrigger value="invoices">Invoices</TabsTrigger>
             <TabsTrigger value="payments">Payments</TabsTrigger>
             <TabsTrigger value="credit-notes">Credit Notes</TabsTrigger>
+            <TabsTrigger value="receivables">Receivables</TabsTrigger>
+            <TabsTrigger value="profitability">Profitability</TabsTrigger>
             <TabsTrigger value="audit">Audit Log</TabsTrigger>
           </TabsList>
 
@@ -401,6 +441,7 @@ const FinanceDashboard = ({ user, onLogout }) => {
                           <th className="px-4 py-3 text-left text-sm font-medium text-gray-500">Company</th>
                           <th className="px-4 py-3 text-left text-sm font-medium text-gray-500">Session</th>
                           <th className="px-4 py-3 text-right text-sm font-medium text-gray-500">Amount</th>
+                          <th className="px-4 py-3 text-right text-sm font-medium text-gray-500">Balance</th>
                           <th className="px-4 py-3 text-center text-sm font-medium text-gray-500">Status</th>
                           <th className="px-4 py-3 text-center text-sm font-medium text-gray-500">Actions</th>
                         </tr>
@@ -412,6 +453,7 @@ const FinanceDashboard = ({ user, onLogout }) => {
                             <td className="px-4 py-3 text-sm">{invoice.company_name || '-'}</td>
                             <td className="px-4 py-3 text-sm">{invoice.session_name || '-'}</td>
                             <td className="px-4 py-3 text-sm text-right font-medium">RM {invoice.total_amount?.toLocaleString()}</td>
+                            <td className="px-4 py-3 text-sm text-right">RM {(invoice.balance_due ?? invoice.total_amount)?.toLocaleString()}</td>
                             <td className="px-4 py-3 text-center">{getStatusBadge(invoice.status)}</td>
                             <td className="px-4 py-3 text-center">
                               <div className="flex justify-center gap-1">
@@ -499,7 +541,7 @@ const FinanceDashboard = ({ user, onLogout }) => {
                         ) : (
                           pendingInvoices.map(inv => (
                             <SelectItem key={inv.id} value={inv.id}>
-                              {inv.invoice_number} - {inv.company_name || inv.session_name} (RM {inv.total_amount?.toLocaleString()})
+                              {inv.invoice_number} - {inv.company_name || inv.session_name} (RM {(inv.balance_due ?? inv.total_amount)?.toLocaleString()} due)
                             </SelectItem>
                           ))
                         )}
@@ -646,8 +688,15 @@ const FinanceDashboard = ({ user, onLogout }) => {
                               <p className="text-sm text-gray-500">{payment.payment_date}</p>
                             </div>
                             <div className="text-right">
-                              <p className="font-bold text-green-600">RM {payment.amount?.toLocaleString()}</p>
+                              <p className={`font-bold ${payment.reversed ? 'text-gray-400 line-through' : 'text-green-600'}`}>RM {payment.amount?.toLocaleString()}</p>
                               <p className="text-xs text-gray-500">{payment.payment_method}</p>
+                              {payment.reversed ? (
+                                <p className="text-xs text-red-500">Reversed: {payment.reversal_reason}</p>
+                              ) : (
+                                <Button variant="ghost" size="sm" className="text-red-600 h-6 px-2" onClick={() => handleReversePayment(payment.id)}>
+                                  Reverse
+                                </Button>
+                              )}
                             </div>
                           </div>
                         </div>
@@ -720,13 +769,167 @@ const FinanceDashboard = ({ user, onLogout }) => {
             </Card>
           </TabsContent>
 
+          {/* Receivables Aging Tab */}
+          <TabsContent value="receivables">
+            <Card>
+              <CardHeader>
+                <div className="flex justify-between items-center">
+                  <div>
+                    <CardTitle>Receivables Aging</CardTitle>
+                    {aging && (
+                      <CardDescription>
+                        Days past due ({aging.payment_terms_days}-day terms) as of {new Date(aging.as_of).toLocaleString()}
+                      </CardDescription>
+                    )}
+                  </div>
+                  <Button variant="outline" onClick={() => loadAging(aging !== null)}>
+                    <RefreshCw className="w-4 h-4 mr-2" />
+                    {aging ? 'Refresh' : 'Load Aging'}
+                  </Button>
+                </div>
+              </CardHeader>
+              <CardContent>
+                {!aging ? (
+                  <div className="text-center py-8 text-gray-500">
+                    <p>Click 'Load Aging' to view outstanding receivables</p>
+                  </div>
+                ) : (
+                  <div className="space-y-6">
+                    <div className="overflow-x-auto">
+                      <table className="w-full text-sm">
+                        <thead>
+                          <tr className="border-b text-left text-gray-600">
+                            <th className="py-2 pr-4">Company</th>
+                            {aging.buckets.map(bucket => (
+                              <th key={bucket} className="py-2 pr-4 text-right">{bucket.replace('_plus', '+').replace('_', '-')}</th>
+                            ))}
+                            <th className="py-2 text-right">Total</th>
+                          </tr>
+                        </thead>
+                        <tbody>
+                          {aging.companies.map(company => (
+                            <tr key={company.company_id} className="border-b">
+                              <td className="py-2 pr-4">{company.company_name}</td>
+                              {aging.buckets.map(bucket => (
+                                <td key={bucket} className="py-2 pr-4 text-right">{company[bucket] ? `RM ${company[bucket].toLocaleString()}` : '-'}</td>
+                              ))}
+                              <td className="py-2 text-right font-medium">RM {company.total.toLocaleString()}</td>
+                            </tr>
+                          ))}
+                          <tr className="font-bold">
+                            <td className="py-2 pr-4">Total</td>
+                            {aging.buckets.map(bucket => (
+                              <td key={bucket} className="py-2 pr-4 text-right">RM {aging.totals[bucket].toLocaleString()}</td>
+                            ))}
+                            <td className="py-2 text-right">RM {aging.totals.total.toLocaleString()}</td>
+                          </tr>
+                        </tbody>
+                      </table>
+                    </div>
+
+                    <div>
+                      <h3 className="font-semibold mb-2">Projected Cash-In</h3>
+                      <div className="grid grid-cols-2 md:grid-cols-4 lg:grid-cols-7 gap-2">
+                        {aging.cash_flow.map(period => (
+                          <div key={period.period} className={`p-2 rounded-lg ${period.period === 'overdue' ? 'bg-red-50' : 'bg-gray-50'}`}>
+                            <p className="text-xs text-gray-500">{period.week_start ? `Week of ${period.week_start}` : 'Overdue'}</p>
+                            <p className="font-medium">RM {period.amount.toLocaleString()}</p>
+                          </div>
+                        ))}
+                      </div>
+                    </div>
+                  </div>
+                )}
+              </CardContent>
+            </Card>
+          </TabsContent>
+
+          {/* Profitability Tab */}
+          <TabsContent value="profitability">
+            <Card>
+              <CardHeader>
+                <div className="flex justify-between items-center">
+                  <div>
+                    <CardTitle>Profitability</CardTitle>
+                    {rollup && <CardDescription>Sessions starting {rollup.start_date} to {rollup.end_date}</CardDescription>}
+                    {rollup?.session_totals && (
+                      <CardDescription>Figures are totals of the sessions each trainer worked on; Trainer Fees is the trainer's own fee.</CardDescription>
+                    )}
+                    {rollup?.pending_sessions > 0 && (
+                      <CardDescription>{rollup.pending_sessions} session(s) are being recalculated; refresh shortly for up-to-date figures.</CardDescription>
+                    )}
+                  </div>
+                  <div className="flex gap-2">
+                    <Select value={rollupGroupBy} onValueChange={(value) => { setRollupGroupBy(value); loadRollup(value); }}>
+                      <SelectTrigger className="w-40">
+                        <SelectValue />
+                      </SelectTrigger>
+                      <SelectContent>
+                        <SelectItem value="month">By Month</SelectItem>
+                        <SelectItem value="company">By Company</SelectItem>
+                        <SelectItem value="program">By Programme</SelectItem>
+                        <SelectItem value="trainer">By Trainer</SelectItem>
+                      </SelectContent>
+                    </Select>
+                    <Button variant="outline" onClick={() => loadRollup()}>
+                      <RefreshCw className="w-4 h-4 mr-2" />
+                      {rollup ? 'Refresh' : 'Load'}
+                    </Button>
+                  </div>
+                </div>
+              </CardHeader>
+              <CardContent>
+                {!rollup ? (
+                  <div className="text-center py-8 text-gray-500">
+                    <p>Click 'Load' to view profit across sessions</p>
+                  </div>
+                ) : (
+                  <div className="overflow-x-auto">
+                    <table className="w-full text-sm">
+                      <thead>
+                        <tr className="border-b text-left text-gray-600">
+                          <th className="py-2 pr-4">{rollupGroupBy.charAt(0).toUpperCase() + rollupGroupBy.slice(1)}</th>
+                          <th className="py-2 pr-4 text-right">Sessions</th>
+                          <th className="py-2 pr-4 text-right">Revenue</th>
+                          <th className="py-2 pr-4 text-right">Trainer Fees</th>
+                          <th className="py-2 pr-4 text-right">Coordinator</th>
+                          <th className="py-2 pr-4 text-right">Expenses</th>
+                          <th className="py-2 pr-4 text-right">Marketing</th>
+                          <th className="py-2 pr-4 text-right">Profit</th>
+                          <th className="py-2 text-right">Margin</th>
+                        </tr>
+                      </thead>
+                      <tbody>
+                        {[...rollup.groups, { ...rollup.totals, key: '__total', label: 'Total' }].map(row => (
+                          <tr key={row.key || 'unassigned'} className={row.key === '__total' ? 'font-bold' : 'border-b'}>
+                            <td className="py-2 pr-4">{row.label}</td>
+                            <td className="py-2 pr-4 text-right">{row.sessions}</td>
+                            <td className="py-2 pr-4 text-right">RM {row.revenue.toLocaleString()}</td>
+                            <td className="py-2 pr-4 text-right">RM {(row.trainer_fee ?? row.trainer_fees).toLocaleString()}</td>
+                            <td className="py-2 pr-4 text-right">RM {row.coordinator_fee.toLocaleString()}</td>
+                            <td className="py-2 pr-4 text-right" title={Object.entries(row.expenses || {}).map(([category, amount]) => `${category}: RM ${amount.toLocaleString()}`).join('\n')}>
+                              RM {row.cash_expenses.toLocaleString()}
+                            </td>
+                            <td className="py-2 pr-4 text-right">RM {row.marketing_commission.toLocaleString()}</td>
+                            <td className={`py-2 pr-4 text-right ${row.profit < 0 ? 'text-red-600' : ''}`}>RM {row.profit.toLocaleString()}</td>
+                            <td className="py-2 text-right">{row.margin}%</td>
+                          </tr>
+                        ))}
+                      </tbody>
+                    </table>
+                  </div>
+                )}
+              </CardContent>
+            </Card>
+          </TabsContent>
+
           {/* Audit Log Tab */}
           <TabsContent value="audit">
             <Card>
               <CardHeader>
                 <div className="flex justify-between items-center">
                   <CardTitle>Audit Log</CardTitle>
-                  <Button variant="outline" onClick={loadAuditLogs}>
+                  <Button variant="outline" onClick={() => loadAuditLogs()}>
                     <RefreshCw className="w-4 h-4 mr-2" />
                     Load Logs
                   </Button>
@@ -746,6 +949,16 @@ const FinanceDashboard = ({ user, onLogout }) => {
                             <p className="font-medium">{log.action} - {log.entity_type}</p>
                             <p className="text-sm text-gray-500">By: {log.changed_by_name}</p>
                             {log.remark && <p className="text-sm text-gray-400">{log.remark}</p>}
+                            {log.changes?.length > 0 && (
+                              <ul className="mt-1 text-xs text-gray-600 space-y-0.5">
+                                {log.changes.slice(0, 8).map(change => (
+                                  <li key={change.field}>
+                                    <span className="font-medium">{change.field}</span>: {JSON.stringify(change.from) ?? '-'} → {JSON.stringify(change.to) ?? '-'}
+                                  </li>
+                                ))}
+                                {log.changes.length > 8 && <li className="text-gray-400">+{log.changes.length - 8} more field(s)</li>}
+                              </ul>
+                            )}
                           </div>
                           <p className="text-xs text-gray-400">
                             {log.timestamp ? new Date(log.timestamp).toLocaleString() : '-'}
@@ -753,6 +966,11 @@ const FinanceDashboard = ({ user, onLogout }) => {
                         </div>
                       </div>
                     ))}
+                    {auditCursor && (
+                      <div className="text-center">
+                        <Button variant="outline" onClick={() => loadAuditLogs(auditCursor)}>Load More</Button>
+                      </div>
+                    )}
                   </div>
                 )}
               </CardContent>
@@ -13,6 +13,7 @@ const SupervisorDashboard = ({ user, onLogout }) => {
   const [attendance, setAttendance] = useState([]);
   const [reports, setReports] = useState([]);
   const [loadingReports, setLoadingReports] = useState(false);
+  const [reportsCursor, setReportsCursor] = useState(null);
 
   useEffect(() => {
     loadData();
@@ -40,11 +41,15 @@ const SupervisorDashboard = ({ user, onLogout }) => {
       console.error("Failed to load attendance", error);
 
 
-  const loadReports = async () => {
+  const loadReports = async (loadMore = false) => {
     setLoadingReports(true);
     try {
-      const response = await axiosInstance.get("/training-reports/supervisor/sessions");
-      setReports(response.data || []);
+      const params = { limit: 20 };
+      if (loadMore && reportsCursor) params.cursor = reportsCursor;
+      const response = await axiosInstance.get("/training-reports/supervisor/sessions", { params });
+      const page = response.data.reports || [];
+      setReports(loadMore ? [...reports, ...page] : page);
+      setReportsCursor(response.data.next_cursor || null);
     } catch (error) {
       console.error("Failed to load reports", error);
       toast.error("Failed to load reports");
@@ -252,7 +257,7 @@ const SupervisorDashboard = ({ user, onLogout }) => {
                 <CardDescription>View submitted training reports for your sessions</CardDescription>
               </CardHeader>
               <CardContent>
-                {loadingReports ? (
+                {loadingReports && reports.length === 0 ? (
                   <div className="text-center py-8">
                     <p className="text-gray-500">Loading reports...</p>
                   </div>
@@ -310,6 +315,14 @@ const SupervisorDashboard = ({ user, onLogout }) => {
                         </div>
                       </div>
                     ))}
+                    
+                    {reportsCursor && (
+                      <div className="text-center">
+                        <Button variant="outline" onClick={() => loadReports(true)} disabled={loadingReports}>
+                          {loadingReports ? "Loading..." : "Load More"}
+                        </Button>
+                      </div>
+                    )}
                   </div>
                 )}
               </CardContent>
@@ -398,7 +398,7 @@ const TrainerChecklist = ({ user }) => {
                           <div className="mt-3 border-2 border-green-200 rounded-lg p-3 bg-green-50">
                             <p className="text-sm font-medium text-gray-700 mb-2">Photo Preview:</p>
                             <img 
-                              src={item.photo_url} 
+                              src={item.photo_url.includes('/checklist-photos/') ? `${item.photo_url}?variant=thumb` : item.photo_url} 
                               alt={`${item.item} inspection`}
                               className="w-48 h-48 object-cover rounded-lg border-2 border-gray-300"
                               onError={(e) => {
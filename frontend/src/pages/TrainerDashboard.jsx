@@ -277,7 +277,10 @@ const TrainerDashboard = ({ user, onLogout }) => {
   const loadIncome = async () => {
     setLoadingIncome(true);
     try {
-      const response = await axiosInstance.get(`/finance/income/trainer/${user.id}`);
+      // The whole selected year, so the month/YTD filters below see every record
+      const response = await axiosInstance.get(`/finance/income/trainer/${user.id}`, {
+        params: { start_date: `${incomeFilter.year}-01-01`, end_date: `${incomeFilter.year}-12-31` }
+      });
       setIncomeData(response.data);
     } catch (error) {
       console.error('Failed to load income:', error);